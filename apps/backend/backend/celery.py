@@ -35,6 +35,11 @@ app.conf.beat_schedule = {
         # Load prediction model every hour
         "schedule": crontab(minute=0, hour="*/1"),  # type: ignore
     },
+    "build-busyness-forecast-every-hour": {
+        "task": "restaurant_recommender.tasks.build_busyness_forecast_grid",
+        # Rebuild the busyness forecast every hour, after the model and weather are refreshed
+        "schedule": crontab(minute=5, hour="*/1"),  # type: ignore
+    },
     "resize-images-every-1-hour": {
         "task": "user_management.tasks.resize_image",
         # Resize images every hour
@@ -75,6 +80,31 @@ app.conf.beat_schedule = {
         # Cleanup old logs every day at midnight
         "schedule": crontab(minute=0, hour=0),  # type: ignore
     },
+    "build-similar-users-every-day": {
+        "task": "user_management.tasks.build_similar_users",
+        # Rebuild the similar users table every day at 2 am, preference changes refresh it in between
+        "schedule": crontab(minute=0, hour=2),  # type: ignore
+    },
+    "build-user-lsh-index-every-day": {
+        "task": "user_management.tasks.build_user_lsh_index",
+        # Rebuild the approximate similar users snapshot every day at 2:30 am, the change log covers the rest
+        "schedule": crontab(minute=30, hour=2),  # type: ignore
+    },
+    "train-recommendation-factors-every-day": {
+        "task": "user_management.tasks.train_recommendation_factors",
+        # Retrain the recommendation factors every day at 3 am, new users are folded in until then
+        "schedule": crontab(minute=0, hour=3),  # type: ignore
+    },
+    "build-similar-restaurants-every-day": {
+        "task": "restaurant_recommender.tasks.build_similar_restaurants",
+        # Rebuild the similar restaurants table every day at 4 am
+        "schedule": crontab(minute=0, hour=4),  # type: ignore
+    },
+    "precompute-recommendations-every-day": {
+        "task": "user_management.tasks.precompute_recommendations",
+        # Rank the active users every day at 5 am, after the similar users, factors and similar restaurants
+        "schedule": crontab(minute=0, hour=5),  # type: ignore
+    },
     "clear-cache-every-hour": {
         "task": "restaurant_recommender.tasks.clear_cache",
         # Clear cache every hour
@@ -291,6 +291,63 @@ CELERY_IMPORTS = (
 )
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 
+# --- Busyness Prediction Configuration ---
+
+# Directory of the content-addressed prediction model artifacts, memory-mapped by the web and
+# Celery workers. The database keeps the content of every artifact, so a host missing a file
+# (e.g. a new container) writes it on its first prediction. Mount it as a volume (the
+# model-artifacts volume of docker-compose.yml) so files survive container rebuilds, and share it
+# between workers of the same host so they map the same pages.
+MODEL_ARTIFACT_DIR = BASE_DIR / "model_artifacts"
+
+# Rolling horizon and step of the busyness forecast precomputed by Celery beat.
+# Requests for a step inside the horizon are answered without running the model.
+BUSYNESS_FORECAST_HORIZON_DAYS = 7
+BUSYNESS_FORECAST_STEP_MINUTES = 15
+# Requested times are rounded down to buckets of this many minutes before prediction and caching.
+# Keep it a multiple of the forecast step so every bucket inside the horizon is a forecast step.
+BUSYNESS_PREDICTION_RESOLUTION_MINUTES = 15
+# Adds a Server-Timing header with the duration of every prediction stage to PredictBusyness responses.
+BUSYNESS_SERVER_TIMING = os.getenv("BUSYNESS_SERVER_TIMING", "False") == "True"
+
+# --- Recommendation Configuration ---
+
+# Number of most similar users stored per user in the SimilarUser table and used for recommendations.
+SIMILAR_USERS_TOP_K = 50
+# Bands and rows per band of the MinHash/LSH index of the approximate similar users mode. More
+# bands find more of the true neighbors, more rows return fewer candidates, see benchmark_user_lsh.
+SIMILAR_USERS_LSH_BANDS = 16
+SIMILAR_USERS_LSH_ROWS = 4
+# Implicit ALS model of the factors recommendation mode, trained by the train_recommendation_factors
+# command and Celery task. RECOMMENDATION_ALS_THREADS defaults to the number of CPUs.
+RECOMMENDATION_ALS_FACTORS = 32
+RECOMMENDATION_ALS_ALPHA = 40.0
+RECOMMENDATION_ALS_REGULARIZATION = 0.1
+RECOMMENDATION_ALS_ITERATIONS = 15
+RECOMMENDATION_ALS_THREADS = None
+# Share of the content similarity to the user's liked restaurants in the hybrid recommendation mode.
+RECOMMENDATION_HYBRID_CONTENT_WEIGHT = 0.3
+# Similar restaurants table built by the build_similar_restaurants task and command: neighbors per
+# restaurant, share of the co-like similarity against the content similarity, and size of the process
+# pool of the command (the number of CPUs when None), the Celery task runs in the worker process.
+SIMILAR_RESTAURANTS_TOP_K = 20
+SIMILAR_RESTAURANTS_COLIKE_WEIGHT = 0.5
+SIMILAR_RESTAURANTS_PROCESSES = None
+# Rankings precomputed every night for the users who logged in or liked a restaurant in the last
+# RECOMMENDATION_BATCH_ACTIVE_DAYS days, in shards of RECOMMENDATION_BATCH_SHARD_SIZE users, for
+# every mode of RECOMMENDATION_BATCH_MODES (the frontend only requests the default mode).
+RECOMMENDATION_BATCH_ACTIVE_DAYS = 30
+RECOMMENDATION_BATCH_SHARD_SIZE = 500
+RECOMMENDATION_BATCH_MODES = ["neighbors"]
+# Restaurant name search of the trigram name index: number of restaurants per page when no limit is
+# given, the largest limit, and share of the query trigrams a name must contain to match a query it does
+# not contain (typo tolerance).
+RESTAURANT_NAME_SEARCH_LIMIT = 100
+RESTAURANT_NAME_SEARCH_MAX_LIMIT = 500
+RESTAURANT_NAME_SEARCH_MIN_SIMILARITY = 0.5
+# Maximum number of completions returned by the restaurant autocomplete endpoint.
+AUTOCOMPLETE_LIMIT = 10
+
 # --- CORS Configuration ---
 
 CORS_ORIGIN_ALLOW_ALL = True
@@ -374,6 +431,12 @@ LOGGING = {
             "level": "DEBUG",
             "propagate": True,
         },
+        # Set to DEBUG to log every step of the busyness predictions.
+        "restaurant_recommender": {
+            "handlers": ["default", "console"],
+            "level": os.getenv("RESTAURANT_RECOMMENDER_LOG_LEVEL", "INFO"),
+            "propagate": True,
+        },
     },
 }
 
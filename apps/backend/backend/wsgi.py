@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/wsgi/
 """
 
+import contextlib
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_wsgi_application()
+
+# Build the zone registry when the worker starts, so the first prediction doesn't pay for it.
+from django.db import DatabaseError
+
+from restaurant_recommender.zone_registry import zone_registry
+
+# The database may not be migrated yet, the registry is then built on the first prediction instead.
+with contextlib.suppress(DatabaseError):
+    zone_registry.get_index()
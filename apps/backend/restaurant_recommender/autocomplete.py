@@ -0,0 +1,194 @@
+"""In-memory typeahead completion of restaurant names, cuisines and zones.
+
+Every word suffix of the normalized name, primary cuisine and zone of every restaurant is a key
+of one sorted list (``"joe s pizza"`` gives ``"joe s pizza"``, ``"s pizza"`` and ``"pizza"``),
+so the keys starting with what the user typed are one bisection away. Every key also has the
+rank of its restaurant by descending overall rating, then match type (name, cuisine, zone),
+then id, so the best completions of a prefix are the smallest ranks of its key range, found with
+a partial sort. Keystrokes never read the database: each process builds the index with one query
+and only rebuilds it when the restaurants data version changes, i.e. after a loader ran.
+
+Typical usage example:
+
+    completions = autocomplete_registry.complete("piz")
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+
+from restaurant_recommender.data_versions import RESTAURANTS, get_data_version
+from restaurant_recommender.models import Restaurant  # type: ignore
+from restaurant_recommender.name_index import LAST_CHARACTER, normalize_name
+
+logger = logging.getLogger(__name__)
+
+# Match type tags, in order of preference when a restaurant matches in several ways.
+MATCH_TYPES = ("name", "cuisine", "zone")
+# Keys ranked per completion before dropping the extra keys of the same restaurants.
+CANDIDATES_PER_COMPLETION = 4
+
+
+class AutocompleteIndex(NamedTuple):
+    """The completion keys of the restaurants, as built from one restaurants data version.
+
+    Attributes:
+        version: Restaurants data version the index was built from.
+        restaurant_ids: int64 id of the restaurant of every position.
+        names: Restaurant name of every position, as stored.
+        keys: Sorted word suffixes of the normalized names, cuisines and zones.
+        key_positions: int32 position of the restaurant of every key.
+        key_matches: int8 index in MATCH_TYPES of the field of every key.
+        key_ranks: int32 rank of every key by descending rating, match type, then id.
+        ranked_keys: int32 index in keys of every rank.
+    """
+
+    version: int
+    restaurant_ids: np.ndarray
+    names: list
+    keys: list
+    key_positions: np.ndarray
+    key_matches: np.ndarray
+    key_ranks: np.ndarray
+    ranked_keys: np.ndarray
+
+
+def word_suffixes(text):
+    """Return the suffixes of a normalized text starting at each of its words."""
+    words = text.split(" ") if text else []
+    return [" ".join(words[start:]) for start in range(len(words))]
+
+
+def build_autocomplete_index(version):
+    """Build an AutocompleteIndex with one query over the restaurants.
+
+    Args:
+        version (int): Restaurants data version the index is built from.
+
+    Returns:
+        AutocompleteIndex: The index.
+    """
+    rows = list(
+        Restaurant.objects.order_by("id").values_list(
+            "id", "restaurant_name", "primary_cuisine", "zone", "overall_rating"
+        )
+    )
+    entries = sorted(
+        (key, position, match)
+        for position, row in enumerate(rows)
+        for match, text in enumerate(row[1:4])
+        for key in word_suffixes(normalize_name(text or ""))
+    )
+
+    restaurant_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    ratings = np.array([-1.0 if row[4] is None else row[4] for row in rows], dtype=np.float64)
+    key_positions = np.array([entry[1] for entry in entries], dtype=np.int32)
+    key_matches = np.array([entry[2] for entry in entries], dtype=np.int8)
+
+    ranked_keys = np.lexsort(
+        (restaurant_ids[key_positions], key_matches, -ratings[key_positions])
+    ).astype(np.int32)
+    key_ranks = np.empty(len(entries), dtype=np.int32)
+    key_ranks[ranked_keys] = np.arange(len(entries), dtype=np.int32)
+
+    return AutocompleteIndex(
+        version=version,
+        restaurant_ids=restaurant_ids,
+        names=[row[1] for row in rows],
+        keys=[entry[0] for entry in entries],
+        key_positions=key_positions,
+        key_matches=key_matches,
+        key_ranks=key_ranks,
+        ranked_keys=ranked_keys,
+    )
+
+
+def complete(index, query, limit):
+    """Return the restaurants with a name, cuisine or zone word starting with a query.
+
+    Args:
+        index (AutocompleteIndex): The index to search.
+        query (str): The text typed by the user.
+        limit (int): Maximum number of completions.
+
+    Returns:
+        list: Dictionaries with the ``id``, ``name`` and ``match`` type of every restaurant, by
+        descending overall rating. A restaurant matching in several ways is tagged with the
+        first of MATCH_TYPES.
+    """
+    query = normalize_name(query)
+    if not query or limit < 1:
+        return []
+
+    ranks = index.key_ranks[bisect_left(index.keys, query):bisect_left(index.keys, query + LAST_CHARACTER)]
+    candidates = limit * CANDIDATES_PER_COMPLETION
+    partial = len(ranks) > candidates
+    while True:
+        selected = np.partition(ranks, candidates - 1)[:candidates] if partial else ranks
+        keys = index.ranked_keys[np.sort(selected)]
+        # Keys are by rank, so the first key of a restaurant is its best match.
+        _, first = np.unique(index.key_positions[keys], return_index=True)
+        # Restaurants with more keys than expected may leave too few completions in the partial sort.
+        if not partial or len(first) >= limit:
+            break
+        partial = False
+
+    keys = keys[np.sort(first)[:limit]]
+    return [
+        {"id": restaurant_id, "name": index.names[position], "match": MATCH_TYPES[match]}
+        for restaurant_id, position, match in zip(
+            index.restaurant_ids[index.key_positions[keys]].tolist(),
+            index.key_positions[keys].tolist(),
+            index.key_matches[keys].tolist(),
+            strict=True,
+        )
+    ]
+
+
+class AutocompleteRegistry:
+    """Keeps the AutocompleteIndex in memory, keyed by the restaurants data version."""
+
+    def __init__(self):
+        """Initialize the registry empty, the first completion builds the index."""
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get_index(self):
+        """Return the completion index, rebuilding it only when the restaurants data changed."""
+        version = get_data_version(RESTAURANTS)
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                self._index = build_autocomplete_index(version)
+                logger.info(
+                    f"Restaurant autocomplete index built for restaurants version {version}: "
+                    f"{len(self._index.names)} restaurants, {len(self._index.keys)} keys"
+                )
+            return self._index
+
+    def complete(self, query, limit=None):
+        """Return the completions of a query, see complete.
+
+        Args:
+            query (str): The text typed by the user.
+            limit (int, optional): Maximum number of completions, AUTOCOMPLETE_LIMIT by default.
+
+        Returns:
+            list: The completions, best first.
+        """
+        return complete(self.get_index(), query, limit or settings.AUTOCOMPLETE_LIMIT)
+
+    def clear(self):
+        """Drop the index, forcing a rebuild on the next lookup."""
+        with self._lock:
+            self._index = None
+
+
+autocomplete_registry = AutocompleteRegistry()
@@ -0,0 +1,177 @@
+"""Pre-rendered snapshot of the all restaurants catalog, the largest response of the API.
+
+MapRestaurantSearchView answers the unfiltered restaurants list from a snapshot rendered once
+per restaurants data version: the JSON bytes of the serialized restaurants, compressed once with
+gzip and brotli at their highest levels. Requests get the bytes of the encoding they accept
+with a strong ETag per encoding, and requests whose If-None-Match matches the snapshot get a
+304 without a body. The loader commands bump the restaurants data version, so the next request
+of every process renders a new snapshot.
+
+Typical usage example:
+
+    snapshot = catalog_registry.get_snapshot()
+    response = catalog_response(request, snapshot)
+"""
+
+import gzip
+import hashlib
+import logging
+import threading
+from typing import NamedTuple
+
+import brotli  # type: ignore
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer  # type: ignore
+
+from restaurant_recommender.data_versions import RESTAURANTS, get_data_version
+from restaurant_recommender.models import Restaurant  # type: ignore
+from restaurant_recommender.restaurant_rows import map_restaurant_rows
+
+logger = logging.getLogger(__name__)
+
+IDENTITY = "identity"
+GZIP = "gzip"
+BROTLI = "br"
+# Content codings served when the client accepts them, most compact first.
+PREFERRED_ENCODINGS = (BROTLI, GZIP)
+
+
+class CatalogVariant(NamedTuple):
+    """One encoding of the catalog.
+
+    Attributes:
+        body: The encoded JSON bytes.
+        etag: Strong ETag of the encoded bytes, quoted.
+    """
+
+    body: bytes
+    etag: str
+
+
+class CatalogSnapshot(NamedTuple):
+    """The catalog as rendered from one restaurants data version.
+
+    Attributes:
+        version: Restaurants data version the catalog was rendered from.
+        restaurant_count: Number of restaurants of the catalog.
+        variants: CatalogVariant of every encoding, IDENTITY, GZIP and BROTLI.
+    """
+
+    version: int
+    restaurant_count: int
+    variants: dict
+
+
+def render_catalog(version):
+    """Render the catalog and its compressed variants.
+
+    The JSON bytes are the ones MapRestaurantSearchSerializer would render, with the restaurants
+    ordered by id so that every process renders the same bytes and ETags.
+
+    Args:
+        version (int): Restaurants data version the catalog is rendered from.
+
+    Returns:
+        CatalogSnapshot: The snapshot.
+    """
+    data = map_restaurant_rows(Restaurant.objects.order_by("id"))
+    body = JSONRenderer().render(data)
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return CatalogSnapshot(
+        version=version,
+        restaurant_count=len(data),
+        variants={
+            IDENTITY: CatalogVariant(body, f'"{digest}"'),
+            # mtime=0 keeps the gzip header, and so the ETag, the same in every process.
+            GZIP: CatalogVariant(gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"'),
+            BROTLI: CatalogVariant(brotli.compress(body, quality=11), f'"{digest}-br"'),
+        },
+    )
+
+
+def accepted_encodings(header):
+    """Return the content codings of an Accept-Encoding header that have a non-zero quality."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, parameters = part.partition(";")
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip() and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def catalog_response(request, snapshot):
+    """Answer a request with the encoding of the catalog it accepts, or 304 if it is up to date.
+
+    Args:
+        request: The HTTP request.
+        snapshot (CatalogSnapshot): The current catalog.
+
+    Returns:
+        HttpResponse: The catalog bytes, or a 304 response without a body.
+    """
+    accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+    encoding = next(
+        (encoding for encoding in PREFERRED_ENCODINGS if encoding in accepted or "*" in accepted), IDENTITY
+    )
+    variant = snapshot.variants[encoding]
+
+    # A client holding any encoding of the current snapshot is up to date.
+    if_none_match = {etag.removeprefix("W/") for etag in parse_etags(request.headers.get("If-None-Match", ""))}
+    if "*" in if_none_match or if_none_match & {current.etag for current in snapshot.variants.values()}:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(variant.body, content_type="application/json")
+        if encoding != IDENTITY:
+            response["Content-Encoding"] = encoding
+
+    response["ETag"] = variant.etag
+    patch_vary_headers(response, ["Accept-Encoding"])
+    # Clients revalidate with the ETag, and max-age=0 keeps the page cache middleware from storing it.
+    patch_cache_control(response, no_cache=True, max_age=0)
+    return response
+
+
+class CatalogRegistry:
+    """Keeps the CatalogSnapshot in memory, keyed by the restaurants data version."""
+
+    def __init__(self):
+        """Initialize the registry empty, the first request renders the catalog."""
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def get_snapshot(self):
+        """Return the catalog, rendering it only when the restaurants data changed."""
+        version = get_data_version(RESTAURANTS)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = render_catalog(version)
+                sizes = ", ".join(
+                    f"{encoding} {len(variant.body)} bytes" for encoding, variant in self._snapshot.variants.items()
+                )
+                logger.info(
+                    f"Restaurant catalog rendered for restaurants version {version}: "
+                    f"{self._snapshot.restaurant_count} restaurants, {sizes}"
+                )
+            return self._snapshot
+
+    def clear(self):
+        """Drop the snapshot, forcing a render on the next request."""
+        with self._lock:
+            self._snapshot = None
+
+
+catalog_registry = CatalogRegistry()
@@ -0,0 +1,172 @@
+"""Content vectors of the restaurants, built from their aspects and descriptive fields.
+
+Every restaurant becomes a sparse float32 row made of three blocks:
+
+* its aspect counts, one term per aspect and rating type (e.g. ``service:negative``), as
+  log-scaled counts weighted by the inverse document frequency of the term,
+* one-hot columns for the primary cuisine, price band, noise level and dress code,
+* its overall, food, service, value and ambience ratings scaled to [0, 1].
+
+Each block is scaled to unit length and weighted, then the whole row is scaled to unit length,
+so the dot product of two rows is the weighted cosine similarity of the restaurants. Each
+process builds the matrix with two queries and only rebuilds it when the restaurants data
+version changes, i.e. after a loader ran.
+
+Typical usage example:
+
+    index = content_registry.get_index()
+    similarities = index.features @ index.features[row].T
+"""
+
+import logging
+import threading
+from typing import NamedTuple
+
+import numpy as np
+from scipy import sparse  # type: ignore
+
+from restaurant_recommender.data_versions import RESTAURANTS, get_data_version
+from restaurant_recommender.models import Aspect, Restaurant  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_FIELDS = ("primary_cuisine", "price", "noise_level", "dress_code")
+RATING_FIELDS = ("overall_rating", "food_rating", "service_rating", "value_rating", "ambience_rating")
+MAX_RATING = 5.0
+# Share of every block in the similarity of two restaurants.
+ASPECT_WEIGHT = 0.5
+CATEGORICAL_WEIGHT = 0.35
+RATING_WEIGHT = 0.15
+
+
+class ContentIndex(NamedTuple):
+    """The content vectors of all restaurants, as built from one restaurants data version.
+
+    Attributes:
+        version: Restaurants data version the matrix was built from.
+        restaurant_ids: Sorted int64 id of the restaurant of every row.
+        features: float32 CSR restaurant by feature matrix, every non-empty row has unit length.
+        feature_names: Name of every column, e.g. ``"service:positive"`` or ``"price=$30 and under"``.
+    """
+
+    version: int
+    restaurant_ids: np.ndarray
+    features: sparse.csr_matrix
+    feature_names: list
+
+
+def _normalize_rows(matrix):
+    """Scale every non-empty row of a CSR matrix to unit length."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+
+def _aspect_block(restaurant_ids, aspects):
+    """Return the TF-IDF weighted aspect counts and the names of their columns."""
+    terms = {}
+    rows, columns, counts = [], [], []
+    for restaurant_id, aspect, rating_type, count in aspects:
+        row = np.searchsorted(restaurant_ids, restaurant_id)
+        if row == len(restaurant_ids) or restaurant_ids[row] != restaurant_id or not count:
+            continue
+        term = f"{aspect.strip().lower()}:{rating_type.strip().lower()}"
+        rows.append(row)
+        columns.append(terms.setdefault(term, len(terms)))
+        # Negative aspects may be stored with negative counts, their sign is in the term.
+        counts.append(abs(count))
+
+    block = sparse.csr_matrix(
+        (np.log1p(np.array(counts, dtype=np.float64)), (rows, columns)), shape=(len(restaurant_ids), len(terms))
+    )
+    block.sum_duplicates()
+    document_frequency = np.bincount(block.indices, minlength=len(terms))
+    inverse_document_frequency = np.log((1 + len(restaurant_ids)) / (1 + document_frequency)) + 1
+    return block @ sparse.diags(inverse_document_frequency), list(terms)
+
+
+def _categorical_block(rows):
+    """Return the one-hot columns of the categorical fields and their names."""
+    values = {}
+    matrix_rows, columns = [], []
+    for row, restaurant in enumerate(rows):
+        for field, value in zip(CATEGORICAL_FIELDS, restaurant[1 : 1 + len(CATEGORICAL_FIELDS)], strict=True):
+            if value and value.strip():
+                matrix_rows.append(row)
+                columns.append(values.setdefault(f"{field}={value.strip().lower()}", len(values)))
+
+    block = sparse.csr_matrix(
+        (np.ones(len(columns)), (matrix_rows, columns)), shape=(len(rows), len(values))
+    )
+    return block, list(values)
+
+
+def _rating_block(rows):
+    """Return the ratings scaled to [0, 1], 0 when unknown."""
+    ratings = np.array(
+        [restaurant[1 + len(CATEGORICAL_FIELDS) :] for restaurant in rows], dtype=np.float64
+    ).reshape(len(rows), len(RATING_FIELDS))
+    return sparse.csr_matrix(np.clip(np.nan_to_num(ratings) / MAX_RATING, 0, 1)), list(RATING_FIELDS)
+
+
+def build_content_index(version):
+    """Build a ContentIndex with one query over the restaurants and one over their aspects.
+
+    Args:
+        version (int): Restaurants data version the matrix is built from.
+
+    Returns:
+        ContentIndex: The index.
+    """
+    rows = list(
+        Restaurant.objects.order_by("id").values_list("id", *CATEGORICAL_FIELDS, *RATING_FIELDS)
+    )
+    restaurant_ids = np.array([restaurant[0] for restaurant in rows], dtype=np.int64)
+    aspects = Aspect.objects.values_list("restaurant_id", "aspect", "rating_type", "count")
+
+    blocks, feature_names = [], []
+    for (block, names), weight in (
+        (_aspect_block(restaurant_ids, aspects), ASPECT_WEIGHT),
+        (_categorical_block(rows), CATEGORICAL_WEIGHT),
+        (_rating_block(rows), RATING_WEIGHT),
+    ):
+        blocks.append(_normalize_rows(block) * np.sqrt(weight))
+        feature_names.extend(names)
+
+    features = _normalize_rows(sparse.hstack(blocks, format="csr")).astype(np.float32)
+    return ContentIndex(
+        version=version, restaurant_ids=restaurant_ids, features=features, feature_names=feature_names
+    )
+
+
+class ContentRegistry:
+    """Keeps the ContentIndex in memory, keyed by the restaurants data version."""
+
+    def __init__(self):
+        """Initialize the registry empty, the first lookup builds the content vectors."""
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get_index(self):
+        """Return the content index, rebuilding it only when the restaurants data changed."""
+        version = get_data_version(RESTAURANTS)
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                self._index = build_content_index(version)
+                logger.info(
+                    f"Restaurant content vectors built for restaurants version {version}: "
+                    f"{len(self._index.restaurant_ids)} restaurants, {len(self._index.feature_names)} features"
+                )
+            return self._index
+
+    def clear(self):
+        """Drop the index, forcing a rebuild on the next lookup."""
+        with self._lock:
+            self._index = None
+
+
+content_registry = ContentRegistry()
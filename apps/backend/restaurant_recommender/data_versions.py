@@ -0,0 +1,68 @@
+"""Version stamps of datasets that web processes keep in memory.
+
+Every dataset has a counter in the DataVersion table that is incremented whenever the data
+changes, e.g. at the end of a loader command. Reads go through the cache, so an in-memory
+index can compare its version on every request and rebuild only when the counter moved.
+
+Typical usage example:
+
+    bump_data_version(RESTAURANTS)  # After changing restaurant data.
+    if get_data_version(RESTAURANTS) != loaded_version:
+        ...  # Rebuild the in-memory index.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from restaurant_recommender.models import DataVersion  # type: ignore
+
+# Restaurants, their zones and everything loaded with them.
+RESTAURANTS = "restaurants"
+# Selectable preferences and the preferences chosen by users.
+USER_PREFERENCES = "user_preferences"
+# Preferences and liked restaurants of users, as indexed for approximate similarity.
+USER_SETS = "user_sets"
+
+
+def data_version_cache_key(name):
+    """Return the cache key of the version stamp of a dataset."""
+    return f"data_version_{name}"
+
+
+def get_data_version(name):
+    """Return the current version of a dataset, 0 if it never changed.
+
+    Args:
+        name (str): Name of the dataset.
+
+    Returns:
+        int: The version stamp.
+    """
+    cache_key = data_version_cache_key(name)
+    version = cache.get(cache_key)
+    if version is None:
+        version = DataVersion.objects.filter(name=name).values_list("version", flat=True).first() or 0
+        # Cache for 1 hour, the clear_cache task removes it every hour anyway
+        cache.set(cache_key, version, timeout=3600)
+    return version
+
+
+def bump_data_version(name):
+    """Mark a dataset as changed, so every process rebuilds its in-memory copy.
+
+    Args:
+        name (str): Name of the dataset.
+
+    Returns:
+        int: The new version stamp.
+    """
+    with transaction.atomic():
+        DataVersion.objects.get_or_create(name=name)
+        # update() skips auto_now, so updated_at is set explicitly.
+        DataVersion.objects.filter(name=name).update(version=F("version") + 1, updated_at=timezone.now())
+        version = DataVersion.objects.values_list("version", flat=True).get(name=name)
+
+    cache.set(data_version_cache_key(name), version, timeout=3600)
+    return version
@@ -0,0 +1,185 @@
+"""Storage and lookup of the precomputed busyness forecast.
+
+The forecast is a float32 zone by time matrix covering a rolling horizon, built by the
+build_busyness_forecast_grid Celery task. Each web process keeps the latest forecast in memory and
+only reloads it when the forecast version stamp in the cache changes, so a lookup inside the
+horizon needs no inference and no database query.
+
+Typical usage example:
+
+    result = forecast_grid.lookup(datetime(2024, 7, 7, 12, 0))
+    if result is None:
+        ...  # Outside the horizon, fall back to live inference.
+"""
+
+import logging
+import threading
+from datetime import UTC, datetime, timedelta
+from typing import NamedTuple
+
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+
+from restaurant_recommender.models import BusynessForecast  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+FORECAST_VERSION_CACHE_KEY = "busyness_forecast_version"
+# Version stamp used when no forecast has been built yet.
+NO_FORECAST = 0
+
+
+class LoadedForecast(NamedTuple):
+    """A forecast held in memory."""
+
+    version: int
+    start: datetime
+    step: timedelta
+    zones: list
+    model_version: str
+    values: np.ndarray
+
+
+def floor_to_step(moment, step_minutes):
+    """Round a naive datetime down to the previous multiple of step_minutes since midnight."""
+    minutes = moment.hour * 60 + moment.minute
+    midnight = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + timedelta(minutes=minutes - minutes % step_minutes)
+
+
+def forecast_timestamps(start, step_minutes, steps):
+    """Return the timestamps of a forecast starting at start."""
+    return [start + timedelta(minutes=step_minutes * index) for index in range(steps)]
+
+
+def save_forecast(start, step_minutes, zones, values, model_version):
+    """Store a new forecast, remove the older ones and publish its version.
+
+    Args:
+        start (datetime): Naive UTC time of the first step.
+        step_minutes (int): Minutes between two steps.
+        zones (list): Zone names, one per row of values.
+        values (numpy.ndarray): Zone by step matrix of predicted values.
+        model_version (str): Version stamp of the model that produced the values.
+
+    Returns:
+        BusynessForecast: The stored forecast.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float32)
+    forecast = BusynessForecast.objects.create(
+        start=timezone.make_aware(start, UTC),
+        step_minutes=step_minutes,
+        steps=values.shape[1],
+        zones=list(zones),
+        model_version=model_version,
+        values=values.tobytes(),
+    )
+    BusynessForecast.objects.exclude(id=forecast.id).delete()
+    cache.set(FORECAST_VERSION_CACHE_KEY, forecast.id, timeout=3600)
+    return forecast
+
+
+class ForecastGrid:
+    """Keeps the latest busyness forecast in memory, keyed by its version stamp."""
+
+    def __init__(self):
+        """Initialize the grid empty, the first lookup loads the latest forecast."""
+        self._lock = threading.Lock()
+        self._forecast = None
+
+    def lookup(self, selected_time):
+        """Return the forecast predictions for a naive UTC time.
+
+        Args:
+            selected_time (datetime): The time to predict for.
+
+        Returns:
+            dict: The predictions in the make_predictions format, or None if the time is not a
+            step of the current forecast.
+        """
+        forecast = self.get_forecast()
+        if forecast is None:
+            return None
+
+        step_index, remainder = divmod(selected_time - forecast.start, forecast.step)
+        if remainder or not 0 <= step_index < forecast.values.shape[1]:
+            return None
+
+        column = forecast.values[:, step_index].tolist()
+        return {
+            "predictions": [
+                {"zone": zone, "predicted_value": predicted_value}
+                for zone, predicted_value in zip(forecast.zones, column, strict=True)
+            ],
+            "model_version": forecast.model_version,
+        }
+
+    def lookup_many(self, timestamps):
+        """Return the forecast columns for many naive UTC times at once.
+
+        Args:
+            timestamps: Sequence of datetimes.
+
+        Returns:
+            tuple: The zones, a zone by timestamp matrix of predicted values and the model
+            version, or None if any of the times is not a step of the current forecast.
+        """
+        forecast = self.get_forecast()
+        if forecast is None or not timestamps:
+            return None
+
+        step_indexes = []
+        for timestamp in timestamps:
+            step_index, remainder = divmod(timestamp - forecast.start, forecast.step)
+            if remainder or not 0 <= step_index < forecast.values.shape[1]:
+                return None
+            step_indexes.append(step_index)
+
+        return forecast.zones, forecast.values[:, step_indexes], forecast.model_version
+
+    def get_forecast(self):
+        """Return the latest forecast, reloading it only when its version changed."""
+        version = cache.get(FORECAST_VERSION_CACHE_KEY)
+        if version is None:
+            version = (
+                BusynessForecast.objects.order_by("-created_at").values_list("id", flat=True).first() or NO_FORECAST
+            )
+            cache.set(FORECAST_VERSION_CACHE_KEY, version, timeout=3600)
+
+        if version == NO_FORECAST:
+            return None
+
+        forecast = self._forecast
+        if forecast is not None and forecast.version == version:
+            return forecast
+
+        with self._lock:
+            if self._forecast is None or self._forecast.version != version:
+                self._forecast = self._load(version)
+            return self._forecast
+
+    def clear(self):
+        """Drop the loaded forecast, forcing a reload on the next lookup."""
+        with self._lock:
+            self._forecast = None
+
+    @staticmethod
+    def _load(version):
+        forecast = BusynessForecast.objects.filter(id=version).first()
+        if forecast is None:
+            return None
+
+        values = np.frombuffer(bytes(forecast.values), dtype=np.float32).reshape(len(forecast.zones), forecast.steps)
+        logger.info(f"Busyness forecast {version} loaded, starting at {forecast.start}")
+        return LoadedForecast(
+            version=version,
+            start=timezone.make_naive(forecast.start, UTC),
+            step=timedelta(minutes=forecast.step_minutes),
+            zones=forecast.zones,
+            model_version=forecast.model_version,
+            values=values,
+        )
+
+
+forecast_grid = ForecastGrid()
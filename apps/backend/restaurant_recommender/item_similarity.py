@@ -0,0 +1,128 @@
+"""Top-K item-item similarity of restaurants, computed in chunks on a process pool.
+
+The similarity of two restaurants blends the cosine of their like columns (how often the same
+users like both) with the cosine of their content vectors. A chunk of restaurants is compared
+with every restaurant at once as sparse products, then only the top K of every row is kept.
+
+This module only depends on NumPy and SciPy, so pool workers never need Django: the matrices are
+sent once to every worker by the pool initializer and chunks are described by their bounds.
+
+Typical usage example:
+
+    rows, columns, similarities = compute_top_k(likes, features, top_k=20, colike_weight=0.5)
+"""
+
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Number of restaurants compared with every restaurant in one task.
+CHUNK_SIZE = 256
+
+# Matrices of the current pool worker, set by _init_worker.
+_worker_state = {}
+
+
+def normalize_columns(likes):
+    """Scale every non-empty column of a user by restaurant like matrix to unit length."""
+    likes = sparse.csc_matrix(likes, dtype=np.float64)
+    norms = np.sqrt(np.asarray(likes.multiply(likes).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(likes @ sparse.diags(1 / norms))
+
+
+def top_k_rows(block, first_row, top_k):
+    """Return the top K positive entries of every row of a dense block, excluding the diagonal.
+
+    Args:
+        block (numpy.ndarray): Similarities of the restaurants first_row... with every restaurant.
+        first_row (int): Restaurant of the first row of the block.
+        top_k (int): Number of entries kept per row.
+
+    Returns:
+        tuple: int64 row and column indexes and float64 similarities, by row then descending
+        similarity, ties by ascending column.
+    """
+    block = np.array(block, dtype=np.float64)
+    block[np.arange(len(block)), np.arange(first_row, first_row + len(block))] = 0
+
+    rows, columns, similarities = [], [], []
+    for offset, row in enumerate(block):
+        candidates = np.flatnonzero(row > 0)
+        if top_k < len(candidates):
+            threshold = -np.partition(-row[candidates], top_k - 1)[top_k - 1]
+            candidates = candidates[row[candidates] >= threshold]
+        candidates = candidates[np.lexsort((candidates, -row[candidates]))][:top_k]
+        rows.append(np.full(len(candidates), first_row + offset, dtype=np.int64))
+        columns.append(candidates)
+        similarities.append(row[candidates])
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(columns).astype(np.int64), np.concatenate(similarities)
+
+
+def chunk_top_k(bounds, normalized_likes, features, top_k, colike_weight):
+    """Compute the top K similar restaurants of the restaurants start to stop."""
+    start, stop = bounds
+    colike = (normalized_likes[:, start:stop].T @ normalized_likes).toarray()
+    content = (features[start:stop] @ features.T).toarray()
+    return top_k_rows(colike_weight * colike + (1 - colike_weight) * content, start, top_k)
+
+
+def _init_worker(normalized_likes, features, top_k, colike_weight):
+    _worker_state.update(
+        normalized_likes=sparse.csc_matrix(normalized_likes),
+        features=features,
+        top_k=top_k,
+        colike_weight=colike_weight,
+    )
+
+
+def _worker_chunk(bounds):
+    return chunk_top_k(bounds, **_worker_state)
+
+
+def compute_top_k(likes, features, top_k, colike_weight, *, processes=None, chunk_size=CHUNK_SIZE):  # noqa: PLR0913
+    """Compute the top K similar restaurants of every restaurant.
+
+    Args:
+        likes (scipy.sparse.spmatrix): User by restaurant matrix, 1 where a user liked a restaurant.
+        features (scipy.sparse.csr_matrix): Unit-length content vector of every restaurant.
+        top_k (int): Number of similar restaurants kept per restaurant.
+        colike_weight (float): Share of the co-like similarity, from 0 to 1.
+        processes (int, optional): Size of the process pool, the number of CPUs by default.
+            Chunks run in this process when it is 1, which daemonic processes such as Celery
+            prefork workers have to pass since they cannot start a pool.
+        chunk_size (int, optional): Number of restaurants per task.
+
+    Returns:
+        tuple: int64 restaurant row and column indexes and float64 similarities.
+    """
+    normalized_likes = normalize_columns(likes)
+    features = sparse.csr_matrix(features, dtype=np.float64)
+    restaurant_count = features.shape[0]
+    chunks = [(start, min(start + chunk_size, restaurant_count)) for start in range(0, restaurant_count, chunk_size)]
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1 or len(chunks) <= 1:
+        results = [
+            chunk_top_k(bounds, sparse.csc_matrix(normalized_likes), features, top_k, colike_weight)
+            for bounds in chunks
+        ]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(processes, len(chunks)),
+            initializer=_init_worker,
+            initargs=(normalized_likes, features, top_k, colike_weight),
+        ) as executor:
+            results = list(executor.map(_worker_chunk, chunks))
+
+    if not results:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return tuple(np.concatenate(parts) for parts in zip(*results, strict=True))
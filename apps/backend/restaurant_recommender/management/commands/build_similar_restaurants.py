@@ -0,0 +1,32 @@
+"""Rebuild the similar restaurants table on a process pool.
+
+The build_similar_restaurants Celery task computes the table in the worker process, daemonic
+prefork workers cannot start a pool. Run this command to rebuild it with every CPU, e.g. after
+loading restaurants or likes.
+
+Example:
+    python manage.py build_similar_restaurants --processes 8
+"""
+
+from django.core.management.base import BaseCommand
+
+from restaurant_recommender.similar_restaurants import build_similar_restaurants_table
+
+
+class Command(BaseCommand):
+    """A Django management command to rebuild the SimilarRestaurant table."""
+
+    help = "Rebuild the table of the most similar restaurants of every restaurant"
+
+    def add_arguments(self, parser):
+        """Add the command arguments, every one defaults to its SIMILAR_RESTAURANTS_* setting."""
+        parser.add_argument("--top-k", type=int, help="Neighbors kept per restaurant")
+        parser.add_argument("--colike-weight", type=float, help="Share of the co-like similarity")
+        parser.add_argument("--processes", type=int, help="Size of the process pool")
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Handle the command execution."""
+        row_count = build_similar_restaurants_table(
+            top_k=options["top_k"], colike_weight=options["colike_weight"], processes=options["processes"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Successfully stored {row_count} similar restaurants"))
@@ -0,0 +1,57 @@
+"""This script converts prediction models stored as pickles into model artifacts."""
+
+import pickle  # noqa: S403
+
+from django.core.management.base import BaseCommand
+
+from restaurant_recommender.model_artifacts import artifact_path, serialize_ensemble, store_artifact
+from restaurant_recommender.models import PredictionModel  # type: ignore
+from restaurant_recommender.tree_ensemble import TreeEnsemble
+
+
+class Command(BaseCommand):
+    """A Django management command to move pickled prediction models into model artifacts.
+
+    Every model without an artifact is compiled, its artifact is stored in the database row and
+    written to MODEL_ARTIFACT_DIR, then its pickle_file is cleared. Models exported before the
+    database kept the artifact content get it from their file in MODEL_ARTIFACT_DIR.
+    """
+
+    help = "Convert pickled prediction models into model artifacts"
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Handle the command execution."""
+        legacy_models = PredictionModel.objects.filter(artifact_sha256="").exclude(pickle_file=None)
+
+        for model_id in legacy_models.values_list("id", flat=True):
+            prediction_model = PredictionModel.objects.get(id=model_id)
+            if not prediction_model.pickle_file:
+                self.stdout.write(self.style.WARNING(f"Prediction model {model_id} has an empty pickle_file."))
+                continue
+
+            booster = pickle.loads(prediction_model.pickle_file)  # noqa: S301
+            prediction_model.artifact = serialize_ensemble(TreeEnsemble.from_booster(booster))
+            prediction_model.artifact_sha256 = store_artifact(prediction_model.artifact)
+            prediction_model.pickle_file = None
+            # Saving updates updated_at, so workers pick up the artifact with the next model version.
+            prediction_model.save()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Prediction model {model_id} converted to artifact {prediction_model.artifact_sha256}."
+                )
+            )
+
+        unstored_models = PredictionModel.objects.exclude(artifact_sha256="").filter(artifact=None)
+        for model_id, artifact_sha256 in unstored_models.values_list("id", "artifact_sha256"):
+            path = artifact_path(artifact_sha256)
+            if not path.exists():
+                self.stdout.write(
+                    self.style.ERROR(f"Artifact {artifact_sha256} of prediction model {model_id} does not exist.")
+                )
+                continue
+
+            content = path.read_bytes()
+            store_artifact(content, artifact_sha256)
+            # update() keeps updated_at, the model itself did not change.
+            PredictionModel.objects.filter(id=model_id).update(artifact=content)
+            self.stdout.write(self.style.SUCCESS(f"Artifact {artifact_sha256} stored for prediction model {model_id}."))
@@ -7,7 +7,9 @@ from typing import Dict, List
 import django
 from django.core.management.base import BaseCommand
 
+from restaurant_recommender.data_versions import RESTAURANTS, bump_data_version
 from restaurant_recommender.models import Restaurant  # type: ignore
+from restaurant_recommender.photos import normalize_photo_urls
 
 # Add the path to your Django project directory
 sys.path.append(
@@ -47,32 +49,24 @@ class Command(BaseCommand):
                 restaurant_name = item.get("Restaurant Name")
                 photo_urls_str = item.get("Photos")
                 if restaurant_name and photo_urls_str:
-                    try:
-                        photo_urls = json.loads(
-                            photo_urls_str.replace("'", '"'))
-                        if restaurant_name in photos_dict:
-                            photos_dict[restaurant_name].extend(photo_urls)
-                        else:
-                            photos_dict[restaurant_name] = photo_urls
-                    except json.JSONDecodeError:
+                    photo_urls = normalize_photo_urls(photo_urls_str)
+                    if photo_urls:
+                        photos_dict.setdefault(restaurant_name, []).extend(photo_urls)
+                    else:
                         self.stdout.write(self.style.WARNING(
                             f"Invalid JSON for photos: {photo_urls_str}"))
 
-            # Update each restaurant with the new photo URLs
-            for restaurant in Restaurant.objects.all():
+            # Replace the photo URLs of each restaurant, ensuring no duplicates
+            updated_restaurants = []
+            for restaurant in Restaurant.objects.only("id", "restaurant_name"):
                 restaurant_name = restaurant.restaurant_name
                 if restaurant_name in photos_dict:
-                    new_photo_urls = photos_dict[restaurant_name]
-
-                    # Clear existing photo URLs
-                    restaurant.photo_url = json.dumps([])
-
-                    # Add new URLs, ensuring no duplicates
-                    updated_photos = list(set(new_photo_urls))
-                    restaurant.photo_url = json.dumps(updated_photos)
-                    restaurant.save()
+                    restaurant.photo_url = normalize_photo_urls(photos_dict[restaurant_name])
+                    updated_restaurants.append(restaurant)
                     self.stdout.write(self.style.SUCCESS(
                         f"Updated photos for restaurant {restaurant.restaurant_name}"))
+            Restaurant.objects.bulk_update(updated_restaurants, ["photo_url"], batch_size=1000)
 
+        bump_data_version(RESTAURANTS)
         self.stdout.write(self.style.SUCCESS(
             "Successfully updated restaurant photos"))
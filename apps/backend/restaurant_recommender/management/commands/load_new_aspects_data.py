@@ -7,6 +7,7 @@ from typing import NoReturn
 import django
 from django.core.management.base import BaseCommand
 
+from restaurant_recommender.data_versions import RESTAURANTS, bump_data_version
 from restaurant_recommender.models import Aspect, Restaurant  # type: ignore
 
 # Add the path to your Django project directory.
@@ -128,6 +129,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(
                 f"Unexpected error reading JSON file: {e}."))
 
+        bump_data_version(RESTAURANTS)
         self.stdout.write(
             self.style.SUCCESS(
                 f"Successfully loaded {successful_creations} aspects with {failed_creations} failures.")
@@ -1,13 +1,16 @@
-"""This script loads the XGBoost model from the pickle file and saves it to the database."""
+"""This script loads the XGBoost model from the pickle file and saves it as a model artifact."""
 
 import os
+import pickle  # noqa: S403
 import sys
 from pathlib import Path
 
 import django
 from django.core.management.base import BaseCommand
 
+from restaurant_recommender.model_artifacts import serialize_ensemble, store_artifact
 from restaurant_recommender.models import PredictionModel, Restaurant  # type: ignore
+from restaurant_recommender.tree_ensemble import TreeEnsemble
 
 # Add the path to your Django project directory.
 # Change this to the path of the backend directory in your project.
@@ -21,7 +24,10 @@ django.setup()
 
 
 class Command(BaseCommand):
-    """A Django management command to load the XGBoost model from the pickle file and save it to the database."""
+    """A Django management command to compile the XGBoost model from the pickle file and register it in the database.
+
+    The compiled model is stored in the database row with its checksum and written to MODEL_ARTIFACT_DIR.
+    """
 
     help = "Save the XGBoost model to the database"
 
@@ -37,7 +43,11 @@ class Command(BaseCommand):
             return
 
         with pickle_file.open("rb") as file:
-            pickle_data = file.read()
+            booster = pickle.load(file)  # noqa: S301
+
+        artifact = serialize_ensemble(TreeEnsemble.from_booster(booster))
+        artifact_sha256 = store_artifact(artifact)
+        self.stdout.write(f"Model artifact written with checksum {artifact_sha256}.")
 
         try:
             restaurant = Restaurant.objects.first()
@@ -47,7 +57,8 @@ class Command(BaseCommand):
 
         PredictionModel.objects.create(
             model_name="XGBoost",
-            pickle_file=pickle_data,
+            artifact=artifact,
+            artifact_sha256=artifact_sha256,
             restaurant=restaurant,
         )
 
@@ -8,7 +8,9 @@ from pathlib import Path
 import django
 from django.core.management.base import BaseCommand
 
+from restaurant_recommender.data_versions import RESTAURANTS, bump_data_version
 from restaurant_recommender.models import Restaurant  # type: ignore
+from restaurant_recommender.photos import normalize_photo_urls
 
 # Add the path to your Django project directory.
 # Change this to the path of the backend directory in your project.
@@ -77,7 +79,7 @@ class Command(BaseCommand):
                     "value_rating": float(item["Value Rating"]) if item.get("Value Rating") else None,
                     "noise_level": item.get("Noise Level", ""),
                     "zone": item.get("zone", ""),
-                    "photo_url": item.get("Photo Cover", ""),
+                    "photo_url": normalize_photo_urls(item.get("Photo Cover")),
                     "address": item.get("Address", ""),
                     "website": item.get("Website", ""),
                     "ambience_rating": item.get("Ambience Rating", ""),
@@ -87,4 +89,6 @@ class Command(BaseCommand):
                 # Create and save the Restaurant object
                 Restaurant.objects.create(**mapped_item)
 
+            # Restaurants changed, so every process rebuilds its zone registry.
+            bump_data_version(RESTAURANTS)
             self.stdout.write(self.style.SUCCESS("Successfully loaded restaurant data"))
@@ -6,7 +6,9 @@ from pathlib import Path
 import django
 from django.core.management.base import BaseCommand
 
+from restaurant_recommender.data_versions import RESTAURANTS, bump_data_version
 from restaurant_recommender.models import Restaurant  # type: ignore
+from restaurant_recommender.photos import normalize_photo_urls
 
 TEN = 10
 
@@ -89,7 +91,7 @@ class Command(BaseCommand):
                 "value_rating": float(item["Value Rating"]) if item.get("Value Rating") else None,
                 "noise_level": item.get("Noise Level", ""),
                 "zone": item.get("zone", ""),
-                "photo_url": item.get("Photos", ""),
+                "photo_url": normalize_photo_urls(item.get("Photos")),
                 "address": item.get("Address", ""),
                 "website": item.get("Website", ""),
                 "ambience_rating": item.get("Ambience Rating", ""),
@@ -109,6 +111,8 @@ class Command(BaseCommand):
                     f"Error creating restaurant entry: {e}."))
                 continue
 
+        # Restaurants changed, so every process rebuilds its zone registry.
+        bump_data_version(RESTAURANTS)
         self.stdout.write(self.style.SUCCESS(
             "Successfully loaded restaurants data."))
 
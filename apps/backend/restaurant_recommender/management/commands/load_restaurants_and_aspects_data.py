@@ -8,6 +8,7 @@ from pathlib import Path
 import django
 from django.core.management.base import BaseCommand
 
+from restaurant_recommender.data_versions import RESTAURANTS, bump_data_version
 from restaurant_recommender.models import Aspect, Restaurant  # type: ignore
 
 sys.path.append("/Users/hanzheng/Documents/GitHub/SummerTest/apps/backend")
@@ -68,4 +69,5 @@ class Command(BaseCommand):
                         self.style.ERROR(f"Restaurant {item['Restaurant Name']} does not exist in the database.")
                     )
 
+        bump_data_version(RESTAURANTS)
         self.stdout.write(self.style.SUCCESS("Successfully loaded restaurants and aspects."))
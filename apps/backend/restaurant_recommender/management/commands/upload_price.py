@@ -5,6 +5,7 @@ import sys
 import django
 from django.core.management.base import BaseCommand
 
+from restaurant_recommender.data_versions import RESTAURANTS, bump_data_version
 from restaurant_recommender.models import Restaurant  # type: ignore
 
 # Add the path to your Django project directory
@@ -59,5 +60,6 @@ class Command(BaseCommand):
                     self.stdout.write(self.style.SUCCESS(
                         f"Updated price for restaurant {restaurant.restaurant_name}"))
 
+        bump_data_version(RESTAURANTS)
         self.stdout.write(self.style.SUCCESS(
             "Successfully updated restaurant prices"))
@@ -0,0 +1,172 @@
+"""Latency histograms of the busyness prediction path.
+
+Every prediction records the duration of each of its stages (cache lookup, model fetch, weather
+fetch, zone lookup, feature build, predict, cache write) into a histogram of this process. The
+histograms are served by the metrics endpoint as JSON or in the Prometheus text format, and
+the stages of a single request can be sent back in a ``Server-Timing`` header.
+
+The histograms live in the memory of each process, the counters are reset when it restarts.
+Every scrape is labelled with the process that answered it (``process="host:pid"``), so a
+scraper that reaches several workers keeps their series apart and can sum them.
+
+Typical usage example:
+
+    timings = StageTimings()
+    with timings.stage("weather_fetch"):
+        temp, dwpt, prcp = get_weather()
+    response["Server-Timing"] = timings.server_timing()
+"""
+
+import bisect
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+STAGE_METRIC = "busyness_prediction_stage_seconds"
+# Stages of make_predictions, in the order they run.
+PREDICTION_STAGES = (
+    "forecast_lookup",
+    "cache_lookup",
+    "model_fetch",
+    "weather_fetch",
+    "zone_lookup",
+    "feature_build",
+    "predict",
+    "cache_write",
+)
+# Upper bounds of the histogram buckets in seconds, from 50 microseconds to 2.5 seconds.
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def process_label():
+    """Return the label of this process, its host name and pid, e.g. ``"web-1:4242"``."""
+    # Read on every call, the pid changes when a preloaded server forks its workers.
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Histogram:
+    """Cumulative latency histogram, thread safe."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Initialize an empty histogram.
+
+        Args:
+            buckets (iterable, optional): Sorted upper bounds of the buckets in seconds, without +Inf.
+        """
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # One count per bucket plus the +Inf bucket, not cumulative.
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, seconds):
+        """Record a duration in seconds."""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+
+    def snapshot(self):
+        """Return the count, the sum and the cumulative count of every bucket.
+
+        Returns:
+            dict: ``count``, ``sum`` in seconds and ``buckets``, a list of (upper bound, count)
+            pairs where the last upper bound is ``"+Inf"``.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+
+        cumulative = []
+        running = 0
+        for upper_bound, count in zip((*self.buckets, "+Inf"), counts, strict=True):
+            running += count
+            cumulative.append((upper_bound, running))
+        return {"count": running, "sum": total, "buckets": cumulative}
+
+
+class MetricsRegistry:
+    """Histograms of this process, keyed by metric name and label values."""
+
+    def __init__(self):
+        """Initialize the registry without histograms, they are created on first use."""
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def histogram(self, name, **labels):
+        """Return the histogram of a metric and labels, creating it on first use."""
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration in the histogram of a metric and labels."""
+        self.histogram(name, **labels).observe(seconds)
+
+    def snapshot(self):
+        """Return every histogram as a list of ``{"name", "labels", ...snapshot}`` dictionaries."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        return [{"name": name, "labels": dict(labels), **histogram.snapshot()} for (name, labels), histogram in items]
+
+    def render_prometheus(self):
+        """Return every histogram in the Prometheus text exposition format, labelled with this process."""
+        process = process_label()
+        lines = []
+        described = set()
+        for metric in self.snapshot():
+            name = metric["name"]
+            if name not in described:
+                lines.append(f"# TYPE {name} histogram")
+                described.add(name)
+
+            labels = ",".join(
+                f'{label}="{value}"' for label, value in {**metric["labels"], "process": process}.items()
+            )
+            for upper_bound, count in metric["buckets"]:
+                lines.append(f'{name}_bucket{{{labels},le="{upper_bound}"}} {count}')
+            lines.extend((f"{name}_sum{{{labels}}} {metric['sum']}", f"{name}_count{{{labels}}} {metric['count']}"))
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """Remove every histogram."""
+        with self._lock:
+            self._histograms = {}
+
+
+metrics_registry = MetricsRegistry()
+
+
+class StageTimings:
+    """Durations of the stages of a single prediction, also recorded in the metrics registry."""
+
+    def __init__(self, metric=STAGE_METRIC, registry=None):
+        """Initialize the timings of a prediction.
+
+        Args:
+            metric (str, optional): Name of the histogram metric the stages are recorded in.
+            registry (MetricsRegistry, optional): Registry of the histograms, metrics_registry by default.
+        """
+        self.metric = metric
+        self.registry = registry or metrics_registry
+        self.durations = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as the given stage."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start_time
+            self.durations[name] = self.durations.get(name, 0.0) + duration
+            self.registry.observe(self.metric, duration, stage=name)
+
+    def server_timing(self):
+        """Return the durations as a ``Server-Timing`` header value, in milliseconds."""
+        return ", ".join(f"{name};dur={duration * 1000:.3f}" for name, duration in self.durations.items())
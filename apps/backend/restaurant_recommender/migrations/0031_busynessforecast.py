@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant_recommender', '0030_restaurant_photo_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusynessForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('step_minutes', models.PositiveIntegerField()),
+                ('steps', models.PositiveIntegerField()),
+                ('zones', models.JSONField()),
+                ('model_version', models.CharField(max_length=100)),
+                ('values', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='restaurant__created_9c14e3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant_recommender', '0031_busynessforecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionmodel',
+            name='artifact_sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='predictionmodel',
+            name='pickle_file',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
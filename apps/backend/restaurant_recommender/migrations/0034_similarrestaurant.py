@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant_recommender', '0033_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarRestaurant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('rank', models.PositiveIntegerField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_restaurants', to='restaurant_recommender.restaurant')),
+                ('similar_restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='restaurant_recommender.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['restaurant', 'rank'], name='restaurant__restaur_65eb5d_idx')],
+                'unique_together': {('restaurant', 'similar_restaurant')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+import json
+
+from django.db import migrations, models
+
+from restaurant_recommender.photos import normalize_photo_urls
+
+BATCH_SIZE = 2000
+
+
+def photo_urls_to_json(apps, schema_editor):
+    """Decode the photo_url text of every restaurant into the photo_urls list, in batches."""
+    Restaurant = apps.get_model("restaurant_recommender", "Restaurant")
+    restaurants = []
+    for restaurant_id, photo_url in Restaurant.objects.values_list("id", "photo_url").iterator(chunk_size=BATCH_SIZE):
+        restaurants.append(Restaurant(id=restaurant_id, photo_urls=normalize_photo_urls(photo_url)))
+        if len(restaurants) == BATCH_SIZE:
+            Restaurant.objects.bulk_update(restaurants, ["photo_urls"])
+            restaurants = []
+    Restaurant.objects.bulk_update(restaurants, ["photo_urls"])
+
+
+def photo_urls_to_text(apps, schema_editor):
+    """Encode the photo_urls list of every restaurant back into the photo_url text."""
+    Restaurant = apps.get_model("restaurant_recommender", "Restaurant")
+    restaurants = [
+        Restaurant(id=restaurant_id, photo_url=json.dumps(photo_urls))
+        for restaurant_id, photo_urls in Restaurant.objects.values_list("id", "photo_urls")
+    ]
+    Restaurant.objects.bulk_update(restaurants, ["photo_url"], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("restaurant_recommender", "0034_similarrestaurant"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="restaurant",
+            name="photo_urls",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(photo_urls_to_json, photo_urls_to_text),
+        migrations.RemoveField(
+            model_name="restaurant",
+            name="photo_url",
+        ),
+        migrations.RenameField(
+            model_name="restaurant",
+            old_name="photo_urls",
+            new_name="photo_url",
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+from restaurant_recommender.model_artifacts import artifact_path
+
+
+def store_artifact_files(apps, schema_editor):
+    """Copy the artifact files present on this host into their prediction model rows."""
+    PredictionModel = apps.get_model('restaurant_recommender', 'PredictionModel')
+    for model_id, artifact_sha256 in PredictionModel.objects.exclude(artifact_sha256='').values_list(
+        'id', 'artifact_sha256'
+    ):
+        path = artifact_path(artifact_sha256)
+        if path.exists():
+            PredictionModel.objects.filter(id=model_id).update(artifact=path.read_bytes())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant_recommender', '0035_restaurant_photo_url_json'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionmodel',
+            name='artifact',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(store_artifact_files, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,175 @@
+"""Content-addressed storage of compiled prediction models.
+
+A model is stored as its compiled TreeEnsemble arrays, identified by the SHA-256 of their
+content. The PredictionModel row keeps the content and its checksum, it is the source of truth.
+Every host caches the content in a file named after the checksum in ``MODEL_ARTIFACT_DIR``,
+written from the row when it is missing. Loading memory-maps the file and reads the arrays in
+place, so there is no pickle on the request path and workers on the same host share the pages of
+the model.
+
+File layout:
+    8 bytes magic, 4 bytes little-endian header length, JSON header, then every array
+    aligned to 64 bytes. The header holds the feature names, the base score and the dtype,
+    shape and offset of every array.
+
+Typical usage example:
+
+    content = serialize_ensemble(TreeEnsemble.from_booster(booster))
+    checksum = store_artifact(content)
+    ensemble = load_artifact(checksum)
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from restaurant_recommender.tree_ensemble import TreeEnsemble
+
+ARTIFACT_MAGIC = b"NIBTREE1"
+ARTIFACT_SUFFIX = ".tree"
+ALIGNMENT = 64
+# Arrays of TreeEnsemble written to the artifact, in file order.
+ARRAY_FIELDS = ("roots", "split_features", "thresholds", "children", "default_left", "leaf_values")
+
+
+def artifact_path(checksum):
+    """Return the path of the artifact with the given checksum."""
+    return Path(settings.MODEL_ARTIFACT_DIR) / f"{checksum}{ARTIFACT_SUFFIX}"
+
+
+def _padding(length):
+    return -length % ALIGNMENT
+
+
+def serialize_ensemble(ensemble):
+    """Serialize a TreeEnsemble into the artifact layout.
+
+    Returns:
+        bytes: The artifact content.
+    """
+    arrays = [np.ascontiguousarray(getattr(ensemble, field)) for field in ARRAY_FIELDS]
+
+    # Offsets are relative to the end of the padded header, so they don't depend on its length.
+    descriptions = {}
+    offset = 0
+    for field, array in zip(ARRAY_FIELDS, arrays, strict=True):
+        descriptions[field] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes + _padding(array.nbytes)
+
+    header = json.dumps({
+        "feature_names": ensemble.feature_names,
+        "base_score": ensemble.base_score,
+        "arrays": descriptions,
+    }).encode()
+
+    prefix = ARTIFACT_MAGIC + struct.pack("<I", len(header)) + header
+    parts = [prefix, b"\0" * _padding(len(prefix))]
+    for array in arrays:
+        parts.extend((array.tobytes(), b"\0" * _padding(array.nbytes)))
+    return b"".join(parts)
+
+
+def deserialize_ensemble(buffer):
+    """Build a TreeEnsemble whose arrays are views of an artifact buffer.
+
+    Args:
+        buffer: The artifact content, e.g. bytes or an mmap.
+
+    Returns:
+        TreeEnsemble: The model.
+
+    Raises:
+        ValueError: If the buffer is not an artifact.
+    """
+    if bytes(buffer[: len(ARTIFACT_MAGIC)]) != ARTIFACT_MAGIC:
+        msg = "Not a model artifact"
+        raise ValueError(msg)
+
+    header_start = len(ARTIFACT_MAGIC) + 4
+    (header_length,) = struct.unpack("<I", buffer[len(ARTIFACT_MAGIC) : header_start])
+    header = json.loads(bytes(buffer[header_start : header_start + header_length]))
+    data_start = header_start + header_length
+    data_start += _padding(data_start)
+
+    arrays = {}
+    for field, description in header["arrays"].items():
+        dtype = np.dtype(description["dtype"])
+        count = int(np.prod(description["shape"]))
+        arrays[field] = np.frombuffer(
+            buffer, dtype=dtype, count=count, offset=data_start + description["offset"]
+        ).reshape(description["shape"])
+
+    return TreeEnsemble(feature_names=header["feature_names"], base_score=header["base_score"], **arrays)
+
+
+def store_artifact(content, checksum=None):
+    """Write artifact content to its file in MODEL_ARTIFACT_DIR, unless the file already exists.
+
+    Args:
+        content (bytes): The artifact content, as returned by serialize_ensemble.
+        checksum (str, optional): The expected SHA-256 checksum of the content.
+
+    Returns:
+        str: The SHA-256 checksum that identifies the artifact.
+
+    Raises:
+        ValueError: If the content does not match the expected checksum.
+    """
+    content = bytes(content)
+    actual_checksum = hashlib.sha256(content).hexdigest()
+    if checksum is not None and actual_checksum != checksum:
+        msg = f"Model artifact {checksum} is corrupted"
+        raise ValueError(msg)
+
+    path = artifact_path(actual_checksum)
+    if path.exists():
+        return actual_checksum
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first, so workers never map a partially written artifact.
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=path.parent, suffix=ARTIFACT_SUFFIX)
+    with os.fdopen(file_descriptor, "wb") as file:
+        file.write(content)
+    Path(temporary_path).replace(path)
+    return actual_checksum
+
+
+def write_artifact(ensemble):
+    """Store a TreeEnsemble as a content-addressed artifact.
+
+    Writing the same model twice is a no-op.
+
+    Returns:
+        str: The SHA-256 checksum that identifies the artifact.
+    """
+    return store_artifact(serialize_ensemble(ensemble))
+
+
+def load_artifact(checksum):
+    """Memory-map an artifact and verify its checksum.
+
+    Args:
+        checksum (str): The SHA-256 checksum returned by write_artifact.
+
+    Returns:
+        TreeEnsemble: The model, its arrays are read-only views of the mapped file.
+
+    Raises:
+        FileNotFoundError: If the artifact does not exist.
+        ValueError: If the content does not match the checksum.
+    """
+    with artifact_path(checksum).open("rb") as file:
+        # The mapping stays valid after the file is closed, the arrays keep it alive.
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if hashlib.sha256(buffer).hexdigest() != checksum:
+        msg = f"Model artifact {checksum} is corrupted"
+        raise ValueError(msg)
+    return deserialize_ensemble(buffer)
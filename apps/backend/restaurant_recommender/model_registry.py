@@ -0,0 +1,128 @@
+"""In-process registry for the active busyness prediction model.
+
+The compiled TreeEnsemble is memory-mapped from its model artifact once per process and kept in
+memory. A host without the artifact file, e.g. a new container, writes it from the database row
+first. Each lookup only reads a small version stamp from the cache, and the model is reloaded
+when that stamp no longer matches the loaded one.
+
+Typical usage example:
+
+    model, version = model_registry.get_model()
+"""
+
+import logging
+import pickle  # noqa: S403
+import threading
+
+from django.core.cache import cache
+
+from restaurant_recommender.model_artifacts import load_artifact, store_artifact
+from restaurant_recommender.models import PredictionModel  # type: ignore
+from restaurant_recommender.tree_ensemble import TreeEnsemble
+
+logger = logging.getLogger(__name__)
+
+MODEL_VERSION_CACHE_KEY = "prediction_model_version"
+
+
+def format_model_version(model_id, updated_at):
+    """Return the version stamp of a prediction model, e.g. ``"3-20240707120000000000"``."""
+    return f"{model_id}-{updated_at.strftime('%Y%m%d%H%M%S%f')}"
+
+
+def publish_model_version():
+    """Store the version stamp of the active prediction model in the cache.
+
+    Returns:
+        str: The published version stamp.
+
+    Raises:
+        PredictionModel.DoesNotExist: If there is no active prediction model.
+    """
+    model_id, updated_at = (
+        PredictionModel.objects.filter(is_active=True).values_list("id", "updated_at").latest("updated_at")
+    )
+    version = format_model_version(model_id, updated_at)
+    # Cache for 1 hour, the load_prediction_model task publishes it again every hour
+    cache.set(MODEL_VERSION_CACHE_KEY, version, timeout=3600)
+    return version
+
+
+class ModelRegistry:
+    """Keeps the active prediction model in memory, keyed by its version stamp."""
+
+    def __init__(self):
+        """Initialize the registry without a model, the first prediction loads the active one."""
+        self._lock = threading.Lock()
+        # (model, version) is swapped as a single tuple so readers never see a mixed pair.
+        self._active = (None, None)
+
+    @property
+    def active_version(self):
+        """The version stamp of the model currently loaded in this process, or None."""
+        return self._active[1]
+
+    def get_model(self):
+        """Return the active model and its version, reloading it only when the version changed.
+
+        Returns:
+            tuple: The compiled TreeEnsemble and its version stamp.
+
+        Raises:
+            PredictionModel.DoesNotExist: If there is no active prediction model.
+        """
+        version = cache.get(MODEL_VERSION_CACHE_KEY) or publish_model_version()
+        model, loaded_version = self._active
+        if version == loaded_version:
+            return model, loaded_version
+
+        with self._lock:
+            # Another thread may have loaded it while we were waiting for the lock.
+            if self._active[1] != version:
+                self._active = (self._load(version), version)
+            return self._active
+
+    def clear(self):
+        """Drop the loaded model, forcing a reload on the next lookup."""
+        with self._lock:
+            self._active = (None, None)
+
+    @staticmethod
+    def _load(version):
+        model_id = int(version.split("-", 1)[0])
+        model_name, artifact_sha256 = PredictionModel.objects.values_list("model_name", "artifact_sha256").get(
+            id=model_id
+        )
+
+        if artifact_sha256:
+            try:
+                model = load_artifact(artifact_sha256)
+            except FileNotFoundError:
+                model = ModelRegistry._restore(model_id, artifact_sha256)
+        else:
+            # Models stored before artifacts existed, see the export_model_artifacts command.
+            logger.warning(f"Prediction model {model_id} has no artifact, loading its legacy pickle")
+            pickle_file = PredictionModel.objects.values_list("pickle_file", flat=True).get(id=model_id)
+            if not pickle_file:
+                logger.warning(f"pickle_file of prediction model {model_id} is None or empty")
+                msg = "No active prediction model found"
+                raise PredictionModel.DoesNotExist(msg)
+            model = TreeEnsemble.from_booster(pickle.loads(pickle_file))  # noqa: S301
+
+        logger.info(f"Prediction model {model_name} loaded with version {version}")
+        return model
+
+    @staticmethod
+    def _restore(model_id, artifact_sha256):
+        """Write the artifact file of a model from its database row, then load it."""
+        content = PredictionModel.objects.values_list("artifact", flat=True).get(id=model_id)
+        if not content:
+            logger.error(f"Artifact {artifact_sha256} of prediction model {model_id} is neither on disk nor stored")
+            msg = "No active prediction model found"
+            raise PredictionModel.DoesNotExist(msg)
+        store_artifact(content, artifact_sha256)
+        logger.info(f"Artifact {artifact_sha256} of prediction model {model_id} restored from the database")
+        return load_artifact(artifact_sha256)
+
+
+model_registry = ModelRegistry()
@@ -21,6 +21,7 @@ class Restaurant(models.Model):
         latitude & longitude: Latitude and longitude of the restaurant.
         zone: Manhattan zone defined in database, where the restaurant is.
         telephone: Contact number of the restaurant.
+        photo_url: List of the unique URLs of the restaurant's photos, see photos.normalize_photo_urls.
 
     Returns:
         str: String representation of the restaurant name
@@ -39,7 +40,7 @@ class Restaurant(models.Model):
     value_rating = models.FloatField(blank=True, null=True)
     ambience_rating = models.FloatField(blank=True, null=True)
     noise_level = models.CharField(max_length=20, blank=True, null=True)
-    photo_url = models.TextField(blank=True, null=True)
+    photo_url = models.JSONField(default=list, blank=True)
     address = models.CharField(max_length=255, blank=True, null=True)
     location_id = models.IntegerField()
     dress_code = models.CharField(max_length=50, blank=True, null=True)
@@ -106,7 +107,9 @@ class PredictionModel(models.Model):
     Fields:
         model_name: Name of the machine learning model.
         description: Description of the machine learning model.
-        pickle_file: Serialized machine learning model file.
+        pickle_file: Legacy pickled machine learning model, only kept for models stored before artifacts.
+        artifact: Content of the compiled model artifact, the source of the files in MODEL_ARTIFACT_DIR.
+        artifact_sha256: Checksum of the compiled model artifact.
         restaurant: Foreign key to the Restaurant table, used for associating a prediction
         model with a specific zone in restaurant table.
         is_active: Indicates if the model is active for administrative purposes.
@@ -119,7 +122,9 @@ class PredictionModel(models.Model):
 
     model_name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
-    pickle_file = models.BinaryField()
+    pickle_file = models.BinaryField(blank=True, null=True)
+    artifact = models.BinaryField(blank=True, null=True)
+    artifact_sha256 = models.CharField(max_length=64, blank=True, default="")
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
     is_active = models.BooleanField(default=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -163,3 +168,94 @@ class WeatherData(models.Model):
         indexes = [
             models.Index(fields=["timestamp"]),
         ]
+
+
+class BusynessForecast(models.Model):
+    """Model representing a precomputed busyness forecast for every zone over a rolling horizon.
+
+    Fields:
+        start: Time of the first forecast step.
+        step_minutes: Minutes between two forecast steps.
+        steps: Number of forecast steps.
+        zones: Zone names, in the row order of values.
+        model_version: Version stamp of the prediction model that produced the forecast.
+        values: Float32 zone by step matrix of predicted values, in C order.
+        created_at: Timestamp of when the forecast was built.
+
+    Returns:
+        str: String representation of the forecast horizon
+    """
+
+    start = models.DateTimeField()
+    step_minutes = models.PositiveIntegerField()
+    steps = models.PositiveIntegerField()
+    zones = models.JSONField()
+    model_version = models.CharField(max_length=100)
+    values = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        """String representation of the forecast horizon."""
+        return f"Forecast from {self.start} - {self.steps} steps of {self.step_minutes} minutes"
+
+    class Meta:
+        """Meta class for the BusynessForecast model."""
+
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
+
+class DataVersion(models.Model):
+    """Model representing the version of a dataset that web processes keep in memory.
+
+    Fields:
+        name: Name of the dataset, e.g. "restaurants".
+        version: Incremented every time the dataset changes.
+        updated_at: Timestamp of the last change.
+
+    Returns:
+        str: String representation of the dataset version
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """String representation of the dataset version."""
+        return f"{self.name} - version {self.version}"
+
+
+class SimilarRestaurant(models.Model):
+    """Model representing one of the most similar restaurants of a restaurant.
+
+    The table is rebuilt by the build_similar_restaurants task, see
+    restaurant_recommender.similar_restaurants.
+
+    Fields:
+        restaurant: The restaurant the neighbor belongs to.
+        similar_restaurant: The neighbor.
+        similarity: Blend of the co-like and content similarities of both restaurants.
+        rank: Position of the neighbor, 1 for the most similar restaurant.
+
+    Returns:
+        str: String representation of the pair
+    """
+
+    restaurant = models.ForeignKey(Restaurant, related_name="similar_restaurants", on_delete=models.CASCADE)
+    similar_restaurant = models.ForeignKey(Restaurant, related_name="+", on_delete=models.CASCADE)
+    similarity = models.FloatField()
+    rank = models.PositiveIntegerField()
+
+    def __str__(self):
+        """String representation of the pair."""
+        return f"{self.restaurant_id} - {self.similar_restaurant_id} ({self.similarity:.3f})"
+
+    class Meta:
+        """Meta class for the SimilarRestaurant model."""
+
+        unique_together = ("restaurant", "similar_restaurant")
+        indexes = [
+            models.Index(fields=["restaurant", "rank"]),
+        ]
@@ -0,0 +1,278 @@
+"""In-memory index of the restaurant names, for substring, prefix and typo-tolerant search.
+
+Names are case folded, stripped of accents and reduced to words separated by single spaces.
+The index keeps them twice:
+
+* sorted, with the sorted suffixes of every name that start a word, so the names starting with a
+  query and the names with a word starting with it are two bisections each,
+* as trigrams of the name padded with two spaces in front and one behind, as pg_trgm does:
+  ``"joe s pizza"`` has ``"  j"``, ``" jo"``, ``"joe"``, ..., ``"za "``. Every trigram maps to
+  the sorted positions of the names that contain it.
+
+A query is answered by match type, best first, and stops as soon as the limit is reached: the
+whole name, the start of the name, the start of a word, anywhere in the name, then names sharing
+enough of its trigrams, so ``"pizzza"`` still finds ``"Joe's Pizza"``. The last two are found by
+counting, for every name, how many trigrams of the query it contains with one bincount over their
+postings. Matches of the same type are ranked by descending overall rating, similar names by
+their share of the query trigrams first.
+
+Each process builds the index with one query and only rebuilds it when the restaurants data
+version changes, i.e. after a loader ran.
+
+Typical usage example:
+
+    restaurant_ids = name_index_registry.search("pizza")
+    restaurants = matching_restaurants("pizza")
+"""
+
+import logging
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, IntegerField, When
+
+from restaurant_recommender.data_versions import RESTAURANTS, get_data_version
+from restaurant_recommender.models import Restaurant  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+NON_WORD = re.compile(r"[\W_]+")
+# Sorts after every character of a normalized name, closing the bisection range of a prefix.
+LAST_CHARACTER = chr(0x10FFFF)
+TRIGRAM_LENGTH = 3
+
+
+class NameIndex(NamedTuple):
+    """The index of the restaurant names, as built from one restaurants data version.
+
+    Attributes:
+        version: Restaurants data version the index was built from.
+        restaurant_ids: int64 id of the restaurant of every position, sorted.
+        names: Normalized name of every position.
+        ratings: float64 overall rating of every position, -1 when it has none.
+        sorted_names: The normalized names, sorted.
+        sorted_name_positions: int32 position of every name of sorted_names.
+        word_suffixes: The sorted suffixes of the names starting at their second word or later.
+        word_suffix_positions: int32 position of the name of every suffix of word_suffixes.
+        postings: Sorted int32 positions of the names containing every trigram.
+    """
+
+    version: int
+    restaurant_ids: np.ndarray
+    names: list
+    ratings: np.ndarray
+    sorted_names: list
+    sorted_name_positions: np.ndarray
+    word_suffixes: list
+    word_suffix_positions: np.ndarray
+    postings: dict
+
+
+def normalize_name(text):
+    """Return a name or query case folded, without accents, as words separated by single spaces."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(character for character in text if not unicodedata.combining(character))
+    return " ".join(NON_WORD.split(text)).strip()
+
+
+def trigrams(text):
+    """Return the set of trigrams of a normalized text padded with two spaces in front and one behind."""
+    padded = f"  {text} "
+    return {padded[start:start + 3] for start in range(len(padded) - 2)}
+
+
+def _sorted_with_positions(pairs):
+    """Sort (text, position) pairs by text, returning the texts and an int32 array of their positions."""
+    pairs = sorted(pairs)
+    return [text for text, _ in pairs], np.array([position for _, position in pairs], dtype=np.int32)
+
+
+def build_name_index(version):
+    """Build a NameIndex with one query over the restaurants.
+
+    Args:
+        version (int): Restaurants data version the index is built from.
+
+    Returns:
+        NameIndex: The index.
+    """
+    rows = list(Restaurant.objects.order_by("id").values_list("id", "restaurant_name", "overall_rating"))
+    names = [normalize_name(name or "") for _, name, _ in rows]
+
+    postings = {}
+    suffixes = []
+    for position, name in enumerate(names):
+        if not name:
+            continue
+        for gram in trigrams(name):
+            postings.setdefault(gram, []).append(position)
+        start = name.find(" ")
+        while start != -1:
+            suffixes.append((name[start + 1:], position))
+            start = name.find(" ", start + 1)
+
+    sorted_names, sorted_name_positions = _sorted_with_positions(
+        (name, position) for position, name in enumerate(names) if name
+    )
+    word_suffixes, word_suffix_positions = _sorted_with_positions(suffixes)
+    return NameIndex(
+        version=version,
+        restaurant_ids=np.array([row[0] for row in rows], dtype=np.int64),
+        names=names,
+        ratings=np.array([-1.0 if row[2] is None else row[2] for row in rows], dtype=np.float64),
+        sorted_names=sorted_names,
+        sorted_name_positions=sorted_name_positions,
+        word_suffixes=word_suffixes,
+        word_suffix_positions=word_suffix_positions,
+        postings={gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()},
+    )
+
+
+def _prefix_range(keys, positions, prefix):
+    """Return the positions of the sorted keys starting with a prefix."""
+    return positions[bisect_left(keys, prefix):bisect_left(keys, prefix + LAST_CHARACTER)]
+
+
+def search_name_index(index, query, limit, min_similarity):
+    """Return the restaurants whose names match a query, best match first.
+
+    Args:
+        index (NameIndex): The index to search.
+        query (str): The text typed by the user.
+        limit (int): Maximum number of restaurants returned.
+        min_similarity (float): Share of the query trigrams a name must contain to match it
+            without containing the query.
+
+    Returns:
+        numpy.ndarray: int64 ids of the matching restaurants: the names equal to the query, the
+        names starting with it, the names with a word starting with it, the names containing it,
+        then the similar names by descending share of the query trigrams. Ties are broken by
+        descending overall rating, then id.
+    """
+    query = normalize_name(query)
+    if not query or not index.names:
+        return np.empty(0, dtype=np.int64)
+
+    matched = np.zeros(len(index.names), dtype=bool)
+    results = []
+    remaining = limit
+
+    def add(positions, similarities=None):
+        nonlocal remaining
+        keep = ~matched[positions]
+        positions = positions[keep]
+        matched[positions] = True
+        similarities = np.ones(len(positions)) if similarities is None else similarities[keep]
+        order = np.lexsort((index.restaurant_ids[positions], -index.ratings[positions], -similarities))
+        results.append(positions[order[:remaining]])
+        remaining -= len(results[-1])
+
+    exact = index.sorted_name_positions[
+        bisect_left(index.sorted_names, query):bisect_right(index.sorted_names, query)
+    ]
+    add(exact)
+    if remaining > 0:
+        add(_prefix_range(index.sorted_names, index.sorted_name_positions, query))
+    if remaining > 0:
+        # A name has one suffix per word starting with the query.
+        add(np.unique(_prefix_range(index.word_suffixes, index.word_suffix_positions, query)))
+
+    # Queries shorter than a trigram only match the starts of the names and of their words.
+    if remaining > 0 and len(query) >= TRIGRAM_LENGTH:
+        # A name containing the query contains all of its unpadded trigrams.
+        inner_grams = {query[start:start + 3] for start in range(len(query) - 2)}
+        if inner_grams <= index.postings.keys():
+            inner_counts = np.bincount(
+                np.concatenate([index.postings[gram] for gram in inner_grams]), minlength=len(index.names)
+            )
+            candidates = np.flatnonzero((inner_counts == len(inner_grams)) & ~matched)
+            add(np.array([position for position in candidates.tolist() if query in index.names[position]], dtype=int))
+
+        grams = trigrams(query)
+        lists = [index.postings[gram] for gram in grams if gram in index.postings]
+        if lists and remaining > 0:
+            counts = np.bincount(np.concatenate(lists), minlength=len(index.names))
+            candidates = np.flatnonzero((counts >= max(math.ceil(min_similarity * len(grams)), 1)) & ~matched)
+            add(candidates, counts[candidates] / len(grams))
+
+    return index.restaurant_ids[np.concatenate(results)]
+
+
+class NameIndexRegistry:
+    """Keeps the NameIndex in memory, keyed by the restaurants data version."""
+
+    def __init__(self):
+        """Initialize the registry empty, the first search builds the index."""
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get_index(self):
+        """Return the name index, rebuilding it only when the restaurants data changed."""
+        version = get_data_version(RESTAURANTS)
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                self._index = build_name_index(version)
+                logger.info(
+                    f"Restaurant name index built for restaurants version {version}: "
+                    f"{len(self._index.names)} restaurants, {len(self._index.postings)} trigrams"
+                )
+            return self._index
+
+    def search(self, query, limit=None, min_similarity=None):
+        """Return the ids of the restaurants matching a query, see search_name_index.
+
+        Args:
+            query (str): The text typed by the user.
+            limit (int, optional): Maximum number of restaurants, RESTAURANT_NAME_SEARCH_LIMIT by default.
+            min_similarity (float, optional): RESTAURANT_NAME_SEARCH_MIN_SIMILARITY by default.
+
+        Returns:
+            numpy.ndarray: int64 ids of the matching restaurants, best match first.
+        """
+        return search_name_index(
+            self.get_index(),
+            query,
+            limit or settings.RESTAURANT_NAME_SEARCH_LIMIT,
+            settings.RESTAURANT_NAME_SEARCH_MIN_SIMILARITY if min_similarity is None else min_similarity,
+        )
+
+    def clear(self):
+        """Drop the index, forcing a rebuild on the next lookup."""
+        with self._lock:
+            self._index = None
+
+
+name_index_registry = NameIndexRegistry()
+
+
+def matching_restaurants(query, limit=None, cursor=0):
+    """Return a page of the restaurants whose names match a query as a queryset, best match first.
+
+    Args:
+        query (str): The text typed by the user.
+        limit (int, optional): Maximum number of restaurants, RESTAURANT_NAME_SEARCH_LIMIT by default.
+        cursor (int, optional): Number of best matches to skip, for the following pages.
+
+    Returns:
+        QuerySet: The matching restaurants, ordered as name_index_registry.search ranks them.
+    """
+    limit = limit or settings.RESTAURANT_NAME_SEARCH_LIMIT
+    restaurant_ids = name_index_registry.search(query, limit=cursor + limit).tolist()[cursor:]
+    if not restaurant_ids:
+        return Restaurant.objects.none()
+    return Restaurant.objects.filter(id__in=restaurant_ids).order_by(
+        Case(
+            *(When(id=restaurant_id, then=rank) for rank, restaurant_id in enumerate(restaurant_ids)),
+            output_field=IntegerField(),
+        )
+    )
@@ -0,0 +1,39 @@
+"""Normalization of the photo URLs of the restaurants, done once when they are written.
+
+The source files hold the photos of a restaurant as a JSON list, as a list in Python repr
+quoting (``"['https://...', 'https://...']"``) or as a single URL. Restaurant.photo_url stores
+them as a JSON list of unique URLs, so reading a restaurant never parses them.
+
+Typical usage example:
+
+    restaurant.photo_url = normalize_photo_urls(item.get("Photos"))
+"""
+
+import ast
+import json
+
+
+def normalize_photo_urls(value):
+    """Return the photo URLs of a loaded value as a list of unique URLs.
+
+    Args:
+        value: A list of URLs, a JSON or Python repr encoded list of URLs, a single URL, or None.
+
+    Returns:
+        list: The non-empty URLs, stripped, without duplicates, in their original order.
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            try:
+                value = json.loads(text)
+            except json.JSONDecodeError:
+                try:
+                    value = ast.literal_eval(text)
+                except (ValueError, SyntaxError):
+                    return []
+        else:
+            value = [text]
+    if not isinstance(value, list | tuple):
+        return []
+    return list(dict.fromkeys(url.strip() for url in value if isinstance(url, str) and url.strip()))
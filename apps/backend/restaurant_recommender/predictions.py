@@ -1,166 +1,285 @@
 """This file contains the functions to make predictions for restaurant busyness."""
 
-import pickle  # noqa: S403
-from datetime import datetime
+import logging
+from datetime import UTC, datetime
+
 import numpy as np
-import xgboost as xgb
+from django.conf import settings
 from django.core.cache import cache
+from django.utils import timezone
+
+from restaurant_recommender.forecast_grid import floor_to_step, forecast_grid, forecast_timestamps, save_forecast
+from restaurant_recommender.metrics import StageTimings
+from restaurant_recommender.model_registry import model_registry
+from restaurant_recommender.models import PredictionModel, WeatherData  # type: ignore
+from restaurant_recommender.time_features import featurize
+from restaurant_recommender.zone_registry import zone_registry
+
+logger = logging.getLogger(__name__)
+
+# Where a prediction was answered from: the forecast grid, the result cache, or the model.
+PREDICTION_LOOKUP_OUTCOMES = ("forecast", "hit", "miss")
+
+
+def build_feature_grid(location_ids, temp, dwpt, prcp, timestamps):
+    """Build the model input for every combination of zone and timestamp.
+
+    Rows are ordered zone by zone, so the predictions can be reshaped into a
+    (zones, timestamps) matrix. The time columns come from the precomputed tables of
+    ``time_features``.
+
+    Args:
+        location_ids: Sequence of DOLocationID values, one per zone.
+        temp: Temperature.
+        dwpt: Dewpoint.
+        prcp: Precipitation.
+        timestamps: Sequence of datetimes to predict for.
 
-from restaurant_recommender.models import PredictionModel, Restaurant, WeatherData  # type: ignore
+    Returns:
+        numpy.ndarray: A float32 matrix of shape (len(location_ids) * len(timestamps), len(FEATURE_NAMES)).
+    """
+    return featurize(timestamps, location_ids, temp, dwpt, prcp)
 
 
-def cos_transformer(period):
-    """Returns a function that calculates the cosine transformation of a given value.
+def build_feature_matrix(location_ids, temp, dwpt, prcp, selected_time):
+    """Build the model input for every zone at a single point in time.
 
     Args:
-        period: The period over which to calculate the transformation.
+        location_ids: Sequence of DOLocationID values, one per zone.
+        temp: Temperature.
+        dwpt: Dewpoint.
+        prcp: Precipitation.
+        selected_time (datetime): The time to predict for.
 
     Returns:
-        function: A function that takes a value and returns its cosine transformation.
+        numpy.ndarray: A float32 matrix of shape (len(location_ids), len(FEATURE_NAMES)).
     """
-    return lambda x: np.cos(x / period * 2 * np.pi)
+    return build_feature_grid(location_ids, temp, dwpt, prcp, [selected_time])
 
 
-def sin_transformer(period):
-    """Returns a function that calculates the sine transformation of a given value.
+def predict_grid(model, features, zone_count):
+    """Run a single batched prediction and shape the result as a zone by time matrix.
 
     Args:
-        period (int): The period over which to calculate the transformation.
+        model (TreeEnsemble): The compiled prediction model.
+        features (numpy.ndarray): The matrix returned by ``build_feature_grid``.
+        zone_count (int): Number of zones the features were built for.
 
     Returns:
-        function: A function that takes a value and returns its sine transformation.
+        numpy.ndarray: A float32 matrix of shape (zone_count, number of timestamps).
     """
-    return lambda x: np.sin(x / period * 2 * np.pi)
+    if not len(features):
+        return np.empty((zone_count, 0), dtype=np.float32)
+
+    return model.predict(features).reshape(zone_count, -1)
 
 
-def make_predictions(time):  # noqa: PLR0914, PLR0915
+def predict_zones(model, zones, features):
+    """Run a single batched prediction over all zones.
+
+    Args:
+        model (TreeEnsemble): The compiled prediction model.
+        zones: Sequence of zone names, aligned with the rows of ``features``.
+        features (numpy.ndarray): The matrix returned by ``build_feature_matrix``.
+
+    Returns:
+        list: A list of ``{"zone": ..., "predicted_value": ...}`` dictionaries.
+    """
+    if not len(zones):
+        return []
+
+    predicted_values = model.predict(features)
+    return [
+        {"zone": zone, "predicted_value": float(predicted_value)}
+        for zone, predicted_value in zip(zones, predicted_values, strict=True)
+    ]
+
+
+def get_weather():
+    """Return the latest temperature, dewpoint and precipitation, from the cache when possible."""
+    # Fetch weather data from cache
+    temp = cache.get("temperature")
+    dwpt = cache.get("dewpoint")
+    prcp = cache.get("precipitation")
+
+    if temp is None or dwpt is None or prcp is None:
+        weather_data = WeatherData.objects.latest("timestamp")
+        temp = weather_data.temperature
+        dwpt = weather_data.dewpoint
+        prcp = weather_data.precipitation
+        # Cache weather for an hour
+        cache.set("temperature", temp, timeout=3600)
+        cache.set("dewpoint", dwpt, timeout=3600)
+        cache.set("precipitation", prcp, timeout=3600)
+        logger.info("Weather data fetched from database and cached")
+
+    return temp, dwpt, prcp
+
+
+def record_prediction_lookup(outcome):
+    """Count where a prediction was answered from.
+
+    Args:
+        outcome (str): One of ``PREDICTION_LOOKUP_OUTCOMES``.
+    """
+    counter_key = f"busyness_prediction_{outcome}_count"
+    try:
+        cache.incr(counter_key)
+    except ValueError:
+        # The counter does not exist yet, or was removed by the clear_cache task.
+        cache.add(counter_key, 1, timeout=None)
+
+
+def get_prediction_lookup_stats():
+    """Return the prediction lookup counters and the share of lookups that skipped the model.
+
+    Returns:
+        dict: The count of every outcome and the hit rate between 0 and 1.
+    """
+    counts = cache.get_many([f"busyness_prediction_{outcome}_count" for outcome in PREDICTION_LOOKUP_OUTCOMES])
+    stats = {
+        outcome: counts.get(f"busyness_prediction_{outcome}_count", 0) for outcome in PREDICTION_LOOKUP_OUTCOMES
+    }
+    total = sum(stats.values())
+    stats["hit_rate"] = (stats["forecast"] + stats["hit"]) / total if total else 0.0
+    return stats
+
+
+def make_predictions(time, timings=None):
     """
     Make predictions for restaurant busyness based on the input data.
 
+    The time is rounded down to a bucket of ``BUSYNESS_PREDICTION_RESOLUTION_MINUTES`` minutes
+    before the lookup, so all requests within the same bucket share one prediction. The duration
+    of every stage is recorded in the ``busyness_prediction_stage_seconds`` histograms.
+
     Args:
         time: The time in '%Y-%m-%dT%H:%M:%S' format.
+        timings (StageTimings, optional): Collects the stage durations of this call, e.g. for a
+            Server-Timing header.
 
     Returns:
-        dict: A dictionary containing the predictions or an error message.
+        dict: A dictionary containing the predictions, the model version and the time bucket
+        that was used, or an error message.
     """
+    timings = timings or StageTimings()
     try:
-        # Generate a cache key based on the time and weather data
-        cache_key = f"busyness_prediction_{time}"
-        cached_result = cache.get(cache_key)
+        # Parse the time to datetime format and round it down to its prediction bucket
+        selected_time = datetime.strptime(time, "%Y-%m-%dT%H:%M:%S")
+        selected_time = floor_to_step(selected_time, settings.BUSYNESS_PREDICTION_RESOLUTION_MINUTES)
+        bucket = selected_time.strftime("%Y-%m-%dT%H:%M:%S")
+        logger.debug("Selected time: %s, prediction bucket: %s", time, bucket)
+
+        # Answer from the precomputed forecast when the bucket is one of its steps
+        with timings.stage("forecast_lookup"):
+            forecast_result = forecast_grid.lookup(selected_time)
+        if forecast_result:
+            record_prediction_lookup("forecast")
+            logger.debug("Retrieved forecast prediction for bucket: %s", bucket)
+            return {**forecast_result, "bucket": bucket}
+
+        # Generate a cache key based on the time bucket
+        cache_key = f"busyness_prediction_{bucket}"
+        with timings.stage("cache_lookup"):
+            cached_result = cache.get(cache_key)
         if cached_result:
-            print(f"Retrieved cached prediction for time: {time}")
+            record_prediction_lookup("hit")
+            logger.debug("Retrieved cached prediction for bucket: %s", bucket)
             return cached_result
 
-        # Try to get the model from the cache
-        model = cache.get("prediction_model")
-        if not model:
-            prediction_model = PredictionModel.objects.filter(is_active=True).latest("updated_at")
-            print(f"Prediction model loaded: {prediction_model.model_name}")
+        record_prediction_lookup("miss")
 
-            if not prediction_model.pickle_file:
-                print("Warning: pickle_file is None or empty")
-                return {"error": "No active prediction model found"}
+        # Get the model from this process' registry, it is only reloaded when its version changes
+        with timings.stage("model_fetch"):
+            model, model_version = model_registry.get_model()
 
-            model = pickle.loads(prediction_model.pickle_file)  # noqa: S301
-            # Cache for 1 hour
-            cache.set("prediction_model", model, timeout=3600)
-            print("Prediction model successfully loaded from pickle and cached")
+        with timings.stage("weather_fetch"):
+            temp, dwpt, prcp = get_weather()
 
-        # Parse the time to datetime format
-        selected_time = datetime.strptime(time, "%Y-%m-%dT%H:%M:%S")
-        print(f"Selected time: {selected_time}")
-
-        # Extract features from the selected time
-        day_of_week = selected_time.weekday() + 1
-        month = selected_time.month
-        hour = selected_time.hour
-        minute = selected_time.minute
-        print(f"Extracted features - Day of week: {day_of_week}, Month: {month}, Hour: {hour}, Minute: {minute}")
-
-        # Apply cosine and sine transformations to time features
-        month_cos = cos_transformer(12)(month)
-        hour_cos = cos_transformer(24)(hour)
-        minute_cos = cos_transformer(60)(minute)
-        dow_cos = cos_transformer(7)(day_of_week)
-        month_sin = sin_transformer(12)(month)
-        hour_sin = sin_transformer(24)(hour)
-        minute_sin = sin_transformer(60)(minute)
-        dow_sin = sin_transformer(7)(day_of_week)
-        print("Cosine and sine transformations applied.")
-
-        # Fetch weather data from cache
-        temp = cache.get("temperature")
-        dwpt = cache.get("dewpoint")
-        prcp = cache.get("precipitation")
-
-        if temp is None or dwpt is None or prcp is None:
-            weather_data = WeatherData.objects.latest("timestamp")
-            temp = weather_data.temperature
-            dwpt = weather_data.dewpoint
-            prcp = weather_data.precipitation
-            # Cache weather for an hour
-            cache.set("temperature", temp, timeout=3600)
-            cache.set("dewpoint", dwpt, timeout=3600)
-            cache.set("precipitation", prcp, timeout=3600)
-            print("Weather data fetched from database and cached")
-
-        # Retrieve all unique zones
-        zones_and_locations = Restaurant.objects.values_list("zone", "location_id").distinct()
-        print(f"Retrieved zones and location_ids: {zones_and_locations}")
-
-        predictions = []
-        for zone, location_id in zones_and_locations:
-            DOLocationID = location_id  # noqa: N806
-            input_features = np.array([
-                DOLocationID,
-                temp,
-                dwpt,
-                prcp,
-                day_of_week,
-                month_cos,
-                hour_cos,
-                minute_cos,
-                dow_cos,
-                month_sin,
-                hour_sin,
-                minute_sin,
-                dow_sin,
-            ]).reshape(1, -1)
-            print(f"Input features for location_id {location_id} in zone {zone}: {input_features}")
-
-            feature_names = [
-                "DOLocationID",
-                "temp",
-                "dwpt",
-                "prcp",
-                "day_of_week",
-                "month_cos",
-                "hour_cos",
-                "minute_cos",
-                "dow_cos",
-                "month_sin",
-                "hour_sin",
-                "minute_sin",
-                "dow_sin",
-            ]
-            dmatrix_input = xgb.DMatrix(input_features, feature_names=feature_names)
-            print("Converted input features to DMatrix.")
-            predicted_value = model.predict(dmatrix_input)
-            print(f"Prediction for zone {zone} with location_id {location_id}: {predicted_value}")
-
-            predicted_value = float(predicted_value[0])
-            predictions.append({"zone": zone, "predicted_value": predicted_value})
-
-        result = {"predictions": predictions}
+        # The zones come from this process' registry, it is only rebuilt when restaurants change
+        with timings.stage("zone_lookup"):
+            zone_index = zone_registry.get_index()
+
+        # Build one feature matrix for all zones and predict them in a single call
+        with timings.stage("feature_build"):
+            input_features = build_feature_matrix(zone_index.location_ids, temp, dwpt, prcp, selected_time)
+        with timings.stage("predict"):
+            predictions = predict_zones(model, zone_index.zones, input_features)
+
+        result = {"predictions": predictions, "model_version": model_version, "bucket": bucket}
         # Cache time for 10 minutes
-        cache.set(cache_key, result, timeout=600)
-        print(f"Cached prediction result for time: {time}")
+        with timings.stage("cache_write"):
+            cache.set(cache_key, result, timeout=600)
+        logger.debug(
+            "Predicted busyness for %d zones with model version %s and cached bucket %s",
+            len(predictions),
+            model_version,
+            bucket,
+        )
 
         return result  # noqa: TRY300
 
     except PredictionModel.DoesNotExist:
-        print("No active prediction model found.")
+        logger.warning("No active prediction model found.")
         return {"error": "No active prediction model found"}
     except ValueError as e:
-        print(f"Error during prediction: {e!s}")
+        logger.warning(f"Error during prediction: {e!s}")
         return {"error": str(e)}
+
+
+def predict_timeline(start, end, step_minutes):
+    """Predict the busyness of every zone at every step between start and end.
+
+    The steps are served from the forecast grid when all of them are inside its horizon,
+    otherwise every zone and step is predicted in a single batch.
+
+    Args:
+        start (datetime): The first time, rounded down to a multiple of step_minutes.
+        end (datetime): The last time, inclusive.
+        step_minutes (int): Minutes between two steps.
+
+    Returns:
+        dict: The zones, the timestamps, a float32 zone by timestamp matrix of predicted values
+        and the model version.
+    """
+    start = floor_to_step(start, step_minutes)
+    steps = int((end - start).total_seconds() // (step_minutes * 60)) + 1
+    timestamps = forecast_timestamps(start, step_minutes, max(steps, 0))
+
+    forecast_result = forecast_grid.lookup_many(timestamps)
+    if forecast_result:
+        zones, values, model_version = forecast_result
+    else:
+        model, model_version = model_registry.get_model()
+        temp, dwpt, prcp = get_weather()
+        zone_index = zone_registry.get_index()
+        zones = zone_index.zones
+
+        features = build_feature_grid(zone_index.location_ids, temp, dwpt, prcp, timestamps)
+        values = predict_grid(model, features, len(zones))
+
+    return {"zones": zones, "timestamps": timestamps, "values": values, "model_version": model_version}
+
+
+def build_busyness_forecast():
+    """Predict the busyness of every zone over the forecast horizon and store it.
+
+    The horizon starts at the current step and spans ``BUSYNESS_FORECAST_HORIZON_DAYS`` days of
+    ``BUSYNESS_FORECAST_STEP_MINUTES`` minute steps, all predicted in a single batch.
+
+    Returns:
+        BusynessForecast: The stored forecast.
+    """
+    step_minutes = settings.BUSYNESS_FORECAST_STEP_MINUTES
+    steps = settings.BUSYNESS_FORECAST_HORIZON_DAYS * 24 * 60 // step_minutes
+    start = floor_to_step(timezone.now().astimezone(UTC).replace(tzinfo=None), step_minutes)
+    timestamps = forecast_timestamps(start, step_minutes, steps)
+
+    model, model_version = model_registry.get_model()
+    temp, dwpt, prcp = get_weather()
+    zone_index = zone_registry.get_index()
+    zones = zone_index.zones
+
+    features = build_feature_grid(zone_index.location_ids, temp, dwpt, prcp, timestamps)
+    values = predict_grid(model, features, len(zones))
+    return save_forecast(start, step_minutes, zones, values, model_version)
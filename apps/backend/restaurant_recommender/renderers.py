@@ -0,0 +1,43 @@
+"""Renderers for restaurant recommender responses that are not JSON.
+
+Typical usage example:
+
+    class PredictBusynessTimeline(APIView):
+        renderer_classes = [JSONRenderer, MessagePackRenderer]
+
+    # Selected with the Accept header or the format query parameter.
+    response = self.client.get('/api/zone-busyness/?start=2024-07-07T00:00:00&format=msgpack')
+    response = self.client.get('/api/metrics/?format=prometheus')
+"""
+
+import msgpack  # type: ignore
+from rest_framework.renderers import BaseRenderer  # type: ignore
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renders response data with MessagePack, bytes values are sent as raw binary."""
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):  # noqa: ARG002
+        """Render data into MessagePack bytes."""
+        if data is None:
+            return b""
+        return msgpack.packb(data, use_bin_type=True)
+
+
+class PrometheusTextRenderer(BaseRenderer):
+    """Renders metrics that are already in the Prometheus text exposition format."""
+
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):  # noqa: ARG002
+        """Render the exposition text, as prepared by the view."""
+        if data is None:
+            return b""
+        return data.encode(self.charset)
@@ -19,7 +19,6 @@ Typical usage example:
     if serializer.is_valid():
         restaurant = serializer.save()
 """
-import json
 import ast
 from rest_framework import serializers
 from restaurant_recommender.models import Aspect, Restaurant
@@ -86,7 +85,6 @@ class LocationFreeEntrySearchViewSerializer(serializers.ModelSerializer):
 
 class MapRestaurantSearchSerializer(serializers.ModelSerializer):
     aspects = AspectSerializer(many=True, read_only=True)
-    photo_url = serializers.SerializerMethodField()
 
     """
     Serializer for Restaurant model focused on map search view.
@@ -99,7 +97,7 @@ class MapRestaurantSearchSerializer(serializers.ModelSerializer):
         longitude: Longitude of the restaurant.
         zone: Zone in Manhattan where the restaurant is located.
         location_id: Location identifier for the restaurant.
-        photo_url: URL of the restaurant's photo.
+        photo_url: List of the URLs of the restaurant's photos.
     """
     class Meta:
         model = Restaurant
@@ -110,22 +108,6 @@ class MapRestaurantSearchSerializer(serializers.ModelSerializer):
             'address', 'latitude', 'longitude', 'zone', 'location_id', 'aspects', 'photo_url'
         ]
 
-    def get_photo_url(self, obj):
-        # Convert JSON string to list
-        if obj.photo_url:
-            try:
-                return json.loads(obj.photo_url)
-            except json.JSONDecodeError:
-                return []
-        return []
-
-    def to_internal_value(self, data):
-        internal_value = super().to_internal_value(data)
-        # Convert list to JSON string
-        if 'photo_url' in data and isinstance(data['photo_url'], list):
-            internal_value['photo_url'] = json.dumps(data['photo_url'])
-        return internal_value
-
 
 class PredictionResultSerializer(serializers.Serializer):
     """
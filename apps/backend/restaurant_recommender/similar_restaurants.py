@@ -0,0 +1,114 @@
+"""Materialized table of the most similar restaurants of every restaurant.
+
+The SimilarRestaurant table stores the SIMILAR_RESTAURANTS_TOP_K most similar restaurants of
+every restaurant. Similarity blends how often the same users like both restaurants with the
+similarity of their aspects, cuisine, price, noise level and ratings. The
+build_similar_restaurants command rebuilds the table in chunks on a process pool, see
+restaurant_recommender.item_similarity; the Celery task of the same name computes the chunks in
+the worker process.
+
+Reading the similar restaurants of a restaurant is one indexed query.
+
+Typical usage example:
+
+    build_similar_restaurants_table()
+    similar_restaurants = get_similar_restaurants(restaurant_id)
+"""
+
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse  # type: ignore
+
+from restaurant_recommender.content_features import content_registry
+from restaurant_recommender.item_similarity import compute_top_k
+from restaurant_recommender.models import SimilarRestaurant  # type: ignore
+from user_management.models import UserLikedRestaurant  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Restaurant fields returned with every similar restaurant.
+SIMILAR_RESTAURANT_FIELDS = (
+    "restaurant_name",
+    "primary_cuisine",
+    "overall_rating",
+    "latitude",
+    "longitude",
+    "zone",
+    "price",
+    "photo_url",
+    "address",
+)
+
+
+def build_similar_restaurants_table(top_k=None, colike_weight=None, processes=None):
+    """Rebuild the whole SimilarRestaurant table.
+
+    Args:
+        top_k (int, optional): Neighbors kept per restaurant, SIMILAR_RESTAURANTS_TOP_K by default.
+        colike_weight (float, optional): Share of the co-like similarity,
+            SIMILAR_RESTAURANTS_COLIKE_WEIGHT by default.
+        processes (int, optional): Size of the process pool, SIMILAR_RESTAURANTS_PROCESSES by default.
+
+    Returns:
+        int: The number of rows written.
+    """
+    top_k = top_k or settings.SIMILAR_RESTAURANTS_TOP_K
+    colike_weight = settings.SIMILAR_RESTAURANTS_COLIKE_WEIGHT if colike_weight is None else colike_weight
+    processes = processes or settings.SIMILAR_RESTAURANTS_PROCESSES
+
+    index = content_registry.get_index()
+    restaurant_ids = index.restaurant_ids
+    pairs = np.array(
+        UserLikedRestaurant.objects.filter(restaurant_id__in=restaurant_ids.tolist()).values_list(
+            "user_id", "restaurant_id"
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    _, user_rows = np.unique(pairs[:, 0], return_inverse=True)
+    likes = sparse.csr_matrix(
+        (np.ones(len(pairs)), (user_rows, np.searchsorted(restaurant_ids, pairs[:, 1]))),
+        shape=(user_rows.max(initial=-1) + 1, len(restaurant_ids)),
+    )
+
+    rows, columns, similarities = compute_top_k(likes, index.features, top_k, colike_weight, processes=processes)
+    # Rows are grouped by restaurant and sorted by descending similarity, so ranks restart at every new restaurant.
+    group_starts = np.flatnonzero(np.diff(rows, prepend=-1))
+    ranks = np.arange(len(rows)) - np.repeat(group_starts, np.diff(np.append(group_starts, len(rows)))) + 1
+
+    neighbors = [
+        SimilarRestaurant(
+            restaurant_id=restaurant_id, similar_restaurant_id=similar_id, similarity=similarity, rank=rank
+        )
+        for restaurant_id, similar_id, similarity, rank in zip(
+            restaurant_ids[rows].tolist(), restaurant_ids[columns].tolist(), similarities.tolist(), ranks.tolist(),
+            strict=True,
+        )
+    ]
+    with transaction.atomic():
+        SimilarRestaurant.objects.all().delete()
+        SimilarRestaurant.objects.bulk_create(neighbors, batch_size=5000)
+
+    logger.info(f"Similar restaurants table built: {len(neighbors)} neighbors of {len(restaurant_ids)} restaurants")
+    return len(neighbors)
+
+
+def get_similar_restaurants(restaurant_id):
+    """Return the most similar restaurants of a restaurant with one indexed query.
+
+    Args:
+        restaurant_id (int): The restaurant to find neighbors for.
+
+    Returns:
+        list: Dictionaries with the ``id``, ``similarity`` and SIMILAR_RESTAURANT_FIELDS of every
+        similar restaurant, by descending similarity.
+    """
+    fields = [f"similar_restaurant__{field}" for field in SIMILAR_RESTAURANT_FIELDS]
+    return [
+        {"id": row[0], "similarity": row[1], **dict(zip(SIMILAR_RESTAURANT_FIELDS, row[2:], strict=True))}
+        for row in SimilarRestaurant.objects.filter(restaurant_id=restaurant_id)
+        .order_by("rank")
+        .values_list("similar_restaurant_id", "similarity", *fields)
+    ]
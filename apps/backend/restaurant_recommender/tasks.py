@@ -1,6 +1,5 @@
 """Celery tasks for loading the prediction model and fetching weather data."""
 
-import pickle  # noqa: S403
 from datetime import timedelta, datetime
 
 import requests  # type: ignore
@@ -12,7 +11,10 @@ from django.conf import settings
 import subprocess
 import os
 
+from restaurant_recommender.model_registry import model_registry, publish_model_version
 from restaurant_recommender.models import PredictionModel, WeatherData  # type: ignore
+from restaurant_recommender.predictions import build_busyness_forecast, get_prediction_lookup_stats
+from restaurant_recommender.similar_restaurants import build_similar_restaurants_table
 
 logger = get_task_logger(__name__)
 
@@ -64,6 +66,8 @@ def backup_database(self):
 def clear_cache(self):
     """Clear the entire cache."""
     try:
+        # The prediction lookup counters live in the cache, report them before they are cleared.
+        logger.info(f"Busyness prediction lookups since the last clear: {get_prediction_lookup_stats()}")
         cache.clear()
         print("Cache cleared successfully.")
     except Exception as e:
@@ -73,30 +77,17 @@ def clear_cache(self):
 
 @shared_task(bind=True, max_retries=3)
 def load_prediction_model(self):
-    """Load the prediction model from the database and save it to the cache."""
-    try:
-        # Attempt to get the model from the cache
-        model = cache.get("prediction_model")
-        if model:
-            logger.info("Prediction model retrieved from cache")
-            return  # Exit early if the model was retrieved from the cache
-
-        # Load the prediction model
-        prediction_model = PredictionModel.objects.filter(
-            is_active=True).latest("updated_at")
-        logger.info(f"Prediction model loaded: {prediction_model.model_name}")
-
-        # Ensure the pickle_file is not None or empty
-        if not prediction_model.pickle_file:
-            logger.warning("Warning: pickle_file is None or empty")
-            return
+    """Publish the version of the active prediction model and load it into this worker's registry.
 
-        model = pickle.loads(prediction_model.pickle_file)  # noqa: S301
-        logger.info("Prediction model successfully loaded from pickle")
+    Web workers keep the model in memory and compare this version stamp on every request,
+    so they reload the model only when the stamp changes.
+    """
+    try:
+        version = publish_model_version()
+        logger.info(f"Prediction model version published: {version}")
 
-        # Save the model to cache
-        cache.set("prediction_model", model, timeout=3600)
-        logger.info("Prediction model saved to cache")
+        model_registry.get_model()
+        logger.info(f"Prediction model version {version} loaded into the registry")
     except PredictionModel.DoesNotExist:
         logger.exception("No active prediction model found.")
     except Exception:
@@ -104,6 +95,37 @@ def load_prediction_model(self):
         self.retry(countdown=60)
 
 
+@shared_task(bind=True, max_retries=3)
+def build_busyness_forecast_grid(self):
+    """Precompute the busyness of every zone over the forecast horizon."""
+    try:
+        forecast = build_busyness_forecast()
+        logger.info(
+            f"Busyness forecast {forecast.id} built: {len(forecast.zones)} zones, "
+            f"{forecast.steps} steps of {forecast.step_minutes} minutes from {forecast.start}"
+        )
+    except PredictionModel.DoesNotExist:
+        logger.exception("No active prediction model found.")
+    except WeatherData.DoesNotExist:
+        logger.exception("No weather data found.")
+    except Exception as e:
+        logger.exception("Error during build_busyness_forecast_grid")
+        self.retry(exc=e, countdown=60)
+
+
+@shared_task(bind=True, max_retries=3)
+def build_similar_restaurants(self):
+    """Rebuild the table of the most similar restaurants of every restaurant."""
+    try:
+        # Prefork workers are daemonic and cannot start a process pool, the build_similar_restaurants
+        # command uses one.
+        row_count = build_similar_restaurants_table(processes=1)
+        logger.info(f"Similar restaurants table built with {row_count} rows")
+    except Exception as e:
+        logger.exception("Error during build_similar_restaurants")
+        self.retry(exc=e, countdown=60)
+
+
 @shared_task(bind=True, max_retries=3)
 def fetch_weather_data(self):
     """Fetch weather data from the Open-Meteo API and store it in the database."""
@@ -290,3 +290,1269 @@ TODO: (RiinKal): This API endpoint might not be used at all
         self.assertEqual(restaurant['aspects'][0]['count'], 31)
         self.assertEqual(restaurant['aspects'][0]['restaurant'], 2925)
         """
+
+import gzip
+import json
+import os
+import pickle  # noqa: S403
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import brotli  # type: ignore
+import msgpack  # type: ignore
+import numpy as np
+import xgboost as xgb
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status  # type: ignore
+from rest_framework.renderers import JSONRenderer  # type: ignore
+from rest_framework.reverse import reverse  # type: ignore
+from scipy import sparse  # type: ignore
+
+from restaurant_recommender.autocomplete import autocomplete_registry
+from restaurant_recommender.catalog import accepted_encodings, catalog_registry
+from restaurant_recommender.content_features import content_registry
+from restaurant_recommender.data_versions import RESTAURANTS, bump_data_version, get_data_version
+from restaurant_recommender.forecast_grid import forecast_grid
+from restaurant_recommender.item_similarity import compute_top_k
+from restaurant_recommender.metrics import PREDICTION_STAGES, STAGE_METRIC, StageTimings, metrics_registry
+from restaurant_recommender.model_artifacts import (
+    artifact_path,
+    load_artifact,
+    serialize_ensemble,
+    store_artifact,
+    write_artifact,
+)
+from restaurant_recommender.model_registry import (
+    MODEL_VERSION_CACHE_KEY,
+    ModelRegistry,
+    model_registry,
+    publish_model_version,
+)
+from restaurant_recommender.models import (  # type: ignore
+    Aspect,
+    PredictionModel,
+    Restaurant,
+    SimilarRestaurant,
+    WeatherData,
+)
+from restaurant_recommender.name_index import matching_restaurants, name_index_registry, normalize_name
+from restaurant_recommender.photos import normalize_photo_urls
+from restaurant_recommender.predictions import (  # type: ignore
+    build_busyness_forecast,
+    build_feature_matrix,
+    get_prediction_lookup_stats,
+    make_predictions,
+    predict_zones,
+)
+from restaurant_recommender.restaurant_rows import map_restaurant_rows, search_restaurant_rows
+from restaurant_recommender.serializers import LocationFreeEntrySearchViewSerializer, MapRestaurantSearchSerializer
+from restaurant_recommender.similar_restaurants import build_similar_restaurants_table, get_similar_restaurants
+from restaurant_recommender.time_features import FEATURE_NAMES, featurize
+from restaurant_recommender.tree_ensemble import TreeEnsemble
+from restaurant_recommender.views import timeline_range
+from restaurant_recommender.zone_registry import zone_registry
+from user_management.models import UserLikedRestaurant  # type: ignore
+
+# To run these tests use: python manage.py test restaurant_recommender.tests
+# The benchmarks print their timings, run them with: RUN_BENCHMARKS=1 python manage.py test restaurant_recommender.tests
+benchmark = unittest.skipUnless(os.environ.get("RUN_BENCHMARKS"), "set RUN_BENCHMARKS=1 to run the benchmarks")
+
+
+def load_sample_model():
+    """Load the XGBoost booster shipped in the data directory."""
+    with (settings.BASE_DIR / "data" / "XGBoost.pkl").open("rb") as file:
+        return pickle.load(file)  # noqa: S301
+
+
+sample_zones = [(f"Zone {location_id}", location_id) for location_id in range(1, 70)]
+sample_weather = (21.4, 12.3, 0.2)
+sample_time = datetime(2024, 7, 7, 12, 0, 0)
+
+
+class BatchedPredictionTest(SimpleTestCase):
+    """Compares the batched zone inference with the previous per-zone loop."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Load the sample model once, as a booster and as a tree ensemble."""
+        super().setUpClass()
+        cls.booster = load_sample_model()
+        cls.model = TreeEnsemble.from_booster(cls.booster)
+        cls.zones = [zone for zone, _ in sample_zones]
+        cls.location_ids = [location_id for _, location_id in sample_zones]
+
+    def predict_per_zone(self):
+        """Predict every zone with its own DMatrix, as make_predictions used to."""
+        features = build_feature_matrix(self.location_ids, *sample_weather, sample_time)
+        predictions = []
+        for zone, row in zip(self.zones, features, strict=True):
+            dmatrix_input = xgb.DMatrix(row.reshape(1, -1), feature_names=FEATURE_NAMES)
+            predictions.append({"zone": zone, "predicted_value": float(self.booster.predict(dmatrix_input)[0])})
+        return predictions
+
+    def predict_batched(self):
+        """Predict every zone with one batch."""
+        features = build_feature_matrix(self.location_ids, *sample_weather, sample_time)
+        return predict_zones(self.model, self.zones, features)
+
+    def test_batched_matches_per_zone(self):
+        """Test that the batched predictions match the per-zone predictions."""
+        per_zone = self.predict_per_zone()
+        batched = self.predict_batched()
+
+        self.assertEqual([p["zone"] for p in batched], [p["zone"] for p in per_zone])
+        np.testing.assert_allclose(
+            [p["predicted_value"] for p in batched],
+            [p["predicted_value"] for p in per_zone],
+            atol=1e-5,
+        )
+
+    def test_no_zones(self):
+        """Test that an empty batch predicts nothing."""
+        features = build_feature_matrix([], *sample_weather, sample_time)
+        self.assertEqual(predict_zones(self.model, [], features), [])
+
+    @benchmark
+    def test_batched_prediction_performance(self):
+        """Print the time of the per-zone and the batched predictions."""
+        rounds = 20
+
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            self.predict_per_zone()
+        per_zone_time = (time.perf_counter() - start_time) / rounds
+
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            self.predict_batched()
+        batched_time = (time.perf_counter() - start_time) / rounds
+
+        print(f"Per-zone prediction time for {len(self.zones)} zones: {per_zone_time * 1000:.2f} ms")
+        print(f"Batched prediction time for {len(self.zones)} zones: {batched_time * 1000:.2f} ms")
+
+
+class ModelRegistryTest(TestCase):
+    """Tests that the model is kept in memory and reloaded only when its version changes."""
+
+    def setUp(self):
+        """Create a restaurant and an active prediction model, with an empty registry."""
+        cache.clear()
+        restaurant = Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=1)
+        with (settings.BASE_DIR / "data" / "XGBoost.pkl").open("rb") as file:
+            self.prediction_model = PredictionModel.objects.create(
+                model_name="XGBoost", pickle_file=file.read(), restaurant=restaurant
+            )
+        self.registry = ModelRegistry()
+
+    def test_model_is_loaded_once(self):
+        """Test that the model is kept in memory and its version read without queries."""
+        model, version = self.registry.get_model()
+        self.assertIsInstance(model, TreeEnsemble)
+        self.assertEqual(cache.get(MODEL_VERSION_CACHE_KEY), version)
+        self.assertEqual(self.registry.active_version, version)
+
+        # The version stamp is read from the cache, so no database query is needed.
+        with self.assertNumQueries(0):
+            cached_model, cached_version = self.registry.get_model()
+        self.assertIs(cached_model, model)
+        self.assertEqual(cached_version, version)
+
+    def test_model_is_reloaded_when_version_changes(self):
+        """Test that publishing a new version reloads the model."""
+        model, version = self.registry.get_model()
+
+        self.prediction_model.save()
+        new_version = publish_model_version()
+        self.assertNotEqual(new_version, version)
+
+        reloaded_model, reloaded_version = self.registry.get_model()
+        self.assertIsNot(reloaded_model, model)
+        self.assertEqual(reloaded_version, new_version)
+
+    def test_no_active_model(self):
+        """Test that DoesNotExist is raised without an active model."""
+        PredictionModel.objects.update(is_active=False)
+        with self.assertRaises(PredictionModel.DoesNotExist):
+            self.registry.get_model()
+
+
+@override_settings(
+    BUSYNESS_FORECAST_HORIZON_DAYS=1, BUSYNESS_FORECAST_STEP_MINUTES=30, BUSYNESS_PREDICTION_RESOLUTION_MINUTES=5
+)
+class BusynessForecastTest(TestCase):
+    """Tests that predictions inside the forecast horizon are served from the precomputed grid."""
+
+    def setUp(self):
+        """Create five zones, a model and weather data, then build the forecast."""
+        cache.clear()
+        model_registry.clear()
+        forecast_grid.clear()
+        zone_registry.clear()
+        for zone, location_id in sample_zones[:5]:
+            restaurant = Restaurant.objects.create(restaurant_name=zone, zone=zone, location_id=location_id)
+        with (settings.BASE_DIR / "data" / "XGBoost.pkl").open("rb") as file:
+            PredictionModel.objects.create(model_name="XGBoost", pickle_file=file.read(), restaurant=restaurant)
+        WeatherData.objects.create(temperature=21.4, dewpoint=12.3, precipitation=0.2)
+        self.forecast = build_busyness_forecast()
+        self.start = forecast_grid.get_forecast().start
+
+    def live_predictions(self, selected_time):
+        """Predict the five zones at selected_time with the model."""
+        model, _ = model_registry.get_model()
+        zones = [zone for zone, _ in sample_zones[:5]]
+        location_ids = [location_id for _, location_id in sample_zones[:5]]
+        features = build_feature_matrix(location_ids, *sample_weather, selected_time)
+        return predict_zones(model, zones, features)
+
+    def test_forecast_shape(self):
+        """Test the number of steps and values of a one day forecast."""
+        self.assertEqual(self.forecast.steps, 48)
+        self.assertEqual(len(self.forecast.values), 5 * 48 * 4)
+
+    def test_prediction_inside_horizon_uses_forecast(self):
+        """Test that times inside the horizon are read from the forecast without queries."""
+        selected_time = self.start + timedelta(hours=3)
+
+        with self.assertNumQueries(0):
+            result = make_predictions(selected_time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+        expected = self.live_predictions(selected_time)
+        self.assertEqual([p["zone"] for p in result["predictions"]], [p["zone"] for p in expected])
+        np.testing.assert_allclose(
+            [p["predicted_value"] for p in result["predictions"]],
+            [p["predicted_value"] for p in expected],
+            rtol=1e-6,
+        )
+
+    def test_prediction_outside_horizon_falls_back_to_model(self):
+        """Test that times after the horizon or between steps are predicted by the model."""
+        for selected_time in (self.start + timedelta(days=2), self.start + timedelta(minutes=10)):
+            self.assertIsNone(forecast_grid.lookup(selected_time))
+            result = make_predictions(selected_time.strftime("%Y-%m-%dT%H:%M:%S"))
+            self.assertEqual(len(result["predictions"]), 5)
+
+
+@override_settings(BUSYNESS_PREDICTION_RESOLUTION_MINUTES=15)
+class PredictionBucketTest(TestCase):
+    """Tests that requested times are rounded to a bucket before prediction and caching."""
+
+    def setUp(self):
+        """Create a restaurant, a model and weather data with empty registries."""
+        cache.clear()
+        model_registry.clear()
+        forecast_grid.clear()
+        zone_registry.clear()
+        restaurant = Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=1)
+        with (settings.BASE_DIR / "data" / "XGBoost.pkl").open("rb") as file:
+            PredictionModel.objects.create(model_name="XGBoost", pickle_file=file.read(), restaurant=restaurant)
+        WeatherData.objects.create(temperature=21.4, dewpoint=12.3, precipitation=0.2)
+
+    def test_times_in_same_bucket_share_prediction(self):
+        """Test that times of the same bucket share one cached prediction."""
+        first = make_predictions("2024-07-07T12:00:01")
+        second = make_predictions("2024-07-07T12:14:59")
+        third = make_predictions("2024-07-07T12:15:00")
+
+        self.assertEqual(first["bucket"], "2024-07-07T12:00:00")
+        self.assertEqual(second, first)
+        self.assertEqual(third["bucket"], "2024-07-07T12:15:00")
+        self.assertIsNotNone(cache.get("busyness_prediction_2024-07-07T12:00:00"))
+
+        stats = get_prediction_lookup_stats()
+        self.assertEqual(stats["hit"], 1)
+        self.assertEqual(stats["miss"], 2)
+        self.assertAlmostEqual(stats["hit_rate"], 1 / 3)
+
+
+@override_settings(BUSYNESS_PREDICTION_RESOLUTION_MINUTES=15)
+class PredictBusynessTimelineTest(TestCase):
+    """Tests the zone by time busyness matrix endpoint."""
+
+    def setUp(self):
+        """Create three zones, a model and weather data with empty registries."""
+        cache.clear()
+        model_registry.clear()
+        forecast_grid.clear()
+        zone_registry.clear()
+        for zone, location_id in sample_zones[:3]:
+            restaurant = Restaurant.objects.create(restaurant_name=zone, zone=zone, location_id=location_id)
+        with (settings.BASE_DIR / "data" / "XGBoost.pkl").open("rb") as file:
+            PredictionModel.objects.create(model_name="XGBoost", pickle_file=file.read(), restaurant=restaurant)
+        WeatherData.objects.create(temperature=21.4, dewpoint=12.3, precipitation=0.2)
+        self.url = reverse("predict-busyness-timeline")
+        self.params = {"start": "2024-07-07T00:00:00", "end": "2024-07-07T23:45:00", "step": 15}
+
+    def test_json_matches_single_predictions(self):
+        """Test that the timeline matches the predictions of its times one at a time."""
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+
+        self.assertEqual(data["shape"], [3, 96])
+        self.assertEqual(data["timestamps"][0], "2024-07-07T00:00:00")
+        self.assertEqual(data["timestamps"][-1], "2024-07-07T23:45:00")
+
+        for time_index in (0, 48, 95):
+            single = make_predictions(data["timestamps"][time_index])
+            self.assertEqual([p["zone"] for p in single["predictions"]], data["zones"])
+            np.testing.assert_allclose(
+                [row[time_index] for row in data["values"]],
+                [p["predicted_value"] for p in single["predictions"]],
+                rtol=1e-6,
+            )
+
+    def test_msgpack_matches_json(self):
+        """Test that the msgpack timeline holds the same values as the JSON one."""
+        json_data = self.client.get(self.url, self.params).json()
+        response = self.client.get(self.url, {**self.params, "format": "msgpack"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+
+        data = msgpack.unpackb(response.content)
+        values = np.frombuffer(data["values"], dtype="<f4").reshape(data["shape"])
+        self.assertEqual(data["zones"], json_data["zones"])
+        np.testing.assert_array_equal(values, np.array(json_data["values"], dtype=np.float32))
+
+    def test_invalid_parameters(self):
+        """Test that missing, malformed and too large ranges return 400."""
+        for params in (
+            {"start": "2024-07-07T00:00:00"},
+            {**self.params, "end": "2024-07-06T00:00:00"},
+            {**self.params, "step": 0},
+            {**self.params, "start": "yesterday"},
+            {**self.params, "end": "2024-08-07T00:00:00", "step": 1},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_range_counts_steps_from_rounded_start(self):
+        """Test that the number of times is bounded from the start rounded down to the step."""
+        params = {"start": "2024-07-07T00:03:00", "end": "2024-07-07T00:07:00", "step": "5"}
+        self.assertEqual(timeline_range(params, 2)[0], datetime(2024, 7, 7))
+        # 00:00, 00:05 and 00:10 are three times although end - start is less than two steps.
+        with self.assertRaises(ValueError):
+            timeline_range({**params, "end": "2024-07-07T00:12:00"}, 2)
+
+    def test_missing_weather_and_artifact(self):
+        """Test that missing weather data and model artifacts return JSON errors."""
+        WeatherData.objects.all().delete()
+        response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(response.json(), {"error": "No weather data found"})
+
+        for error in (FileNotFoundError("artifact"), ValueError("checksum mismatch")):
+            with patch("restaurant_recommender.views.predict_timeline", side_effect=error):
+                response = self.client.get(self.url, self.params)
+            self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+            self.assertEqual(response.json(), {"error": "The prediction model artifact could not be loaded"})
+
+
+class TreeEnsembleTest(SimpleTestCase):
+    """Compares the NumPy tree ensemble evaluator with xgboost."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Compile the sample booster and draw random feature rows."""
+        super().setUpClass()
+        cls.booster = load_sample_model()
+        cls.ensemble = TreeEnsemble.from_booster(cls.booster)
+
+        rng = np.random.default_rng(42)
+        row_count = 5000
+        cls.features = np.column_stack([
+            rng.integers(1, 265, row_count),
+            rng.normal(20, 8, row_count),
+            rng.normal(10, 8, row_count),
+            rng.exponential(0.5, row_count),
+            rng.integers(1, 8, row_count),
+            rng.uniform(-1, 1, (row_count, 8)),
+        ]).astype(np.float32)
+
+    def predict_xgboost(self, features):
+        """Predict features with the XGBoost booster."""
+        return self.booster.predict(xgb.DMatrix(features, feature_names=FEATURE_NAMES))
+
+    def test_matches_xgboost(self):
+        """Test that the ensemble predicts the same values as XGBoost."""
+        np.testing.assert_allclose(self.ensemble.predict(self.features), self.predict_xgboost(self.features), atol=1e-5)
+
+    def test_missing_values_follow_default_direction(self):
+        """Test that NaN features take the default direction of every split."""
+        features = self.features.copy()
+        features[::3, 1] = np.nan
+        features[::7, 3] = np.nan
+        np.testing.assert_allclose(self.ensemble.predict(features), self.predict_xgboost(features), atol=1e-5)
+
+    def test_empty_batch(self):
+        """Test that an empty batch predicts an empty array."""
+        self.assertEqual(self.ensemble.predict(np.empty((0, len(FEATURE_NAMES)))).shape, (0,))
+
+    def test_unsupported_objective(self):
+        """Test that models with another objective are rejected."""
+        model_json = json.loads(self.booster.save_raw(raw_format="json"))
+        model_json["learner"]["objective"]["name"] = "binary:logistic"
+        with self.assertRaises(ValueError):
+            TreeEnsemble.from_json(model_json)
+
+    @benchmark
+    def test_prediction_performance(self):
+        """Print the prediction time of XGBoost and of the ensemble for several batch sizes."""
+        rounds = 20
+        for row_count in (1, 69, 5000):
+            features = self.features[:row_count]
+
+            start_time = time.perf_counter()
+            for _ in range(rounds):
+                self.predict_xgboost(features)
+            xgboost_time = (time.perf_counter() - start_time) / rounds
+
+            start_time = time.perf_counter()
+            for _ in range(rounds):
+                self.ensemble.predict(features)
+            ensemble_time = (time.perf_counter() - start_time) / rounds
+
+            print(f"xgboost DMatrix + predict time for {row_count} rows: {xgboost_time * 1000:.3f} ms")
+            print(f"NumPy tree ensemble time for {row_count} rows: {ensemble_time * 1000:.3f} ms")
+
+
+class ModelArtifactTest(TestCase):
+    """Tests the content-addressed model artifacts."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Compile the sample booster and draw random feature rows."""
+        super().setUpClass()
+        cls.booster = load_sample_model()
+        cls.ensemble = TreeEnsemble.from_booster(cls.booster)
+        cls.features = build_feature_matrix([1, 50, 100, 230], *sample_weather, sample_time)
+
+    def setUp(self):
+        """Point MODEL_ARTIFACT_DIR to a temporary directory."""
+        cache.clear()
+        temporary_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary_directory.cleanup)
+        settings_override = override_settings(MODEL_ARTIFACT_DIR=temporary_directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_round_trip(self):
+        """Test that a loaded artifact predicts like the ensemble it was written from."""
+        checksum = write_artifact(self.ensemble)
+        self.assertEqual(write_artifact(self.ensemble), checksum)
+
+        loaded = load_artifact(checksum)
+        self.assertEqual(loaded.feature_names, FEATURE_NAMES)
+        self.assertEqual(loaded.max_depth, self.ensemble.max_depth)
+        np.testing.assert_array_equal(loaded.predict(self.features), self.ensemble.predict(self.features))
+
+    def test_corrupted_artifact(self):
+        """Test that an artifact not matching its checksum is rejected."""
+        checksum = write_artifact(self.ensemble)
+        path = artifact_path(checksum)
+        content = bytearray(path.read_bytes())
+        content[-1] ^= 0xFF
+        path.write_bytes(bytes(content))
+
+        with self.assertRaises(ValueError):
+            load_artifact(checksum)
+
+    def test_registry_loads_artifact(self):
+        """Test that the registry loads the artifact of the active model."""
+        restaurant = Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=1)
+        PredictionModel.objects.create(
+            model_name="XGBoost", artifact_sha256=write_artifact(self.ensemble), restaurant=restaurant
+        )
+
+        model, _ = ModelRegistry().get_model()
+        np.testing.assert_array_equal(model.predict(self.features), self.ensemble.predict(self.features))
+
+    def test_registry_restores_missing_artifact(self):
+        """Test that the registry rewrites a missing artifact file from the database."""
+        restaurant = Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=1)
+        content = serialize_ensemble(self.ensemble)
+        checksum = store_artifact(content)
+        PredictionModel.objects.create(
+            model_name="XGBoost", artifact=content, artifact_sha256=checksum, restaurant=restaurant
+        )
+        # A new container starts without the artifact files.
+        artifact_path(checksum).unlink()
+
+        model, _ = ModelRegistry().get_model()
+        np.testing.assert_array_equal(model.predict(self.features), self.ensemble.predict(self.features))
+        self.assertEqual(artifact_path(checksum).read_bytes(), content)
+
+    def test_registry_without_artifact_content(self):
+        """Test that a model without artifact file or content is not loaded."""
+        restaurant = Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=1)
+        checksum = write_artifact(self.ensemble)
+        PredictionModel.objects.create(model_name="XGBoost", artifact_sha256=checksum, restaurant=restaurant)
+        artifact_path(checksum).unlink()
+
+        with self.assertRaises(PredictionModel.DoesNotExist):
+            ModelRegistry().get_model()
+
+    @benchmark
+    def test_cold_start_performance(self):
+        """Print the load time of the model from a pickle and from an artifact."""
+        with (settings.BASE_DIR / "data" / "XGBoost.pkl").open("rb") as file:
+            pickle_data = file.read()
+        checksum = write_artifact(self.ensemble)
+        rounds = 20
+
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            TreeEnsemble.from_booster(pickle.loads(pickle_data))  # noqa: S301
+        pickle_time = (time.perf_counter() - start_time) / rounds
+
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            load_artifact(checksum)
+        artifact_time = (time.perf_counter() - start_time) / rounds
+
+        print(f"Model load time from pickle: {pickle_time * 1000:.2f} ms ({len(pickle_data)} bytes)")
+        print(f"Model load time from artifact: {artifact_time * 1000:.2f} ms ({artifact_path(checksum).stat().st_size} bytes)")
+
+
+class ZoneRegistryTest(TestCase):
+    """Tests that the zones are kept in memory and rebuilt only when restaurant data changes."""
+
+    def setUp(self):
+        """Create restaurants in three zones, a model and weather data."""
+        cache.clear()
+        model_registry.clear()
+        forecast_grid.clear()
+        zone_registry.clear()
+        self.restaurants = [
+            Restaurant.objects.create(restaurant_name=f"Restaurant {index}", zone=zone, location_id=location_id)
+            for index, (zone, location_id) in enumerate(sample_zones[:3] * 2)
+        ]
+        with (settings.BASE_DIR / "data" / "XGBoost.pkl").open("rb") as file:
+            PredictionModel.objects.create(model_name="XGBoost", pickle_file=file.read(), restaurant=self.restaurants[0])
+        WeatherData.objects.create(temperature=21.4, dewpoint=12.3, precipitation=0.2)
+
+    def test_index_maps(self):
+        """Test the zones, location IDs and restaurants of every zone."""
+        index = zone_registry.get_index()
+        self.assertEqual(index.zones, [zone for zone, _ in sample_zones[:3]])
+        np.testing.assert_array_equal(index.location_ids, [1, 2, 3])
+
+        restaurant = self.restaurants[4]
+        self.assertEqual(zone_registry.zone_of(restaurant.id), restaurant.zone)
+        np.testing.assert_array_equal(
+            zone_registry.restaurants_in(restaurant.zone), [self.restaurants[1].id, restaurant.id]
+        )
+        self.assertIsNone(zone_registry.zone_of(0))
+        self.assertEqual(len(zone_registry.restaurants_in("Unknown")), 0)
+
+    def test_prediction_without_database_queries(self):
+        """Test that predictions read the zones from the index, without queries."""
+        make_predictions("2024-07-07T12:00:00")
+
+        # The model, the weather and the zones are all in memory or in the cache now.
+        with self.assertNumQueries(0):
+            result = make_predictions("2024-07-07T13:00:00")
+        self.assertEqual([p["zone"] for p in result["predictions"]], zone_registry.get_index().zones)
+
+    def test_index_is_rebuilt_when_restaurants_change(self):
+        """Test that the index is rebuilt when the restaurants data version changes."""
+        index = zone_registry.get_index()
+        with self.assertNumQueries(0):
+            self.assertIs(zone_registry.get_index(), index)
+
+        Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=90)
+        self.assertIs(zone_registry.get_index(), index)
+
+        bump_data_version(RESTAURANTS)
+        rebuilt_index = zone_registry.get_index()
+        self.assertIn("Flatiron", rebuilt_index.zones)
+        self.assertEqual(len(rebuilt_index.zones), 4)
+
+
+class TimeFeaturesTest(SimpleTestCase):
+    """Compares the table based time features with the per-value sine and cosine transformers."""
+
+    timestamps = [
+        datetime(2024, 1, 1, 0, 0),
+        datetime(2024, 2, 29, 23, 59),
+        sample_time,
+        datetime(2024, 12, 31, 18, 45),
+        datetime(2023, 10, 15, 7, 30),
+    ]
+
+    @staticmethod
+    def transformer_features(location_id, selected_time):
+        """The feature row as make_predictions used to build it, one transformer per value."""
+
+        def cos_transformer(period):
+            return lambda x: np.cos(x / period * 2 * np.pi)
+
+        def sin_transformer(period):
+            return lambda x: np.sin(x / period * 2 * np.pi)
+
+        day_of_week = selected_time.weekday() + 1
+        return [
+            location_id,
+            *sample_weather,
+            day_of_week,
+            cos_transformer(12)(selected_time.month),
+            cos_transformer(24)(selected_time.hour),
+            cos_transformer(60)(selected_time.minute),
+            cos_transformer(7)(day_of_week),
+            sin_transformer(12)(selected_time.month),
+            sin_transformer(24)(selected_time.hour),
+            sin_transformer(60)(selected_time.minute),
+            sin_transformer(7)(day_of_week),
+        ]
+
+    def test_featurize_matches_transformers(self):
+        """Test that the feature table matches the time transformers."""
+        location_ids = [1, 50, 230]
+        features = featurize(self.timestamps, location_ids, *sample_weather)
+        self.assertEqual(features.shape, (len(location_ids) * len(self.timestamps), len(FEATURE_NAMES)))
+        self.assertEqual(features.dtype, np.float32)
+
+        expected = [
+            self.transformer_features(location_id, timestamp)
+            for location_id in location_ids
+            for timestamp in self.timestamps
+        ]
+        np.testing.assert_array_equal(features, np.array(expected, dtype=np.float32))
+
+    def test_featurize_accepts_datetime64(self):
+        """Test that datetime64 timestamps give the same features as datetimes."""
+        np.testing.assert_array_equal(
+            featurize(np.array(self.timestamps, dtype="datetime64[s]"), [1], *sample_weather),
+            featurize(self.timestamps, [1], *sample_weather),
+        )
+
+    @benchmark
+    def test_featurize_performance(self):
+        """Print the featurization time with the transformers and with the table."""
+        timestamps = [sample_time + timedelta(minutes=15 * step) for step in range(7 * 24 * 4)]
+        location_ids = [location_id for _, location_id in sample_zones]
+        rounds = 5
+
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            rows = [
+                self.transformer_features(location_id, timestamp)
+                for location_id in location_ids
+                for timestamp in timestamps
+            ]
+            np.array(rows, dtype=np.float32)
+        transformer_time = (time.perf_counter() - start_time) / rounds
+
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            featurize(timestamps, location_ids, *sample_weather)
+        table_time = (time.perf_counter() - start_time) / rounds
+
+        print(f"Transformer features for {len(location_ids) * len(timestamps)} rows: {transformer_time * 1000:.2f} ms")
+        print(f"Table features for {len(location_ids) * len(timestamps)} rows: {table_time * 1000:.2f} ms")
+
+
+@override_settings(BUSYNESS_PREDICTION_RESOLUTION_MINUTES=15)
+class PredictionMetricsTest(TestCase):
+    """Tests the stage timings of the busyness predictions and the metrics endpoint."""
+
+    def setUp(self):
+        """Create a restaurant, a model and weather data with empty histograms."""
+        cache.clear()
+        model_registry.clear()
+        forecast_grid.clear()
+        zone_registry.clear()
+        metrics_registry.clear()
+        restaurant = Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=1)
+        with (settings.BASE_DIR / "data" / "XGBoost.pkl").open("rb") as file:
+            PredictionModel.objects.create(model_name="XGBoost", pickle_file=file.read(), restaurant=restaurant)
+        WeatherData.objects.create(temperature=21.4, dewpoint=12.3, precipitation=0.2)
+
+    def stage_counts(self):
+        """Return the count of the histogram of every prediction stage."""
+        return {
+            metric["labels"]["stage"]: metric["count"]
+            for metric in metrics_registry.snapshot()
+            if metric["name"] == STAGE_METRIC
+        }
+
+    def test_stages_are_recorded(self):
+        """Test that a prediction records every stage once."""
+        timings = StageTimings()
+        make_predictions("2024-07-07T12:00:00", timings=timings)
+        self.assertEqual(list(timings.durations), list(PREDICTION_STAGES))
+
+        # A cache hit stops after the cache lookup.
+        make_predictions("2024-07-07T12:05:00")
+        counts = self.stage_counts()
+        self.assertEqual(counts["cache_lookup"], 2)
+        self.assertEqual(counts["predict"], 1)
+
+    @override_settings(BUSYNESS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Test that the Server-Timing header lists the stages and disables caching."""
+        response = self.client.get(reverse("predict-busyness", args=["2024-07-07T12:00:00"]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stages = [entry.split(";")[0] for entry in response["Server-Timing"].split(", ")]
+        self.assertEqual(stages, list(PREDICTION_STAGES))
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    @override_settings(BUSYNESS_SERVER_TIMING=False)
+    def test_server_timing_header_disabled(self):
+        """Test that the Server-Timing header can be turned off."""
+        response = self.client.get(reverse("predict-busyness", args=["2024-07-07T12:00:00"]))
+        self.assertNotIn("Server-Timing", response)
+
+    def test_metrics_endpoint(self):
+        """Test the JSON and Prometheus forms of the metrics endpoint."""
+        make_predictions("2024-07-07T12:00:00")
+
+        data = self.client.get(reverse("prediction-metrics")).json()
+        self.assertEqual(data["prediction_lookups"]["miss"], 1)
+        predict_metric = next(metric for metric in data["histograms"] if metric["labels"] == {"stage": "predict"})
+        self.assertEqual(predict_metric["count"], 1)
+        self.assertEqual(predict_metric["buckets"][-1], ["+Inf", 1])
+
+        response = self.client.get(reverse("prediction-metrics"), {"format": "prometheus"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn(f"# TYPE {STAGE_METRIC} histogram", text)
+        process = data["process"]
+        self.assertIn(f'{STAGE_METRIC}_bucket{{stage="predict",process="{process}",le="+Inf"}} 1', text)
+        self.assertIn(f'{STAGE_METRIC}_count{{stage="predict",process="{process}"}} 1', text)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+
+class ContentFeaturesTest(TestCase):
+    """Tests the content vectors of the restaurants."""
+
+    def setUp(self):
+        """Create restaurants with cuisines, prices and aspects."""
+        cache.clear()
+        content_registry.clear()
+        specs = [
+            ("Italian", "$30 and under", "Quiet", 4.5, {("pasta", "positive"): 120, ("service", "positive"): 40}),
+            ("Italian", "$30 and under", "Quiet", 4.4, {("pasta", "positive"): 90, ("service", "positive"): 30}),
+            ("Sushi", "$50 and over", "Loud", 3.1, {("fish", "positive"): 80, ("service", "negative"): -25}),
+            ("Steakhouse", None, None, None, {}),
+        ]
+        self.restaurants = []
+        for index, (cuisine, price, noise_level, rating, aspects) in enumerate(specs):
+            restaurant = Restaurant.objects.create(
+                restaurant_name=f"Restaurant {index}", primary_cuisine=cuisine, price=price,
+                noise_level=noise_level, overall_rating=rating, zone="Flatiron", location_id=1,
+            )
+            for (aspect, rating_type), count in aspects.items():
+                Aspect.objects.create(restaurant=restaurant, aspect=aspect, rating_type=rating_type, count=count)
+            self.restaurants.append(restaurant)
+
+    def test_features(self):
+        """Test that the content vectors are unit length and similar for similar restaurants."""
+        index = content_registry.get_index()
+        self.assertEqual(index.features.dtype, np.float32)
+        self.assertEqual(index.restaurant_ids.tolist(), [restaurant.id for restaurant in self.restaurants])
+        self.assertIn("service:negative", index.feature_names)
+        self.assertIn("primary_cuisine=italian", index.feature_names)
+        np.testing.assert_allclose(sparse_row_norms(index.features), 1, rtol=1e-6)
+
+        similarities = (index.features @ index.features.T).toarray()
+        self.assertGreater(similarities[0, 1], 0.9)
+        self.assertGreater(similarities[0, 1], similarities[0, 2])
+        self.assertGreater(similarities[0, 1], similarities[0, 3])
+
+    def test_index_is_rebuilt_when_restaurants_change(self):
+        """Test that the vectors are rebuilt when the restaurants data version changes."""
+        index = content_registry.get_index()
+        with self.assertNumQueries(0):
+            self.assertIs(content_registry.get_index(), index)
+
+        Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=90)
+        bump_data_version(RESTAURANTS)
+        self.assertEqual(len(content_registry.get_index().restaurant_ids), len(self.restaurants) + 1)
+
+
+def sparse_row_norms(matrix):
+    """Return the length of every row of a sparse matrix."""
+    return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+
+
+class SimilarRestaurantsTest(TestCase):
+    """Tests the similar restaurants table and endpoint."""
+
+    def setUp(self):
+        """Create restaurants with aspects and users liking them."""
+        cache.clear()
+        content_registry.clear()
+        cuisines = ["Italian", "Italian", "Sushi", "Sushi", "Steakhouse", "Italian"]
+        self.restaurants = [
+            Restaurant.objects.create(
+                restaurant_name=f"Restaurant {index}", primary_cuisine=cuisine, overall_rating=4.0,
+                zone="Flatiron", location_id=1,
+            )
+            for index, cuisine in enumerate(cuisines)
+        ]
+        # Restaurants 0 and 1 are liked together, as are 2 and 3.
+        user_model = get_user_model()
+        for index, liked in enumerate([(0, 1), (0, 1), (0, 1, 4), (2, 3), (2, 3)]):
+            user = user_model.objects.create_user(
+                email=f"user{index}@example.com", first_name="Test", surname=f"User {index}",
+                password="password",  # noqa: S106
+            )
+            for position in liked:
+                UserLikedRestaurant.objects.create(user=user, restaurant=self.restaurants[position])
+
+    def test_table(self):
+        """Test the ranks and similarities of the similar restaurants table."""
+        row_count = build_similar_restaurants_table(top_k=3, colike_weight=0.5, processes=1)
+        self.assertEqual(row_count, SimilarRestaurant.objects.count())
+        self.assertFalse(SimilarRestaurant.objects.filter(restaurant_id=F("similar_restaurant_id")).exists())
+
+        for restaurant in self.restaurants:
+            neighbors = list(restaurant.similar_restaurants.order_by("rank").values_list("rank", "similarity"))
+            self.assertLessEqual(len(neighbors), 3)
+            self.assertEqual([rank for rank, _ in neighbors], list(range(1, len(neighbors) + 1)))
+            self.assertEqual([similarity for _, similarity in neighbors], sorted(
+                (similarity for _, similarity in neighbors), reverse=True
+            ))
+
+        similar_ids = [row["id"] for row in get_similar_restaurants(self.restaurants[0].id)]
+        self.assertEqual(similar_ids[0], self.restaurants[1].id)
+        similar_ids = [row["id"] for row in get_similar_restaurants(self.restaurants[2].id)]
+        self.assertEqual(similar_ids[0], self.restaurants[3].id)
+
+    def test_process_pool_matches_inline(self):
+        """Test that the process pool computes the same neighbors as a single process."""
+        generator = np.random.default_rng(0)
+        likes = sparse.random(40, 30, density=0.2, random_state=0, format="csr")
+        likes.data[:] = 1
+        features = sparse.random(30, 12, density=0.3, random_state=1, format="csr")
+        features.data = generator.random(len(features.data))
+
+        inline = compute_top_k(likes, features, top_k=5, colike_weight=0.5, processes=1, chunk_size=7)
+        pooled = compute_top_k(likes, features, top_k=5, colike_weight=0.5, processes=2, chunk_size=7)
+        for inline_part, pooled_part in zip(inline, pooled, strict=True):
+            np.testing.assert_array_equal(inline_part, pooled_part)
+        self.assertFalse(np.any(inline[0] == inline[1]))
+        self.assertLessEqual(np.bincount(inline[0]).max(), 5)
+
+    def test_read_is_one_query(self):
+        """Test that the similar restaurants of a restaurant are read with one query."""
+        build_similar_restaurants_table(top_k=3, processes=1)
+        with self.assertNumQueries(1):
+            similar_restaurants = get_similar_restaurants(self.restaurants[0].id)
+        self.assertEqual(similar_restaurants[0]["restaurant_name"], "Restaurant 1")
+        self.assertIn("similarity", similar_restaurants[0])
+
+    def test_endpoint(self):
+        """Test the similar restaurants endpoint, and 404 for unknown restaurants."""
+        build_similar_restaurants_table(top_k=3, processes=1)
+        response = self.client.get(reverse("similar-restaurants", args=[self.restaurants[0].id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0]["id"], self.restaurants[1].id)
+
+        response = self.client.get(reverse("similar-restaurants", args=[self.restaurants[-1].id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RestaurantCatalogTest(TestCase):
+    """Tests the pre-rendered all restaurants catalog."""
+
+    def setUp(self):
+        """Create restaurants with aspects and serialize the expected catalog."""
+        cache.clear()
+        catalog_registry.clear()
+        for index in range(30):
+            restaurant = Restaurant.objects.create(
+                restaurant_name=f"Restaurant {index}", primary_cuisine="Italian", overall_rating=4.0,
+                zone="Flatiron", location_id=1, photo_url=[f"https://example.com/{index}.jpg"],
+            )
+            Aspect.objects.create(restaurant=restaurant, aspect="service", rating_type="positive", count=index)
+        self.url = reverse("all-restaurants")
+        self.expected = json.loads(json.dumps(MapRestaurantSearchSerializer(
+            Restaurant.objects.order_by("id").prefetch_related("aspects"), many=True
+        ).data))
+
+    def test_encodings(self):
+        """Test the identity, gzip and brotli forms of the catalog."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(json.loads(response.content), self.expected)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.expected)
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(json.loads(brotli.decompress(response.content)), self.expected)
+
+        self.assertEqual(accepted_encodings("gzip;q=1.0, br;q=0, *;q=0.1"), {"gzip", "*"})
+
+    def test_not_modified(self):
+        """Test that a matching If-None-Match returns 304 without queries."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('"'))
+
+        # Once the snapshot is rendered, requests only read the data version from the cache.
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_snapshot_is_rendered_when_restaurants_change(self):
+        """Test that the catalog is rendered again when the restaurants data version changes."""
+        etag = self.client.get(self.url)["ETag"]
+        Restaurant.objects.create(restaurant_name="Westville - Chelsea", zone="Flatiron", location_id=90)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        bump_data_version(RESTAURANTS)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(json.loads(response.content)), len(self.expected) + 1)
+
+
+class RestaurantRowsTest(TestCase):
+    """Compares the serializer-free restaurant lists with the DRF serializers."""
+
+    def setUp(self):
+        """Create restaurants with photos and aspects, every tenth one without aspects."""
+        cache.clear()
+        catalog_registry.clear()
+        name_index_registry.clear()
+        photo_urls = [["https://example.com/a.jpg", "https://example.com/b.jpg"], [], ["https://example.com/c.jpg"]]
+        aspects = []
+        for index in range(300):
+            restaurant = Restaurant.objects.create(
+                restaurant_name=f"Restaurant {index}", primary_cuisine="Italian", overall_rating=index % 5 + 0.5,
+                food_rating=None if index % 7 else 4.25, zone="Flatiron", location_id=index, price="$$",
+                latitude=40.7 + index / 1000, longitude=-73.9, photo_url=photo_urls[index % len(photo_urls)],
+            )
+            # Every tenth restaurant has no aspects.
+            aspects.extend(
+                Aspect(restaurant=restaurant, aspect=f"aspect {number}", rating_type="positive", count=number)
+                for number in range(10 if index % 10 else 0)
+            )
+        Aspect.objects.bulk_create(aspects)
+
+    def test_map_rows_match_serializer(self):
+        """Test that the map rows match MapRestaurantSearchSerializer."""
+        restaurants = Restaurant.objects.filter(restaurant_name__icontains="Restaurant 1")
+        expected = MapRestaurantSearchSerializer(restaurants.prefetch_related("aspects"), many=True).data
+        with self.assertNumQueries(2):
+            rows = map_restaurant_rows(restaurants)
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+
+    def test_search_rows_match_serializer(self):
+        """Test that the search rows match LocationFreeEntrySearchViewSerializer."""
+        restaurants = Restaurant.objects.filter(restaurant_name__icontains="Restaurant 2").distinct()
+        expected = LocationFreeEntrySearchViewSerializer(restaurants.prefetch_related("aspects"), many=True).data
+        with self.assertNumQueries(2):
+            rows = search_restaurant_rows(restaurants)
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+
+        expected = LocationFreeEntrySearchViewSerializer(
+            matching_restaurants("Restaurant 2").prefetch_related("aspects"), many=True
+        ).data
+        response = self.client.get(reverse("free-text-restaurant-search"), {"query": "Restaurant 2"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), json.loads(JSONRenderer().render(expected)))
+
+    @benchmark
+    def test_benchmark(self):
+        """Print the time of the serializer and of the rows for many restaurants."""
+        restaurants = Restaurant.objects.all()
+        repeats = 5
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            expected = MapRestaurantSearchSerializer(restaurants.prefetch_related("aspects"), many=True).data
+        serializer_time = (time.perf_counter() - start) / repeats
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            rows = map_restaurant_rows(restaurants)
+        rows_time = (time.perf_counter() - start) / repeats
+
+        print(f"MapRestaurantSearchSerializer time for {len(rows)} restaurants: {serializer_time * 1000:.2f} ms")
+        print(f"map_restaurant_rows time for {len(rows)} restaurants: {rows_time * 1000:.2f} ms")
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+        self.assertLess(rows_time, serializer_time)
+
+
+class PhotoUrlsTest(TestCase):
+    """Tests the normalization of the photo URLs and the lists returned by the API."""
+
+    def test_normalize_photo_urls(self):
+        """Test that stored photo URLs of every form become lists."""
+        urls = ["https://example.com/a.jpg", "https://example.com/b.jpg"]
+        self.assertEqual(normalize_photo_urls(urls), urls)
+        self.assertEqual(normalize_photo_urls(json.dumps(urls)), urls)
+        self.assertEqual(normalize_photo_urls(str(urls)), urls)
+        self.assertEqual(normalize_photo_urls(" https://example.com/a.jpg "), urls[:1])
+        self.assertEqual(normalize_photo_urls([*urls, urls[0], " ", None]), urls)
+        for value in (None, "", "['not json'", 42, {"url": urls[0]}):
+            self.assertEqual(normalize_photo_urls(value), [])
+
+    def test_search_returns_photo_lists(self):
+        """Test that the search rows return the photo URLs as lists."""
+        cache.clear()
+        name_index_registry.clear()
+        photo_url = normalize_photo_urls('["https://example.com/a.jpg"]')
+        Restaurant.objects.create(restaurant_name="Photo Place", location_id=1, photo_url=photo_url)
+        Restaurant.objects.create(restaurant_name="Photo Less", location_id=2)
+
+        response = self.client.get(reverse("free-text-restaurant-search"), {"query": "Photo"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        photos = {restaurant["restaurant_name"]: restaurant["photo_url"] for restaurant in response.json()}
+        self.assertEqual(photos, {"Photo Place": ["https://example.com/a.jpg"], "Photo Less": []})
+
+
+class NameIndexTest(TestCase):
+    """Tests the trigram name index and the name searches served from it."""
+
+    def setUp(self):
+        """Create restaurants with accented and similar names."""
+        cache.clear()
+        name_index_registry.clear()
+        self.ids = {}
+        for name, rating in (
+            ("Pizza", 3.0),
+            ("Pizza Suprema", 4.0),
+            ("Joe's Pizza", 4.5),
+            ("Artichoke Basille's Pizza", 4.8),
+            ("Pizzeria Sei", 4.9),
+            ("Café Mogador", 4.2),
+            ("Katz's Delicatessen", 4.6),
+        ):
+            self.ids[name] = Restaurant.objects.create(restaurant_name=name, overall_rating=rating, location_id=1).id
+
+    def search(self, query, **kwargs):
+        """Return the IDs of the restaurants matching query."""
+        return name_index_registry.search(query, **kwargs).tolist()
+
+    def test_normalize_name(self):
+        """Test that names are case folded, unaccented and split into words."""
+        self.assertEqual(normalize_name("  Café  Mogador!! "), "cafe mogador")
+        self.assertEqual(normalize_name("Katz's Delicatessen"), "katz s delicatessen")
+
+    def test_ranks_by_match_type_then_rating(self):
+        """Test that exact, prefix, word and typo matches come in that order, each by rating."""
+        self.assertEqual(
+            self.search("pizza"),
+            [
+                self.ids["Pizza"],
+                self.ids["Pizza Suprema"],
+                self.ids["Artichoke Basille's Pizza"],
+                self.ids["Joe's Pizza"],
+                self.ids["Pizzeria Sei"],
+            ],
+        )
+        self.assertEqual(self.search("pizza", limit=2), [self.ids["Pizza"], self.ids["Pizza Suprema"]])
+
+    def test_substring_and_accents(self):
+        """Test that substrings match without their accents."""
+        self.assertEqual(self.search("elicat"), [self.ids["Katz's Delicatessen"]])
+        self.assertEqual(self.search("CAFÉ mog"), [self.ids["Café Mogador"]])
+
+    def test_typos(self):
+        """Test that names with typos match by their shared trigrams."""
+        self.assertEqual(self.search("delicatesen"), [self.ids["Katz's Delicatessen"]])
+        self.assertIn(self.ids["Joe's Pizza"], self.search("joes pizzza"))
+        self.assertEqual(self.search("delicatesen", min_similarity=1.0), [])
+        self.assertEqual(self.search("sushi"), [])
+
+    def test_short_queries_match_word_starts(self):
+        """Test that queries shorter than a trigram only match the starts of words."""
+        self.assertEqual(self.search("ka"), [self.ids["Katz's Delicatessen"]])
+        self.assertEqual(self.search("m"), [self.ids["Café Mogador"]])
+        self.assertEqual(self.search("og"), [])
+        self.assertEqual(self.search(" !"), [])
+
+    def test_rebuilt_when_restaurants_change(self):
+        """Test that the index is rebuilt when the restaurants data version changes."""
+        self.assertEqual(self.search("sushi"), [])
+        Restaurant.objects.create(restaurant_name="Sushi Nakazawa", overall_rating=4.7, location_id=2)
+        self.assertEqual(self.search("sushi"), [])
+        bump_data_version(RESTAURANTS)
+        self.assertEqual(len(self.search("sushi")), 1)
+
+    def test_views_return_ranked_matches(self):
+        """Test that the map and free text views return the ranked matches."""
+        response = self.client.get(reverse("free-text-restaurant-search"), {"query": "pizza"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [restaurant["restaurant_name"] for restaurant in response.json()],
+            ["Pizza", "Pizza Suprema", "Artichoke Basille's Pizza", "Joe's Pizza", "Pizzeria Sei"],
+        )
+
+        response = self.client.get(reverse("all-restaurants"), {"restaurant_name": "delicatesen"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([restaurant["id"] for restaurant in response.json()], [self.ids["Katz's Delicatessen"]])
+
+    def test_views_page_matches(self):
+        """Test the pages and next links of the map and free text views."""
+        url = reverse("free-text-restaurant-search")
+        names = []
+        response = self.client.get(url, {"query": "pizza", "limit": 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(restaurant["restaurant_name"] for restaurant in response.json())
+            if "Link" not in response:
+                break
+            response = self.client.get(response["Link"].split(";")[0].strip("<>"))
+        self.assertEqual(names, ["Pizza", "Pizza Suprema", "Artichoke Basille's Pizza", "Joe's Pizza", "Pizzeria Sei"])
+
+        response = self.client.get(reverse("all-restaurants"), {"restaurant_name": "pizza", "limit": 3, "cursor": 3})
+        self.assertEqual(
+            [restaurant["id"] for restaurant in response.json()], [self.ids["Joe's Pizza"], self.ids["Pizzeria Sei"]]
+        )
+        self.assertNotIn("Link", response)
+
+        for params in ({"limit": 0}, {"limit": 501}, {"cursor": -1}, {"limit": "ten"}):
+            response = self.client.get(url, {"query": "pizza", **params})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @benchmark
+    def test_benchmark(self):
+        """Print the build and lookup times of the index for many restaurants."""
+        words = ["pizza", "sushi", "taco", "burger", "noodle", "bistro", "grill", "kitchen", "cafe", "deli", "bar"]
+        Restaurant.objects.bulk_create(
+            Restaurant(
+                restaurant_name=f"{words[index % 11].title()} {words[index * 7 % 11]} {index}",
+                overall_rating=index % 50 / 10,
+                location_id=index,
+            )
+            for index in range(100_000)
+        )
+        bump_data_version(RESTAURANTS)
+
+        start = time.perf_counter()
+        name_index_registry.get_index()
+        print(f"Name index build time for 100000 restaurants: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        for query in ("p", "piz", "pizza", "kitchen 4", "sushi bistro 9999", "burgr"):
+            repeats = 20
+            start = time.perf_counter()
+            for _ in range(repeats):
+                restaurant_ids = self.search(query)
+            lookup_time = (time.perf_counter() - start) / repeats
+            print(f"Name index lookup time for {query!r}: {lookup_time * 1000:.3f} ms, {len(restaurant_ids)} results")
+            self.assertTrue(restaurant_ids)
+
+        start = time.perf_counter()
+        list(Restaurant.objects.filter(restaurant_name__icontains="pizza").values_list("id", flat=True))
+        print(f"icontains query time for 'pizza': {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+class RestaurantAutocompleteTest(TestCase):
+    """Tests the autocomplete endpoint and its in-memory index."""
+
+    def setUp(self):
+        """Create restaurants with names, cuisines and zones sharing prefixes."""
+        cache.clear()
+        autocomplete_registry.clear()
+        self.url = reverse("restaurant-autocomplete")
+        self.ids = {}
+        for name, cuisine, zone, rating in (
+            ("Joe's Pizza", "Pizza", "Greenwich Village", 4.5),
+            ("Lucali", "Pizza", "Carroll Gardens", 4.8),
+            ("Pizza Suprema", "Italian", "Penn Station/Madison Sq West", 4.0),
+            ("Sushi Nakazawa", "Japanese", "West Village", 4.7),
+            ("Katz's Delicatessen", "Deli", "Lower East Side", None),
+        ):
+            restaurant = Restaurant.objects.create(
+                restaurant_name=name, primary_cuisine=cuisine, zone=zone, overall_rating=rating, location_id=1
+            )
+            self.ids[name] = restaurant.id
+
+    def complete(self, query):
+        """Return the names and match types of the completions of query."""
+        response = self.client.get(self.url, {"q": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(restaurant["name"], restaurant["match"]) for restaurant in response.json()]
+
+    def test_matches_names_cuisines_and_zones_by_rating(self):
+        """Test that names, cuisines and zones complete, by descending rating."""
+        self.assertEqual(
+            self.complete("piz"), [("Lucali", "cuisine"), ("Joe's Pizza", "name"), ("Pizza Suprema", "name")]
+        )
+        self.assertEqual(self.complete("VILL"), [("Sushi Nakazawa", "zone"), ("Joe's Pizza", "zone")])
+        self.assertEqual(self.complete("katz s"), [("Katz's Delicatessen", "name")])
+        self.assertEqual(self.complete("madison"), [("Pizza Suprema", "zone")])
+        self.assertEqual(self.complete("izza"), [])
+        self.assertEqual(self.complete(""), [])
+
+    def test_returns_id_name_and_match_only(self):
+        """Test the fields of the autocomplete endpoint and that it is never cached."""
+        response = self.client.get(self.url, {"q": "lucali"})
+        self.assertEqual(response.json(), [{"id": self.ids["Lucali"], "name": "Lucali", "match": "name"}])
+        # The index answers from memory, the page cache would only keep stale completions.
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_no_database_access_per_keystroke(self):
+        """Test that completions do not query the database once the index is built."""
+        autocomplete_registry.get_index()
+        get_data_version(RESTAURANTS)
+        with self.assertNumQueries(0):
+            for length in range(1, 6):
+                autocomplete_registry.complete("pizza"[:length])
+
+    def test_limit_and_rebuild(self):
+        """Test the limit and that the index is rebuilt when the restaurants data version changes."""
+        autocomplete_registry.get_index()
+        Restaurant.objects.bulk_create(
+            Restaurant(restaurant_name=f"Pizza Place {index}", overall_rating=index / 10, location_id=index)
+            for index in range(30)
+        )
+        self.assertEqual(len(autocomplete_registry.complete("pizza place")), 0)
+        bump_data_version(RESTAURANTS)
+        completions = autocomplete_registry.complete("pizza place", limit=5)
+        self.assertEqual(
+            [completion["name"] for completion in completions], [f"Pizza Place {index}" for index in range(29, 24, -1)]
+        )
+        self.assertEqual(len(self.complete("pizza")), settings.AUTOCOMPLETE_LIMIT)
+
+    @benchmark
+    def test_benchmark(self):
+        """Print the build and completion times of the index for many restaurants."""
+        words = ["pizza", "sushi", "taco", "burger", "noodle", "bistro", "grill", "kitchen", "cafe", "deli", "bar"]
+        cuisines = ["Italian", "Japanese", "Mexican", "American", "Pizza"]
+        Restaurant.objects.bulk_create(
+            Restaurant(
+                restaurant_name=f"{words[index % 11].title()} {words[index * 7 % 11]} {index}",
+                primary_cuisine=cuisines[index % 5],
+                zone=f"Zone {index % 69}",
+                overall_rating=index % 50 / 10,
+                location_id=index,
+            )
+            for index in range(100_000)
+        )
+        bump_data_version(RESTAURANTS)
+
+        start = time.perf_counter()
+        autocomplete_registry.get_index()
+        print(f"Autocomplete index build time for 100000 restaurants: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        for query in ("p", "pi", "pizza", "pizza s", "ital", "zone 4", "12345"):
+            repeats = 100
+            start = time.perf_counter()
+            for _ in range(repeats):
+                completions = autocomplete_registry.complete(query)
+            lookup_time = (time.perf_counter() - start) / repeats
+            print(f"Autocomplete time for {query!r}: {lookup_time * 1000:.3f} ms, {len(completions)} completions")
+            self.assertTrue(completions)
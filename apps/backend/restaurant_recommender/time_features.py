@@ -0,0 +1,106 @@
+"""Feature block of the busyness model, built from precomputed cyclical time tables.
+
+The model encodes the month, hour, minute and day of the week as sine and cosine over their
+period. These only take 12, 24, 60 and 7 distinct values, so they are computed once into lookup
+tables at import time. Featurizing a batch of timestamps is then integer calendar arithmetic
+on a datetime64 array followed by table lookups, with no Python-level math per value.
+
+Typical usage example:
+
+    features = featurize([datetime(2024, 7, 7, 12, 0)], location_ids, temp, dwpt, prcp)
+    predicted_values = model.predict(features)
+"""
+
+import numpy as np
+
+# Column order expected by the XGBoost model.
+FEATURE_NAMES = [
+    "DOLocationID",
+    "temp",
+    "dwpt",
+    "prcp",
+    "day_of_week",
+    "month_cos",
+    "hour_cos",
+    "minute_cos",
+    "dow_cos",
+    "month_sin",
+    "hour_sin",
+    "minute_sin",
+    "dow_sin",
+]
+# Columns that only depend on the timestamp, see time_feature_block.
+TIME_FEATURE_COUNT = len(FEATURE_NAMES) - 4
+
+# 1970-01-01 was a Thursday, i.e. weekday() 3.
+EPOCH_WEEKDAY = 3
+
+
+def _cyclical_tables(period, size):
+    angles = np.arange(size, dtype=np.float64) / period * 2 * np.pi
+    return np.cos(angles), np.sin(angles)
+
+
+# Indexed by the raw value, e.g. MONTH_COS[7] is the cosine of July (months are 1 to 12 and
+# days of the week 1 to 7, so those tables have one unused entry at index 0).
+MONTH_COS, MONTH_SIN = _cyclical_tables(12, 13)
+HOUR_COS, HOUR_SIN = _cyclical_tables(24, 24)
+MINUTE_COS, MINUTE_SIN = _cyclical_tables(60, 60)
+DOW_COS, DOW_SIN = _cyclical_tables(7, 8)
+
+
+def time_feature_block(timestamps):
+    """Compute the time features of many timestamps at once.
+
+    Args:
+        timestamps: Sequence of naive datetimes, or a datetime64 array.
+
+    Returns:
+        numpy.ndarray: A float64 matrix with one row per timestamp and the columns of
+        ``FEATURE_NAMES[4:]``.
+    """
+    total_minutes = np.asarray(timestamps, dtype="datetime64[m]").astype(np.int64).reshape(-1)
+    months = np.asarray(timestamps, dtype="datetime64[M]").astype(np.int64).reshape(-1) % 12 + 1
+    minutes = total_minutes % 60
+    hours = total_minutes // 60 % 24
+    # Monday is 1 and Sunday is 7, like weekday() + 1.
+    days_of_week = (total_minutes // (24 * 60) + EPOCH_WEEKDAY) % 7 + 1
+
+    block = np.empty((len(total_minutes), TIME_FEATURE_COUNT), dtype=np.float64)
+    block[:, 0] = days_of_week
+    block[:, 1] = MONTH_COS[months]
+    block[:, 2] = HOUR_COS[hours]
+    block[:, 3] = MINUTE_COS[minutes]
+    block[:, 4] = DOW_COS[days_of_week]
+    block[:, 5] = MONTH_SIN[months]
+    block[:, 6] = HOUR_SIN[hours]
+    block[:, 7] = MINUTE_SIN[minutes]
+    block[:, 8] = DOW_SIN[days_of_week]
+    return block
+
+
+def featurize(timestamps, location_ids, temp, dwpt, prcp):
+    """Build the full model input for every combination of zone and timestamp.
+
+    Rows are ordered zone by zone, so the predictions can be reshaped into a
+    (zones, timestamps) matrix.
+
+    Args:
+        timestamps: Sequence of naive datetimes, or a datetime64 array.
+        location_ids: Sequence of DOLocationID values, one per zone.
+        temp: Temperature.
+        dwpt: Dewpoint.
+        prcp: Precipitation.
+
+    Returns:
+        numpy.ndarray: A float32 matrix of shape (len(location_ids) * len(timestamps), len(FEATURE_NAMES)).
+    """
+    time_block = time_feature_block(timestamps)
+    zone_count = len(location_ids)
+    time_count = len(time_block)
+
+    features = np.empty((zone_count, time_count, len(FEATURE_NAMES)), dtype=np.float32)
+    features[:, :, 0] = np.asarray(location_ids, dtype=np.float32).reshape(-1, 1)
+    features[:, :, 1:4] = (temp, dwpt, prcp)
+    features[:, :, 4:] = time_block
+    return features.reshape(zone_count * time_count, len(FEATURE_NAMES))
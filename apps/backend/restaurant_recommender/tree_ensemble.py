@@ -0,0 +1,183 @@
+"""NumPy evaluator for the XGBoost busyness model.
+
+The booster is compiled once into flat arrays: the split feature, threshold, children and
+default direction of every node, plus the leaf values. A batch of rows is then evaluated by
+walking all trees one level at a time, which avoids the fixed DMatrix and predict overhead
+of xgboost for our small inputs and does not need xgboost at prediction time.
+
+Only single target, numerical split gbtree models with an identity link (e.g.
+``reg:squarederror``) are supported, which is what ``data/XGBoost.pkl`` contains.
+
+Typical usage example:
+
+    ensemble = TreeEnsemble.from_booster(booster)
+    predicted_values = ensemble.predict(features)
+"""
+
+import json
+
+import numpy as np
+
+# Objectives whose predictions are the raw sum of the leaf values and the base score.
+SUPPORTED_OBJECTIVES = {"reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"}
+
+
+class TreeEnsemble:
+    """A tree ensemble stored as flat NumPy arrays.
+
+    Node indexes are global, tree ``t`` starts at ``roots[t]``. Leaves point to themselves as
+    both children, so every row can take the same number of steps down every tree.
+
+    Attributes:
+        feature_names: Input column names, in order.
+        roots: Index of the root node of every tree.
+        split_features: Feature index of every node, 0 for leaves.
+        thresholds: float32 split value of every node, rows with a smaller value go left.
+        children: Left and right child of every node, interleaved (``2 * node + go_right``).
+        default_left: Direction of every node for missing values.
+        leaf_values: float32 output of every node, only used for leaves.
+        base_score: Value added to the sum of the leaf values.
+        max_depth: Number of splits on the longest path of any tree.
+    """
+
+    def __init__(  # noqa: PLR0913, PLR0917
+        self,
+        feature_names,
+        roots,
+        split_features,
+        thresholds,
+        children,
+        default_left,
+        leaf_values,
+        base_score,
+    ):
+        """Initialize the ensemble from its node arrays, see the class attributes."""
+        self.feature_names = list(feature_names)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.split_features = np.asarray(split_features, dtype=np.intp)
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+        self.children = np.asarray(children, dtype=np.intp)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.leaf_values = np.asarray(leaf_values, dtype=np.float32)
+        self.base_score = float(base_score)
+        self.max_depth = self._max_depth()
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Compile an ``xgboost.Booster``."""
+        return cls.from_json(booster.save_raw(raw_format="json"))
+
+    @classmethod
+    def from_json(cls, model_json):
+        """Compile a model saved in the XGBoost JSON format.
+
+        Args:
+            model_json: The JSON document as bytes, str or an already parsed dict.
+
+        Returns:
+            TreeEnsemble: The compiled model.
+
+        Raises:
+            ValueError: If the model is not supported.
+        """
+        if not isinstance(model_json, dict):
+            model_json = json.loads(model_json)
+
+        learner = model_json["learner"]
+        roots, split_features, thresholds, children, default_left = [], [], [], [], []
+        offset = 0
+        for tree in cls._supported_trees(learner):
+            if any(tree.get("split_type", [])):
+                msg = "Categorical splits are not supported"
+                raise ValueError(msg)
+
+            left_children = np.asarray(tree["left_children"], dtype=np.intp)
+            right_children = np.asarray(tree["right_children"], dtype=np.intp)
+            is_leaf = left_children == -1
+            node_ids = np.arange(offset, offset + len(left_children), dtype=np.intp)
+
+            roots.append(offset)
+            split_features.append(np.where(is_leaf, 0, tree["split_indices"]))
+            # Leaves keep their value in split_conditions.
+            thresholds.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            children.append(
+                np.column_stack([
+                    np.where(is_leaf, node_ids, left_children + offset),
+                    np.where(is_leaf, node_ids, right_children + offset),
+                ]).ravel()
+            )
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            offset += len(left_children)
+
+        thresholds = np.concatenate(thresholds) if thresholds else np.empty(0, dtype=np.float32)
+        return cls(
+            feature_names=learner.get("feature_names") or [],
+            roots=roots,
+            split_features=np.concatenate(split_features) if split_features else [],
+            thresholds=thresholds,
+            children=np.concatenate(children) if children else [],
+            default_left=np.concatenate(default_left) if default_left else [],
+            leaf_values=thresholds,
+            # Newer XGBoost versions store the base score as a vector, e.g. "[5.17675E-1]".
+            base_score=float(learner["learner_model_param"]["base_score"].strip("[]")),
+        )
+
+    @staticmethod
+    def _supported_trees(learner):
+        """Return the trees of an XGBoost learner, raising ValueError if the model is not supported."""
+        objective = learner["objective"]["name"]
+        if objective not in SUPPORTED_OBJECTIVES:
+            msg = f"Unsupported objective: {objective}"
+            raise ValueError(msg)
+
+        model_param = learner["learner_model_param"]
+        if int(model_param.get("num_target", 1)) > 1 or int(model_param.get("num_class", 0)) > 0:
+            msg = "Only single target models are supported"
+            raise ValueError(msg)
+
+        gradient_booster = learner["gradient_booster"]
+        if gradient_booster["name"] != "gbtree":
+            msg = f"Unsupported booster: {gradient_booster['name']}"
+            raise ValueError(msg)
+        return gradient_booster["model"]["trees"]
+
+    def predict(self, features):
+        """Predict a batch of rows.
+
+        Args:
+            features (numpy.ndarray): Matrix of shape (rows, features), NaN marks a missing value.
+
+        Returns:
+            numpy.ndarray: float32 predictions, one per row.
+        """
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        row_count, feature_count = features.shape
+        if row_count == 0 or not len(self.roots):
+            return np.full(row_count, self.base_score, dtype=np.float32)
+
+        flat_features = features.ravel()
+        row_offsets = (np.arange(row_count, dtype=np.intp) * feature_count).reshape(-1, 1)
+        has_missing = np.isnan(flat_features).any()
+
+        # Current node of every row in every tree, all trees are walked together level by level.
+        nodes = np.tile(self.roots, (row_count, 1))
+        for _ in range(self.max_depth):
+            values = flat_features[row_offsets + self.split_features[nodes]]
+            # NaN compares as False, so missing values go right unless the node says otherwise.
+            go_right = ~(values < self.thresholds[nodes])
+            if has_missing:
+                go_right = np.where(np.isnan(values), ~self.default_left[nodes], go_right)
+            nodes = self.children[2 * nodes + go_right]
+
+        # Accumulate in float32 like xgboost does.
+        return self.leaf_values[nodes].sum(axis=1, dtype=np.float32) + np.float32(self.base_score)
+
+    def _max_depth(self):
+        depth = 0
+        level = self.roots
+        while len(level):
+            children = self.children.reshape(-1, 2)[level].ravel()
+            # Leaves point to themselves, anything else is a node one level deeper.
+            level = children[children != np.repeat(level, 2)]
+            depth += bool(len(level))
+        return depth
@@ -4,7 +4,11 @@ from django.urls import path
 from restaurant_recommender.views import (  # type: ignore
     MapRestaurantSearchView,
     PredictBusyness,
+    PredictBusynessTimeline,
+    PredictionMetricsView,
+    RestaurantAutocompleteView,
     RestaurantFreeTextEntrySearchView,
+    SimilarRestaurantsView,
 )
 
 urlpatterns = [
@@ -18,4 +22,12 @@ urlpatterns = [
     # url that uses pickle prediction to predict busyness in zones, defined in restaurant table
     # Input is a dynamic time
     path('<str:time>/zone/', PredictBusyness.as_view(), name='predict-busyness'),
+    # url predicting busyness of all zones at every step between a start and an end time
+    path('zone-busyness/', PredictBusynessTimeline.as_view(), name='predict-busyness-timeline'),
+    # url providing the latency histograms of the busyness predictions
+    path('metrics/', PredictionMetricsView.as_view(), name='prediction-metrics'),
+    # url providing the restaurants most similar to a restaurant
+    path('restaurants/<int:restaurant_id>/similar/', SimilarRestaurantsView.as_view(), name='similar-restaurants'),
+    # url completing restaurant names, cuisines and zones as the user types
+    path('restaurants/autocomplete/', RestaurantAutocompleteView.as_view(), name='restaurant-autocomplete'),
 ]
@@ -18,72 +18,173 @@ Typical usage example:
     # Example of fetching restaurant busyness prediction
     response = self.client.get('/api/2024-07-07T12:00:00/zone/')
     data = response.json()
+
+    # Example of fetching a day of busyness predictions for all zones
+    response = self.client.get('/api/zone-busyness/?start=2024-07-07T00:00:00&end=2024-07-07T23:45:00&step=15')
+    data = response.json()
+
+    # Example of fetching the prediction latency histograms
+    response = self.client.get('/api/metrics/')
+    data = response.json()
+
+    # Example of fetching the restaurants most similar to restaurant 42
+    response = self.client.get('/api/restaurants/42/similar/')
+    data = response.json()
+
+    # Example of completing what the user typed in the search box
+    response = self.client.get('/api/restaurants/autocomplete/?q=piz')
+    data = response.json()
 """
 
 import logging
-from django.core.cache import cache
+from datetime import datetime
+
+import numpy as np
+from django.conf import settings
+from django.utils.cache import add_never_cache_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
 from rest_framework import generics
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 
-from restaurant_recommender.models import Restaurant
-from restaurant_recommender.predictions import make_predictions
-from restaurant_recommender.serializers import (
-    LocationFreeEntrySearchViewSerializer,
-    MapRestaurantSearchSerializer,
-)
+from restaurant_recommender.autocomplete import autocomplete_registry
+from restaurant_recommender.catalog import catalog_registry, catalog_response
+from restaurant_recommender.forecast_grid import floor_to_step
+from restaurant_recommender.models import PredictionModel, Restaurant, WeatherData
+from restaurant_recommender.metrics import StageTimings, metrics_registry, process_label
+from restaurant_recommender.name_index import matching_restaurants
+from restaurant_recommender.predictions import get_prediction_lookup_stats, make_predictions, predict_timeline
+from restaurant_recommender.renderers import MessagePackRenderer, PrometheusTextRenderer
+from restaurant_recommender.restaurant_rows import map_restaurant_rows, search_restaurant_rows
+from restaurant_recommender.similar_restaurants import get_similar_restaurants
+from restaurant_recommender.serializers import LocationFreeEntrySearchViewSerializer
 
 
 logger = logging.getLogger(__name__)
 
 
-class MapRestaurantSearchView(APIView):
-    """
-    View for retrieving restaurants to be displayed on the map{GET}.
+def name_search_page(query_params):
+    """Return the limit and cursor of a page of restaurant name search results.
 
-    This view allows users to see all restaurants in Manhattan on the map.
+    Args:
+        query_params (QueryDict): The query parameters, with optional limit and cursor.
 
-    Query Parameters:
-        restaurant_name: query to filter restaurants by name.
+    Returns:
+        tuple: The limit, RESTAURANT_NAME_SEARCH_LIMIT by default, and the cursor, 0 by default.
+
+    Raises:
+        ValueError: If limit or cursor is not an integer, or out of range.
     """
+    try:
+        limit = int(query_params.get('limit', settings.RESTAURANT_NAME_SEARCH_LIMIT))
+        cursor = int(query_params.get('cursor', 0))
+    except ValueError:
+        msg = "limit and cursor must be integers"
+        raise ValueError(msg) from None
+    if not 0 < limit <= settings.RESTAURANT_NAME_SEARCH_MAX_LIMIT or cursor < 0:
+        msg = f"limit must be between 1 and {settings.RESTAURANT_NAME_SEARCH_MAX_LIMIT} and cursor must not be negative"
+        raise ValueError(msg)
+    return limit, cursor
+
+
+def name_search_response(request, rows, limit, cursor):
+    """Return a page of name search rows, with a Link header to the next page when there is one.
+
+    Args:
+        request: The HTTP request, its other query parameters are kept in the next page link.
+        rows (list): The rows of up to limit + 1 restaurants, the extra one only tells there is a next page.
+        limit (int): Number of restaurants of the page.
+        cursor (int): Position of the first restaurant of the page.
 
-    def get(self, request):
-        restaurant_name = request.query_params.get('restaurant_name')
+    Returns:
+        Response: The rows of the page.
+    """
+    response = Response(rows[:limit])
+    if len(rows) > limit:
+        query_params = request.query_params.copy()
+        query_params['limit'] = limit
+        query_params['cursor'] = cursor + limit
+        next_url = request.build_absolute_uri(f"{request.path}?{query_params.urlencode()}")
+        response['Link'] = f'<{next_url}>; rel="next"'
+    return response
 
-        # Define cache key
-        cache_key = f'restaurants_search_{restaurant_name}' if restaurant_name else 'restaurants_all'
 
-        # Check cache
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            logger.info(f"Retrieved cached data for key: {cache_key}")
-            return Response(cached_data)
+def timeline_range(query_params, max_steps):
+    """Return the start, end and step of a busyness timeline request.
 
-        # Retrieve data from database with query optimization
-        restaurants = self.get_restaurants(restaurant_name)
+    Args:
+        query_params (QueryDict): The query parameters, with start, end and an optional step.
+        max_steps (int): Upper bound on the number of times in one request.
 
-        # Serialize data
-        serializer = MapRestaurantSearchSerializer(
-            restaurants, many=True, context={'request': request}
-        )
-        serialized_data = serializer.data
+    Returns:
+        tuple: The start, rounded down to a multiple of step, and end datetimes and the step
+            in minutes, BUSYNESS_PREDICTION_RESOLUTION_MINUTES by default.
 
-        # Cache serialized data
-        cache.set(cache_key, serialized_data,
-                  timeout=60 * 60 * 2)  # Cache for 2 hours
-        logger.info(f"Cached data for key: {cache_key}")
+    Raises:
+        ValueError: If a parameter is missing, malformed or out of range.
+    """
+    try:
+        start = datetime.strptime(query_params['start'], "%Y-%m-%dT%H:%M:%S")
+        end = datetime.strptime(query_params['end'], "%Y-%m-%dT%H:%M:%S")
+        step = int(query_params.get('step', settings.BUSYNESS_PREDICTION_RESOLUTION_MINUTES))
+    except KeyError as e:
+        msg = f"Missing query parameter: {e.args[0]}"
+        raise ValueError(msg) from None
+
+    if step <= 0 or end < start:
+        msg = "step must be positive and end must not be before start"
+        raise ValueError(msg)
+    start = floor_to_step(start, step)
+    if (end - start).total_seconds() // (step * 60) >= max_steps:
+        msg = f"At most {max_steps} times can be requested at once"
+        raise ValueError(msg)
+    return start, end, step
 
-        return Response(serialized_data)
 
-    def get_restaurants(self, restaurant_name):
+class MapRestaurantSearchView(APIView):
+    """
+    View for retrieving restaurants to be displayed on the map{GET}.
+
+    This view allows users to see all restaurants in Manhattan on the map. The unfiltered list is
+    served from the restaurant catalog snapshot, with an ETag and gzip or brotli encoding.
+
+    Query Parameters:
+        restaurant_name: query to filter restaurants by name, matched by the trigram name index:
+            the names containing the query first, then names with typos sharing enough of its
+            trigrams (RESTAURANT_NAME_SEARCH_MIN_SIMILARITY).
+        limit: Number of matching restaurants to return, RESTAURANT_NAME_SEARCH_LIMIT (100) by
+            default and at most RESTAURANT_NAME_SEARCH_MAX_LIMIT.
+        cursor: Position of the first matching restaurant to return, taken from the Link header
+            of the previous page.
+    """
+
+    def get(self, request):
+        """Return the catalog of all restaurants, or a page of the restaurants matching restaurant_name."""
+        restaurant_name = request.query_params.get('restaurant_name')
+        if not restaurant_name:
+            # All restaurants are served from the pre-rendered, pre-compressed catalog.
+            return catalog_response(request, catalog_registry.get_snapshot())
+
+        try:
+            limit, cursor = name_search_page(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        # Matching names are looked up in the trigram name index, then read with two queries by id.
+        # One more restaurant than the page tells whether there is a next page.
+        restaurants = self.get_restaurants(restaurant_name, limit + 1, cursor)
+        return name_search_response(request, map_restaurant_rows(restaurants), limit, cursor)
+
+    def get_restaurants(self, restaurant_name, limit=None, cursor=0):
+        """Return the page of the restaurants matching restaurant_name, or all restaurants without a name."""
+        # The aspects are read with one grouped query by map_restaurant_rows
         if restaurant_name:
-            # Use prefetch_related for the Aspect model as it has a ForeignKey relationship
-            return Restaurant.objects.filter(
-                restaurant_name__icontains=restaurant_name
-            ).prefetch_related('aspects')  # Use prefetch_related if Aspect is related by ForeignKey
+            return matching_restaurants(restaurant_name, limit, cursor)
         else:
-            return Restaurant.objects.all().prefetch_related('aspects')
+            return Restaurant.objects.all()
 
 
 class RestaurantFreeTextEntrySearchView(generics.ListAPIView):
@@ -92,22 +193,33 @@ class RestaurantFreeTextEntrySearchView(generics.ListAPIView):
 
     This view allows users to search a restaurant by its name, and provides
     an ouput of the specific restaurant with all of its associated aspects.
+    Names are matched by the trigram name index: substrings, prefixes and
+    names with typos, best match first.
 
     Query Parameters:
-        restaurant: The restaurant search with all of its aspects.
+        query: The restaurant name to search, with all of its aspects.
+        limit: Number of restaurants to return, RESTAURANT_NAME_SEARCH_LIMIT (100) by default
+            and at most RESTAURANT_NAME_SEARCH_MAX_LIMIT.
+        cursor: Position of the first restaurant to return, taken from the Link header of the
+            previous page.
     """
     serializer_class = LocationFreeEntrySearchViewSerializer
 
-    def get_queryset(self):
+    def get_queryset(self, limit=None, cursor=0):
+        """Return the page of the restaurants matching the query, or no restaurants without one."""
         query = self.request.query_params.get('query', None)
-        if query:
-            queryset = Restaurant.objects.filter(
-                restaurant_name__icontains=query
-            ).distinct()
-        else:
-            queryset = Restaurant.objects.none()
+        return matching_restaurants(query, limit, cursor) if query else Restaurant.objects.none()
 
-        return queryset.prefetch_related('aspects')
+    def list(self, request, *args, **kwargs):  # noqa: ARG002
+        """Return a page of the matching restaurants with their aspects."""
+        try:
+            limit, cursor = name_search_page(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        # Same output as serializer_class, built from values_list rows and one grouped aspects query
+        rows = search_restaurant_rows(self.get_queryset(limit + 1, cursor))
+        return name_search_response(request, rows, limit, cursor)
 
 
 class PredictBusyness(APIView):
@@ -129,20 +241,150 @@ class PredictBusyness(APIView):
         or an error message if the prediction fails.
     """
 
-    def get(self, request, time):
+    def get(self, request, time):  # noqa: ARG002
+        """Return the predicted busyness of every zone at time."""
+        timings = StageTimings()
         try:
             # Directly call make_predictions to see what is happening without storing predictions
-            result = make_predictions(time)
+            result = make_predictions(time, timings=timings)
+        except Exception as e:
+            return Response({'error': str(e)}, status=500)
 
-            print(result)
+        # Return the raw result for inspection
+        response = Response(result, status=500 if 'error' in result else 200)
+        if settings.BUSYNESS_SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing()
+            # The timings describe this request, the page cache must not replay them.
+            add_never_cache_headers(response)
+        return response
 
-            if 'error' in result:
-                return Response(result, status=500)
-            # Return the raw result for inspection
-            return Response(result)
 
-        except Exception as e:
-            return Response({'error': str(e)}, status=500)
+class PredictBusynessTimeline(APIView):
+    """
+    View for retrieving busyness predictions of all zones at many times in one request{GET}.
+
+    All zones and times are predicted in a single batch, or read from the precomputed
+    forecast when every time is inside its horizon.
+
+    Query Parameters:
+        start: The first time in '%Y-%m-%dT%H:%M:%S' format, rounded down to a multiple of step.
+        end: The last time in '%Y-%m-%dT%H:%M:%S' format, inclusive.
+        step: Minutes between two times, defaults to BUSYNESS_PREDICTION_RESOLUTION_MINUTES.
+        format: 'json' (default) or 'msgpack', can also be chosen with the Accept header.
+
+    Returns:
+        The zones, the timestamps, and a zone by timestamp matrix of predicted values. In the
+        msgpack form the values are little-endian float32 bytes in row-major order.
+    """
+
+    renderer_classes = [JSONRenderer, MessagePackRenderer]
+    # Upper bound on the number of times in one request, a week at 5 minute steps.
+    max_steps = 7 * 24 * 12
+
+    def get(self, request):
+        """Return the predicted busyness of every zone at every time from start to end."""
+        try:
+            start, end, step = timeline_range(request.query_params, self.max_steps)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+
+        try:
+            timeline = predict_timeline(start, end, step)
+        except PredictionModel.DoesNotExist:
+            return Response({'error': "No active prediction model found"}, status=500)
+        except WeatherData.DoesNotExist:
+            logger.warning("No weather data found for the busyness timeline.")
+            return Response({'error': "No weather data found"}, status=500)
+        except (FileNotFoundError, ValueError):
+            logger.exception("Model artifact missing or corrupt for the busyness timeline")
+            return Response({'error': "The prediction model artifact could not be loaded"}, status=500)
+
+        values = timeline['values']
+        data = {
+            'zones': timeline['zones'],
+            'timestamps': [timestamp.strftime("%Y-%m-%dT%H:%M:%S") for timestamp in timeline['timestamps']],
+            'model_version': timeline['model_version'],
+            'shape': list(values.shape),
+        }
+        if request.accepted_renderer.format == MessagePackRenderer.format:
+            data['values'] = np.ascontiguousarray(values, dtype='<f4').tobytes()
+        else:
+            data['values'] = values.tolist()
+
+        return Response(data)
+
+
+class PredictionMetricsView(APIView):
+    """
+    View for retrieving the latency histograms of the busyness prediction path{GET}.
+
+    The histograms belong to the process that answers the request, named in the response.
+    Responses are never cached, every scrape reads the current counters.
+
+    Query Parameters:
+        format: 'json' (default) or 'prometheus' for the Prometheus text exposition format.
+
+    Returns:
+        Every histogram with its count, sum in seconds and cumulative buckets, and the
+        prediction lookup counters.
+    """
+
+    renderer_classes = [JSONRenderer, PrometheusTextRenderer]
+
+    @method_decorator(never_cache)
+    def get(self, request):
+        """Return the histograms and lookup counters of this process."""
+        if request.accepted_renderer.format == PrometheusTextRenderer.format:
+            return Response(metrics_registry.render_prometheus())
+
+        return Response({
+            'process': process_label(),
+            'histograms': metrics_registry.snapshot(),
+            'prediction_lookups': get_prediction_lookup_stats(),
+        })
+
+
+class SimilarRestaurantsView(APIView):
+    """
+    View for retrieving the restaurants most similar to a restaurant{GET}.
+
+    The neighbors are read from the similar restaurants table, rebuilt by the
+    build_similar_restaurants task from the likes of the users and the content of the restaurants.
+
+    Returns:
+        The similar restaurants with their similarity, most similar first, or 404 if the
+        restaurant does not exist.
+    """
+
+    def get(self, request, restaurant_id):  # noqa: ARG002
+        """Return the restaurants most similar to restaurant_id."""
+        similar_restaurants = get_similar_restaurants(restaurant_id)
+        # Only an empty result needs to tell an unknown restaurant from one without neighbors.
+        if not similar_restaurants and not Restaurant.objects.filter(id=restaurant_id).exists():
+            return Response({'error': 'Restaurant not found'}, status=404)
+        return Response(similar_restaurants)
+
+
+class RestaurantAutocompleteView(APIView):
+    """
+    View for completing what the user types in the search box{GET}.
+
+    Completions are served from the in-memory autocomplete index of the restaurant names,
+    cuisines and zones, without reading the database.
+
+    Query Parameters:
+        q: The text typed so far.
+
+    Returns:
+        The id, name and match type (name, cuisine or zone) of the matching restaurants, by
+        descending overall rating. Never cached: the index already answers from memory, and the
+        page cache would keep one entry per keystroke and serve completions of outdated data.
+    """
+
+    @method_decorator(never_cache)
+    def get(self, request):
+        """Return the completions of the q query parameter."""
+        return Response(autocomplete_registry.complete(request.query_params.get('q', '')))
 
 
 """
@@ -0,0 +1,112 @@
+"""In-process registry of the restaurant zones and their taxi location ids.
+
+Every prediction needs the unique (zone, location_id) pairs of all restaurants. Instead of a
+DISTINCT query over the restaurant table per prediction, each process builds the pairs once as
+arrays, together with the restaurant to zone and zone to restaurants maps, and only rebuilds
+them when the restaurants data version changes, i.e. after a restaurant loader ran.
+
+Typical usage example:
+
+    index = zone_registry.get_index()
+    features = build_feature_matrix(index.location_ids, temp, dwpt, prcp, selected_time)
+    zone = zone_registry.zone_of(restaurant_id)
+"""
+
+import logging
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
+from restaurant_recommender.data_versions import RESTAURANTS, get_data_version
+from restaurant_recommender.models import Restaurant  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class ZoneIndex(NamedTuple):
+    """The zones of all restaurants, as built from one restaurants data version.
+
+    Attributes:
+        version: Restaurants data version the index was built from.
+        zones: Zone name of every unique (zone, location_id) pair, in prediction row order.
+        location_ids: int64 DOLocationID of every pair, aligned with zones.
+        restaurant_zones: Zone name of every restaurant id.
+        zone_restaurants: Sorted int64 array of restaurant ids for every zone name.
+    """
+
+    version: int
+    zones: list
+    location_ids: np.ndarray
+    restaurant_zones: dict
+    zone_restaurants: dict
+
+
+def build_zone_index(version):
+    """Build a ZoneIndex with a single query over the restaurant table.
+
+    Args:
+        version (int): Restaurants data version the index is built from.
+
+    Returns:
+        ZoneIndex: The index.
+    """
+    rows = list(Restaurant.objects.order_by("id").values_list("id", "zone", "location_id"))
+
+    # Sorted so the row order of the predictions is stable between processes and versions.
+    pairs = sorted({(zone, location_id) for _, zone, location_id in rows}, key=lambda pair: (pair[0] or "", pair[1]))
+
+    zone_restaurant_ids = {}
+    for restaurant_id, zone, _ in rows:
+        zone_restaurant_ids.setdefault(zone, []).append(restaurant_id)
+
+    return ZoneIndex(
+        version=version,
+        zones=[zone for zone, _ in pairs],
+        location_ids=np.array([location_id for _, location_id in pairs], dtype=np.int64),
+        restaurant_zones={restaurant_id: zone for restaurant_id, zone, _ in rows},
+        zone_restaurants={
+            zone: np.array(restaurant_ids, dtype=np.int64) for zone, restaurant_ids in zone_restaurant_ids.items()
+        },
+    )
+
+
+class ZoneRegistry:
+    """Keeps the ZoneIndex in memory, keyed by the restaurants data version."""
+
+    def __init__(self):
+        """Initialize the registry empty, the first lookup builds the zone index."""
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get_index(self):
+        """Return the zone index, rebuilding it only when the restaurants data changed."""
+        version = get_data_version(RESTAURANTS)
+        index = self._index
+        if index is not None and index.version == version:
+            return index
+
+        with self._lock:
+            if self._index is None or self._index.version != version:
+                self._index = build_zone_index(version)
+                logger.info(
+                    f"Zone registry built for restaurants version {version}: "
+                    f"{len(self._index.zones)} zones, {len(self._index.restaurant_zones)} restaurants"
+                )
+            return self._index
+
+    def zone_of(self, restaurant_id):
+        """Return the zone of a restaurant, or None if it is unknown."""
+        return self.get_index().restaurant_zones.get(restaurant_id)
+
+    def restaurants_in(self, zone):
+        """Return the sorted ids of the restaurants in a zone."""
+        return self.get_index().zone_restaurants.get(zone, np.empty(0, dtype=np.int64))
+
+    def clear(self):
+        """Drop the index, forcing a rebuild on the next lookup."""
+        with self._lock:
+            self._index = None
+
+
+zone_registry = ZoneRegistry()
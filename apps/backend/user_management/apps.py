@@ -8,3 +8,7 @@ class UserManagementConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "user_management"
+
+    def ready(self):
+        """Connect the signal handlers of the app."""
+        from user_management import signals  # noqa: F401, PLC0415
@@ -0,0 +1,336 @@
+"""Implicit-feedback matrix factorization of the liked restaurants, trained offline.
+
+Every like is an implicit positive interaction. Implicit alternating least squares (Hu, Koren
+and Volinsky, 2008) fits a float32 factor vector per user and per restaurant, where every
+(user, restaurant) pair is weighted by a confidence of 1 + alpha for a like and 1 otherwise.
+Each half step solves one small least squares system per user (or restaurant). Those systems
+are independent, so they are solved in batches on a thread pool, NumPy releases the GIL in the
+linear algebra.
+
+Training runs in the train_recommendation_factors command or Celery task and stores a new
+RecommendationFactors row, web processes keep serving the previous factors until they see the
+new version. Users liking restaurants after the training, or not trained at all, are folded in:
+their factor vector is solved against the fixed restaurant factors from their current likes.
+
+Scoring every restaurant for a user is then one matrix-vector product.
+
+Typical usage example:
+
+    train_factor_model()
+    restaurant_ids, scores = factor_registry.score_restaurants(request.user.id)
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from scipy import sparse  # type: ignore
+
+from restaurant_recommender.models import Restaurant  # type: ignore
+from user_management.models import RecommendationFactors, UserLikedRestaurant  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+FACTORS_VERSION_CACHE_KEY = "recommendation_factors_version"
+# Version stamp used when no factors have been trained yet.
+NO_FACTORS = 0
+# Number of users or restaurants whose systems are solved in one batch.
+SOLVE_BATCH_SIZE = 512
+# Floats of the like outer products computed at once by a batch, 16 MB of float32.
+SOLVE_CHUNK_ELEMENTS = 1 << 22
+
+
+def solve_factors(likes, fixed_factors, fixed_gram, alpha, regularization):
+    """Solve the factor vector of every row of a like matrix against fixed factors.
+
+    For a row with liked columns I, the vector x solves
+    (F^T F + alpha * F_I^T F_I + regularization * I) x = (1 + alpha) * sum(F_I).
+
+    Args:
+        likes (scipy.sparse.csr_matrix): Rows to solve, with the liked columns of every row.
+        fixed_factors (numpy.ndarray): float32 factors of the columns.
+        fixed_gram (numpy.ndarray): F^T F, shared by every row.
+        alpha (float): Confidence weight of a like.
+        regularization (float): L2 regularization.
+
+    Returns:
+        numpy.ndarray: float32 factors, one row per row of likes. Rows without likes are 0.
+    """
+    factor_count = fixed_factors.shape[1]
+    row_count = likes.shape[0]
+    like_rows = np.repeat(np.arange(row_count), np.diff(likes.indptr))
+    liked = likes.indices[likes.indptr[0] : likes.indptr[-1]]
+
+    # F_I^T F_I and sum(F_I) of every row, accumulated over chunks of likes so that the outer
+    # products of a chunk stay within SOLVE_CHUNK_ELEMENTS floats however many likes a row has.
+    like_grams = np.zeros((row_count, factor_count, factor_count), dtype=np.float32)
+    like_sums = np.zeros((row_count, factor_count), dtype=np.float32)
+    chunk_size = max(1, SOLVE_CHUNK_ELEMENTS // (factor_count * factor_count))
+    for start in range(0, len(liked), chunk_size):
+        gathered = fixed_factors[liked[start : start + chunk_size]]
+        chunk_rows = like_rows[start : start + chunk_size]
+        # Likes are grouped by row, so every row of the chunk is one contiguous segment.
+        segments = np.flatnonzero(np.diff(chunk_rows, prepend=-1))
+        outer = gathered[:, :, None] * gathered[:, None, :]
+        like_grams[chunk_rows[segments]] += np.add.reduceat(outer, segments, axis=0)
+        like_sums[chunk_rows[segments]] += np.add.reduceat(gathered, segments, axis=0)
+
+    solution = np.zeros((row_count, factor_count), dtype=np.float32)
+    rows = np.flatnonzero(np.diff(likes.indptr))
+    if not len(rows):
+        return solution
+
+    matrices = fixed_gram + alpha * like_grams[rows]
+    matrices += regularization * np.eye(factor_count, dtype=np.float32)
+    targets = (1 + alpha) * like_sums[rows]
+    solution[rows] = np.linalg.solve(matrices, targets[:, :, None])[:, :, 0]
+    return solution
+
+
+def _half_step(likes, fixed_factors, alpha, regularization, executor):
+    """Solve every row of likes against the fixed factors, one batch of rows per thread task."""
+    if not likes.shape[0]:
+        return np.zeros((0, fixed_factors.shape[1]), np.float32)
+
+    fixed_gram = fixed_factors.T @ fixed_factors
+    solved = executor.map(
+        lambda start: solve_factors(
+            likes[start : start + SOLVE_BATCH_SIZE], fixed_factors, fixed_gram, alpha, regularization
+        ),
+        range(0, likes.shape[0], SOLVE_BATCH_SIZE),
+    )
+    return np.concatenate(list(solved))
+
+
+def train_als(likes, *, factors=32, alpha=40.0, regularization=0.1, iterations=15, threads=None, seed=0):  # noqa: PLR0913
+    """Fit implicit ALS factors on a binary user by restaurant like matrix.
+
+    Args:
+        likes (scipy.sparse.csr_matrix): 1 where a user liked a restaurant.
+        factors (int, optional): Number of latent factors.
+        alpha (float, optional): Confidence weight of a like.
+        regularization (float, optional): L2 regularization.
+        iterations (int, optional): Number of user then restaurant half steps.
+        threads (int, optional): Size of the thread pool, the number of CPUs by default.
+        seed (int, optional): Seed of the initial factors.
+
+    Returns:
+        tuple: float32 user factors and restaurant factors.
+    """
+    generator = np.random.default_rng(seed)
+    likes = sparse.csr_matrix(likes, dtype=np.float32)
+    likes_by_restaurant = likes.T.tocsr()
+    user_factors = np.zeros((likes.shape[0], factors), dtype=np.float32)
+    restaurant_factors = (generator.standard_normal((likes.shape[1], factors)) * 0.01).astype(np.float32)
+
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count()) as executor:
+        for _ in range(iterations):
+            user_factors = _half_step(likes, restaurant_factors, alpha, regularization, executor)
+            restaurant_factors = _half_step(likes_by_restaurant, user_factors, alpha, regularization, executor)
+    return user_factors, restaurant_factors
+
+
+def train_factor_model(factors=None, alpha=None, regularization=None, iterations=None, threads=None):
+    """Train factors on every like, store them and publish their version.
+
+    Parameters default to the RECOMMENDATION_ALS_* settings.
+
+    Returns:
+        RecommendationFactors: The stored factors.
+    """
+    factors = factors or settings.RECOMMENDATION_ALS_FACTORS
+    alpha = settings.RECOMMENDATION_ALS_ALPHA if alpha is None else alpha
+    regularization = settings.RECOMMENDATION_ALS_REGULARIZATION if regularization is None else regularization
+    iterations = iterations or settings.RECOMMENDATION_ALS_ITERATIONS
+    threads = threads or settings.RECOMMENDATION_ALS_THREADS
+
+    restaurant_ids = np.array(Restaurant.objects.order_by("id").values_list("id", flat=True), dtype=np.int64)
+    pairs = np.array(
+        UserLikedRestaurant.objects.filter(restaurant_id__in=restaurant_ids.tolist()).values_list(
+            "user_id", "restaurant_id"
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    columns = np.searchsorted(restaurant_ids, pairs[:, 1])
+    likes = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)), shape=(len(user_ids), len(restaurant_ids))
+    )
+
+    user_factors, restaurant_factors = train_als(
+        likes, factors=factors, alpha=alpha, regularization=regularization, iterations=iterations, threads=threads
+    )
+    model = RecommendationFactors.objects.create(
+        factors=factors,
+        alpha=alpha,
+        regularization=regularization,
+        iterations=iterations,
+        user_ids=user_ids.tobytes(),
+        restaurant_ids=restaurant_ids.tobytes(),
+        user_factors=np.ascontiguousarray(user_factors).tobytes(),
+        restaurant_factors=np.ascontiguousarray(restaurant_factors).tobytes(),
+    )
+    RecommendationFactors.objects.exclude(id=model.id).delete()
+    cache.set(FACTORS_VERSION_CACHE_KEY, model.id, timeout=3600)
+    logger.info(
+        f"Recommendation factors {model.id} trained on {len(pairs)} likes of {len(user_ids)} users "
+        f"and {len(restaurant_ids)} restaurants"
+    )
+    return model
+
+
+class LoadedFactors(NamedTuple):
+    """Trained factors held in memory.
+
+    Attributes:
+        version: Id of the RecommendationFactors row.
+        alpha: Confidence weight of a like, used to fold in users.
+        regularization: L2 regularization, used to fold in users.
+        user_ids: Sorted int64 id of the user of every row of user_factors.
+        restaurant_ids: Sorted int64 id of the restaurant of every row of restaurant_factors.
+        user_factors: float32 user by factor matrix.
+        restaurant_factors: float32 restaurant by factor matrix.
+        restaurant_gram: restaurant_factors^T restaurant_factors, used to fold in users.
+    """
+
+    version: int
+    alpha: float
+    regularization: float
+    user_ids: np.ndarray
+    restaurant_ids: np.ndarray
+    user_factors: np.ndarray
+    restaurant_factors: np.ndarray
+    restaurant_gram: np.ndarray
+
+
+class FactorRegistry:
+    """Keeps the latest recommendation factors in memory, keyed by their version stamp."""
+
+    def __init__(self):
+        """Initialize the registry without factors, the first lookup loads the latest ones."""
+        self._lock = threading.Lock()
+        self._factors = None
+
+    def get_factors(self):
+        """Return the latest factors, reloading them only when their version changed, or None."""
+        version = cache.get(FACTORS_VERSION_CACHE_KEY)
+        if version is None:
+            version = (
+                RecommendationFactors.objects.order_by("-created_at").values_list("id", flat=True).first()
+                or NO_FACTORS
+            )
+            cache.set(FACTORS_VERSION_CACHE_KEY, version, timeout=3600)
+
+        if version == NO_FACTORS:
+            return None
+
+        factors = self._factors
+        if factors is not None and factors.version == version:
+            return factors
+
+        with self._lock:
+            if self._factors is None or self._factors.version != version:
+                self._factors = self._load(version)
+            return self._factors
+
+    @staticmethod
+    def liked_columns(user_id, factors):
+        """Return the sorted factor columns of the trained restaurants a user currently likes."""
+        liked_ids = np.array(
+            UserLikedRestaurant.objects.filter(user_id=user_id).values_list("restaurant_id", flat=True),
+            dtype=np.int64,
+        )
+        # Restaurants added since the training have no factors.
+        liked_ids = liked_ids[np.isin(liked_ids, factors.restaurant_ids)]
+        return np.unique(np.searchsorted(factors.restaurant_ids, liked_ids))
+
+    @staticmethod
+    def fold_in(liked_columns, factors):
+        """Solve the factor vector of a user from their liked columns against the restaurant factors.
+
+        Returns:
+            numpy.ndarray: The float32 factor vector, or None if the user likes no trained restaurant.
+        """
+        if not len(liked_columns):
+            return None
+
+        likes = sparse.csr_matrix(
+            (
+                np.ones(len(liked_columns), dtype=np.float32),
+                (np.zeros(len(liked_columns), dtype=np.int64), liked_columns),
+            ),
+            shape=(1, len(factors.restaurant_ids)),
+        )
+        return solve_factors(
+            likes, factors.restaurant_factors, factors.restaurant_gram, factors.alpha, factors.regularization
+        )[0]
+
+    def user_vector(self, user_id, factors, liked_columns):
+        """Return the trained factor vector of a user, folding them in if they were not trained."""
+        row = np.searchsorted(factors.user_ids, user_id)
+        if row < len(factors.user_ids) and factors.user_ids[row] == user_id:
+            return factors.user_factors[row]
+        return self.fold_in(liked_columns, factors)
+
+    def score_restaurants(self, user_id):
+        """Score every trained restaurant for a user with one matrix-vector product.
+
+        The restaurants the user already likes score 0, so they are never recommended.
+
+        Args:
+            user_id (int): The user to score restaurants for.
+
+        Returns:
+            tuple: The int64 restaurant ids and their float32 scores, or None if there are no
+            factors yet or the user likes no trained restaurant.
+        """
+        factors = self.get_factors()
+        if factors is None:
+            return None
+        liked_columns = self.liked_columns(user_id, factors)
+        user_vector = self.user_vector(user_id, factors, liked_columns)
+        if user_vector is None:
+            return None
+        scores = factors.restaurant_factors @ user_vector
+        scores[liked_columns] = 0
+        return factors.restaurant_ids, scores
+
+    def clear(self):
+        """Drop the loaded factors, forcing a reload on the next lookup."""
+        with self._lock:
+            self._factors = None
+
+    @staticmethod
+    def _load(version):
+        model = RecommendationFactors.objects.filter(id=version).first()
+        if model is None:
+            return None
+
+        restaurant_ids = np.frombuffer(bytes(model.restaurant_ids), dtype=np.int64)
+        restaurant_factors = np.frombuffer(bytes(model.restaurant_factors), dtype=np.float32).reshape(
+            len(restaurant_ids), model.factors
+        )
+        user_ids = np.frombuffer(bytes(model.user_ids), dtype=np.int64)
+        logger.info(
+            f"Recommendation factors {version} loaded: {len(user_ids)} users, {len(restaurant_ids)} restaurants"
+        )
+        return LoadedFactors(
+            version=version,
+            alpha=model.alpha,
+            regularization=model.regularization,
+            user_ids=user_ids,
+            restaurant_ids=restaurant_ids,
+            user_factors=np.frombuffer(bytes(model.user_factors), dtype=np.float32).reshape(
+                len(user_ids), model.factors
+            ),
+            restaurant_factors=restaurant_factors,
+            restaurant_gram=restaurant_factors.T @ restaurant_factors,
+        )
+
+
+factor_registry = FactorRegistry()
@@ -0,0 +1,500 @@
+"""Approximate user similarity with a MinHash/LSH index over preferences and liked restaurants.
+
+Every user is a set of tokens, their selectable preferences and their liked restaurants. The
+MinHash signature of a set has one minimum hash per permutation, and two signatures agree on a
+permutation with a probability equal to the Jaccard similarity of the sets. Signatures are cut
+into bands of rows, and users sharing the hash of any band land in the same bucket. A query only
+looks at the users sharing a bucket with the queried user, ranked by the agreement of their
+signatures, so it does not scan every user.
+
+The build_user_lsh_index task computes the signatures of every user and stores them as a
+UserLSHSnapshot; web processes never build the index themselves, they load the latest snapshot.
+Every change to a user's sets bumps the user sets data version and records the user id in the
+UserSetChange table, so a process behind the data version only re-inserts the changed users.
+Changes that may affect every user, or more than MAX_LOGGED_CHANGES of them, queue a new snapshot
+instead, and the process keeps serving its current index until the snapshot is published.
+
+More bands find more of the true neighbors but produce more candidates to rank, more rows per
+band do the opposite; the benchmark_user_lsh command measures both against the exact scan.
+
+Typical usage example:
+
+    user_ids, similarities = user_lsh_registry.similar_users(request.user.id, limit=20)
+    similar_users = get_approximate_similar_users(request.user.id)  # With the emails of the users.
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from restaurant_recommender.data_versions import USER_SETS, bump_data_version, get_data_version
+from user_management.models import (  # type: ignore
+    UserLikedRestaurant,
+    UserLSHSnapshot,
+    UserPreference,
+    UserSetChange,
+)
+from user_management.similarity import JACCARD, intersection_counts, pack_bits, similarity_from_counts
+from user_management.tasks import build_user_lsh_index
+
+logger = logging.getLogger(__name__)
+
+# Hashes are (a * token + b) mod this Mersenne prime, small enough for a * token to fit in uint64.
+MERSENNE_PRIME = np.uint64(2**31 - 1)
+# Fixed, so every process hashes with the same permutations.
+HASH_SEED = 42
+# Number of users whose signatures are computed at once when the index is built.
+SIGNATURE_CHUNK_SIZE = 4096
+
+# A process further behind than this waits for the next snapshot.
+MAX_LOGGED_CHANGES = 1000
+# Cache key of the id of the latest UserLSHSnapshot, NO_SNAPSHOT before the first one is built.
+SNAPSHOT_CACHE_KEY = "user_lsh_snapshot"
+NO_SNAPSHOT = 0
+# Cache key set while a build_user_lsh_index task is queued, so processes queue it only once.
+BUILD_QUEUED_CACHE_KEY = "user_lsh_build_queued"
+
+
+def record_user_change(user_id=None):
+    """Bump the user sets data version and log which user changed.
+
+    Args:
+        user_id (int, optional): The user whose preferences or liked restaurants changed, None
+            if every user may be affected.
+    """
+    with transaction.atomic():
+        version = bump_data_version(USER_SETS)
+        UserSetChange.objects.create(version=version, user_id=user_id)
+
+
+def preference_token(preference_id):
+    """Return the token of a preference, preferences and restaurants never share a token."""
+    return preference_id * 2
+
+
+def restaurant_token(restaurant_id):
+    """Return the token of a liked restaurant."""
+    return restaurant_id * 2 + 1
+
+
+def load_user_token_pairs(user_ids=None):
+    """Return the (user id, token) pairs of the sets of users, with one query per kind of token.
+
+    Args:
+        user_ids (iterable, optional): The users to load, every user by default.
+
+    Returns:
+        numpy.ndarray: int64 (pairs, 2) array sorted by user id then token.
+    """
+    preferences = UserPreference.objects.filter(preference__is_selectable=True)
+    likes = UserLikedRestaurant.objects.all()
+    if user_ids is not None:
+        preferences = preferences.filter(user_id__in=list(user_ids))
+        likes = likes.filter(user_id__in=list(user_ids))
+
+    preference_pairs = np.array(preferences.values_list("user_id", "preference_id"), dtype=np.int64).reshape(-1, 2)
+    like_pairs = np.array(likes.values_list("user_id", "restaurant_id"), dtype=np.int64).reshape(-1, 2)
+    pairs = np.concatenate((
+        np.column_stack((preference_pairs[:, 0], preference_token(preference_pairs[:, 1]))),
+        np.column_stack((like_pairs[:, 0], restaurant_token(like_pairs[:, 1]))),
+    ))
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+class MinHashLSH:
+    """MinHash signatures of user token sets, bucketed by band for sub-linear lookups.
+
+    Queries and updates are thread safe.
+
+    Attributes:
+        bands: Number of bands of every signature.
+        rows: Number of minimum hashes per band.
+        version: User sets data version the index is up to date with.
+    """
+
+    def __init__(self, bands=16, rows=4, version=None, seed=HASH_SEED):
+        """Initialize an empty index and draw its hash functions.
+
+        Args:
+            bands (int, optional): Number of bands of every signature.
+            rows (int, optional): Number of minimum hashes per band.
+            version (int, optional): User sets data version the index is up to date with.
+            seed (int, optional): Seed of the hash functions, indexes compare signatures only
+                when they share it.
+        """
+        self.bands = bands
+        self.rows = rows
+        self.version = version
+        generator = np.random.default_rng(seed)
+        permutation_count = bands * rows
+        self._a = generator.integers(1, MERSENNE_PRIME, size=permutation_count, dtype=np.uint64)
+        self._b = generator.integers(0, MERSENNE_PRIME, size=permutation_count, dtype=np.uint64)
+        self._lock = threading.RLock()
+        self._signatures = {}
+        self._buckets = [{} for _ in range(bands)]
+
+    def __len__(self):
+        """Return the number of users in the index."""
+        return len(self._signatures)
+
+    def signatures(self, pairs):
+        """Compute the MinHash signature of every user of (user id, token) pairs.
+
+        Args:
+            pairs (numpy.ndarray): int64 (pairs, 2) array sorted by user id.
+
+        Returns:
+            tuple: The unique user ids and their (users, bands * rows) uint32 signatures.
+        """
+        user_ids, starts = np.unique(pairs[:, 0], return_index=True)
+        tokens = pairs[:, 1].astype(np.uint64) % MERSENNE_PRIME
+        ends = np.append(starts[1:], len(pairs))
+        signatures = np.empty((len(user_ids), len(self._a)), dtype=np.uint32)
+        for start in range(0, len(user_ids), SIGNATURE_CHUNK_SIZE):
+            stop = min(start + SIGNATURE_CHUNK_SIZE, len(user_ids))
+            chunk_tokens = tokens[starts[start] : ends[stop - 1]]
+            hashes = (chunk_tokens[:, None] * self._a + self._b) % MERSENNE_PRIME
+            signatures[start:stop] = np.minimum.reduceat(hashes, starts[start:stop] - starts[start], axis=0)
+        return user_ids, signatures
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows : (band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def insert(self, user_id, signature):
+        """Add a user to the index, replacing their previous signature."""
+        with self._lock:
+            self.remove(user_id)
+            self._signatures[user_id] = signature
+            for buckets, key in zip(self._buckets, self._band_keys(signature), strict=True):
+                buckets.setdefault(key, set()).add(user_id)
+
+    def insert_many(self, user_ids, signatures):
+        """Add users that are not in the index yet, grouping them by bucket with one sort per band.
+
+        Args:
+            user_ids (numpy.ndarray): int64 ids of the users.
+            signatures (numpy.ndarray): Their (users, bands * rows) uint32 signatures.
+        """
+        if not len(user_ids):
+            return
+        key_type = np.dtype((np.void, self.rows * signatures.itemsize))
+        with self._lock:
+            self._signatures.update(zip(user_ids.tolist(), signatures, strict=True))
+            for band, buckets in enumerate(self._buckets):
+                keys = np.ascontiguousarray(signatures[:, band * self.rows : (band + 1) * self.rows])
+                band_keys, inverse = np.unique(keys.view(key_type).ravel(), return_inverse=True)
+                order = np.argsort(inverse, kind="stable")
+                members = np.split(user_ids[order], np.flatnonzero(np.diff(inverse[order])) + 1)
+                for key, bucket in zip(band_keys, members, strict=True):
+                    buckets.setdefault(key.tobytes(), set()).update(bucket.tolist())
+
+    def remove(self, user_id):
+        """Remove a user from the index, if present."""
+        with self._lock:
+            signature = self._signatures.pop(user_id, None)
+            if signature is None:
+                return
+            for buckets, key in zip(self._buckets, self._band_keys(signature), strict=True):
+                bucket = buckets[key]
+                bucket.discard(user_id)
+                if not bucket:
+                    del buckets[key]
+
+    def update_users(self, user_ids):
+        """Re-insert users from their current sets in the database, removing users without any."""
+        user_ids = set(user_ids)
+        changed_ids, signatures = self.signatures(load_user_token_pairs(user_ids))
+        with self._lock:
+            for user_id, signature in zip(changed_ids.tolist(), signatures, strict=True):
+                self.insert(user_id, signature)
+            for user_id in user_ids.difference(changed_ids.tolist()):
+                self.remove(user_id)
+
+    def similar_users(self, user_id, limit=None):
+        """Return the users of the index that share a bucket with a user, most similar first.
+
+        Args:
+            user_id (int): The user to find neighbors for, never part of the result.
+            limit (int, optional): Maximum number of users to return, all candidates by default.
+
+        Returns:
+            tuple: The int64 user ids and their estimated Jaccard similarities, by descending
+            similarity then ascending user id. Empty if the user is not in the index.
+        """
+        with self._lock:
+            signature = self._signatures.get(user_id)
+            if signature is None:
+                return np.empty(0, dtype=np.int64), np.empty(0)
+            candidates = set()
+            for buckets, key in zip(self._buckets, self._band_keys(signature), strict=True):
+                candidates.update(buckets.get(key, ()))
+            candidates.discard(user_id)
+            candidate_ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            candidate_signatures = np.array([self._signatures[candidate] for candidate in candidate_ids.tolist()])
+
+        if not len(candidate_ids):
+            return candidate_ids, np.empty(0)
+        similarities = (candidate_signatures == signature).mean(axis=1)
+        order = np.lexsort((candidate_ids, -similarities))[:limit]
+        return candidate_ids[order], similarities[order]
+
+
+def latest_snapshot_id():
+    """Return the id of the latest UserLSHSnapshot, NO_SNAPSHOT before the first one is built."""
+    snapshot_id = cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot_id is None:
+        snapshot_id = UserLSHSnapshot.objects.order_by("-id").values_list("id", flat=True).first() or NO_SNAPSHOT
+        cache.set(SNAPSHOT_CACHE_KEY, snapshot_id, timeout=3600)
+    return snapshot_id
+
+
+def queue_user_lsh_build():
+    """Queue a build_user_lsh_index task, unless one is queued already."""
+    # Expires in case the worker dies before publishing the snapshot.
+    if cache.add(BUILD_QUEUED_CACHE_KEY, value=True, timeout=3600):
+        build_user_lsh_index.delay()
+
+
+def publish_user_lsh(bands=None, rows=None):
+    """Compute the signatures of every user with two queries and store them as the latest snapshot.
+
+    Older snapshots and the change log entries the snapshot covers are deleted.
+
+    Args:
+        bands (int, optional): Number of bands, SIMILAR_USERS_LSH_BANDS by default.
+        rows (int, optional): Rows per band, SIMILAR_USERS_LSH_ROWS by default.
+
+    Returns:
+        UserLSHSnapshot: The stored snapshot.
+    """
+    # Read before the sets, so changes committed during the build are applied again from the log.
+    version = get_data_version(USER_SETS)
+    index = MinHashLSH(bands=bands or settings.SIMILAR_USERS_LSH_BANDS, rows=rows or settings.SIMILAR_USERS_LSH_ROWS)
+    user_ids, signatures = index.signatures(load_user_token_pairs())
+    snapshot = UserLSHSnapshot.objects.create(
+        version=version,
+        bands=index.bands,
+        rows=index.rows,
+        user_ids=user_ids.tobytes(),
+        signatures=signatures.tobytes(),
+    )
+    UserLSHSnapshot.objects.exclude(id=snapshot.id).delete()
+    # Processes behind the snapshot load it instead of reading these.
+    UserSetChange.objects.filter(version__lte=version).delete()
+    cache.set(SNAPSHOT_CACHE_KEY, snapshot.id, timeout=3600)
+    cache.delete(BUILD_QUEUED_CACHE_KEY)
+    logger.info(f"User LSH snapshot {snapshot.id} built for user sets version {version}: {len(user_ids)} users")
+    return snapshot
+
+
+class UserLSHRegistry:
+    """Keeps the MinHashLSH index of the latest snapshot in memory, caught up with the change log."""
+
+    def __init__(self):
+        """Initialize the registry without an index, the first lookup loads the latest snapshot."""
+        self._lock = threading.Lock()
+        self._index = None
+        self._snapshot_id = None
+        # User sets version the index waits for a snapshot of.
+        self._awaited_version = None
+
+    def get_index(self):
+        """Return the index, catching it up with the change log or a newer snapshot.
+
+        The lookup that catches up holds the lock, concurrent lookups keep getting the current
+        index meanwhile.
+
+        Returns:
+            MinHashLSH: The index, None until the first snapshot is built.
+        """
+        version = get_data_version(USER_SETS)
+        snapshot_id = latest_snapshot_id()
+        index = self._index
+        if (
+            index is not None
+            and snapshot_id == self._snapshot_id
+            and version in {index.version, self._awaited_version}
+        ):
+            return index
+
+        # Without an index there is nothing to serve meanwhile.
+        if not self._lock.acquire(blocking=index is None):
+            return index
+        try:
+            if snapshot_id != self._snapshot_id:
+                self._load_snapshot(snapshot_id)
+            if self._index is None:
+                queue_user_lsh_build()
+            elif self._index.version < version:
+                self._catch_up(version)
+            return self._index
+        finally:
+            self._lock.release()
+
+    def _load_snapshot(self, snapshot_id):
+        self._snapshot_id = snapshot_id
+        snapshot = UserLSHSnapshot.objects.filter(id=snapshot_id).first()
+        # The change log may have brought the current index past the snapshot already.
+        if snapshot is None or (self._index is not None and self._index.version >= snapshot.version):
+            return
+
+        index = MinHashLSH(bands=snapshot.bands, rows=snapshot.rows, version=snapshot.version)
+        user_ids = np.frombuffer(bytes(snapshot.user_ids), dtype=np.int64)
+        signatures = np.frombuffer(bytes(snapshot.signatures), dtype=np.uint32).reshape(
+            len(user_ids), snapshot.bands * snapshot.rows
+        )
+        index.insert_many(user_ids, signatures)
+        self._index = index
+        self._awaited_version = None
+        logger.info(
+            f"User LSH snapshot {snapshot_id} loaded for user sets version {snapshot.version}: {len(index)} users"
+        )
+
+    def _catch_up(self, version):
+        index = self._index
+        if version - index.version > MAX_LOGGED_CHANGES:
+            changes = None
+        else:
+            changes = dict(
+                UserSetChange.objects.filter(version__gt=index.version, version__lte=version).values_list(
+                    "version", "user_id"
+                )
+            )
+            # The latest changes are not committed yet, the next lookup tries again.
+            if len(changes) < version - index.version:
+                return
+
+        if changes is None or None in changes.values():
+            self._awaited_version = version
+            queue_user_lsh_build()
+            logger.info(f"User LSH index waits for a snapshot of user sets version {version}")
+            return
+
+        index.update_users(changes.values())
+        index.version = version
+        logger.info(f"User LSH index updated to user sets version {version}: {len(set(changes.values()))} users")
+
+    def similar_users(self, user_id, limit=None):
+        """Return the approximate most similar users of a user, see MinHashLSH.similar_users.
+
+        Returns:
+            tuple: Empty arrays until the first snapshot is built.
+        """
+        index = self.get_index()
+        if index is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        return index.similar_users(user_id, limit=limit)
+
+    def clear(self):
+        """Drop the index, forcing a snapshot load on the next lookup."""
+        with self._lock:
+            self._index = None
+            self._snapshot_id = None
+            self._awaited_version = None
+
+
+user_lsh_registry = UserLSHRegistry()
+
+
+def get_approximate_similar_users(user_id, limit=None):
+    """Return the approximate most similar users of a user with their emails.
+
+    Args:
+        user_id (int): The user to find neighbors for.
+        limit (int, optional): Maximum number of users to return, all candidates by default.
+
+    Returns:
+        list: ``{"id", "email", "similarity"}`` dictionaries by descending estimated Jaccard
+        similarity of the preferences and liked restaurants.
+    """
+    user_ids, similarities = user_lsh_registry.similar_users(user_id, limit=limit)
+    emails = dict(get_user_model().objects.filter(id__in=user_ids.tolist()).values_list("id", "email"))
+    return [
+        {"id": similar_user_id, "email": emails[similar_user_id], "similarity": similarity}
+        for similar_user_id, similarity in zip(user_ids.tolist(), similarities.tolist(), strict=True)
+        # A user deleted since the index was updated.
+        if similar_user_id in emails
+    ]
+
+
+def benchmark_recall(pairs, configurations, sample_size=200, top_k=10, seed=0):
+    """Measure the recall and latency of LSH configurations against the exact Jaccard scan.
+
+    The exact scan packs the same token sets into bitsets and compares a user with everybody
+    with popcount, like the exact similarity engine. The recall of a query is the share of the
+    returned users whose exact similarity reaches the k-th best exact similarity, so ties at
+    the boundary do not count as misses.
+
+    Args:
+        pairs (numpy.ndarray): int64 (pairs, 2) array of (user id, token), sorted by user id.
+        configurations (iterable): (bands, rows) pairs to measure.
+        sample_size (int, optional): Number of users queried.
+        top_k (int, optional): Number of neighbors requested per query.
+        seed (int, optional): Seed of the user sample.
+
+    Returns:
+        list: One dictionary per configuration with ``bands``, ``rows``, ``recall``, mean
+        ``candidates`` per query, ``build_seconds`` and the mean ``lsh_ms`` and ``exact_ms`` per query.
+    """
+    user_ids = np.unique(pairs[:, 0])
+    sample = np.random.default_rng(seed).choice(len(user_ids), size=min(sample_size, len(user_ids)), replace=False)
+    start_time = time.perf_counter()
+    exact = _exact_similarities(pairs, sample)
+    exact_seconds = time.perf_counter() - start_time
+
+    results = []
+    for bands, band_rows in configurations:
+        start_time = time.perf_counter()
+        index = MinHashLSH(bands=bands, rows=band_rows)
+        index.insert_many(*index.signatures(pairs))
+        build_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        answers = [index.similar_users(int(user_ids[row])) for row in sample.tolist()]
+        lsh_seconds = time.perf_counter() - start_time
+
+        results.append({
+            "bands": bands,
+            "rows": band_rows,
+            "recall": _recall(user_ids, exact, answers, top_k),
+            "candidates": sum(len(answer_ids) for answer_ids, _ in answers) / len(sample),
+            "build_seconds": build_seconds,
+            "lsh_ms": lsh_seconds / len(sample) * 1000,
+            "exact_ms": exact_seconds / len(sample) * 1000,
+        })
+    return results
+
+
+def _exact_similarities(pairs, sample):
+    """Return the exact Jaccard similarities of the sampled users with everybody, 0 with themselves."""
+    user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    _, columns = np.unique(pairs[:, 1], return_inverse=True)
+    bits = pack_bits(rows, columns, len(user_ids), columns.max(initial=-1) + 1)
+    counts = np.bincount(rows, minlength=len(user_ids))
+
+    exact = []
+    for row in sample.tolist():
+        similarities = similarity_from_counts(intersection_counts(bits, bits[row]), counts[row], counts, JACCARD)
+        similarities[row] = 0
+        exact.append(similarities)
+    return exact
+
+
+def _recall(user_ids, exact, answers, top_k):
+    """Return the share of the top_k answers reaching the k-th best exact similarity of their query."""
+    hits = expected = 0
+    for similarities, (answer_ids, _) in zip(exact, answers, strict=True):
+        positive = np.count_nonzero(similarities)
+        if not positive:
+            continue
+        threshold = -np.partition(-similarities, min(top_k, positive) - 1)[min(top_k, positive) - 1]
+        returned = np.searchsorted(user_ids, answer_ids[:top_k])
+        hits += np.count_nonzero(similarities[returned] >= threshold)
+        expected += min(top_k, positive)
+    return hits / expected if expected else 1.0
@@ -0,0 +1,55 @@
+"""Benchmark the recall and latency of MinHash/LSH configurations against the exact similarity scan.
+
+Runs on the preferences and liked restaurants of the users in the database, e.g. after
+generate_users_with_preferences and like_restaurants_based_on_preferences, and prints one line
+per configuration. Pick SIMILAR_USERS_LSH_BANDS and SIMILAR_USERS_LSH_ROWS from the results.
+
+Example:
+    python manage.py benchmark_user_lsh --configurations 8x8 16x4 32x2 --top-k 10
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from user_management.lsh import benchmark_recall, load_user_token_pairs
+
+
+class Command(BaseCommand):
+    """A Django management command to benchmark the approximate similar users index."""
+
+    help = "Benchmark the recall and latency of MinHash/LSH configurations against the exact scan"
+
+    def add_arguments(self, parser):
+        """Add the command arguments."""
+        parser.add_argument(
+            "--configurations", nargs="+", default=["8x8", "16x4", "32x2", "64x2"],
+            help="Configurations to measure, as BANDSxROWS",
+        )
+        parser.add_argument("--sample", type=int, default=200, help="Number of users queried")
+        parser.add_argument("--top-k", type=int, default=10, help="Number of neighbors requested per query")
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Handle the command execution."""
+        try:
+            configurations = [
+                tuple(int(value) for value in configuration.lower().split("x", 1))
+                for configuration in options["configurations"]
+            ]
+        except ValueError as e:
+            msg = "Configurations must look like 16x4"
+            raise CommandError(msg) from e
+
+        pairs = load_user_token_pairs()
+        if not len(pairs):
+            msg = "No user has preferences or liked restaurants"
+            raise CommandError(msg)
+
+        results = benchmark_recall(pairs, configurations, sample_size=options["sample"], top_k=options["top_k"])
+        for result in results:
+            self.stdout.write(
+                f"{result['bands']:>3} bands x {result['rows']} rows: "
+                f"recall@{options['top_k']} {result['recall']:.3f}, "
+                f"{result['candidates']:.0f} candidates, "
+                f"{result['lsh_ms']:.3f} ms per query (exact scan {result['exact_ms']:.3f} ms), "
+                f"built in {result['build_seconds']:.2f} s"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Benchmarked {len(results)} configurations"))
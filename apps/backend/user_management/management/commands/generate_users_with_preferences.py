@@ -3,7 +3,10 @@ from django.core.management.base import BaseCommand
 from django.db.utils import IntegrityError
 from faker import Faker
 
+from restaurant_recommender.data_versions import USER_PREFERENCES, bump_data_version
+from user_management.lsh import publish_user_lsh, record_user_change
 from user_management.models import Preference, Profile, User, UserPreference  # type: ignore
+from user_management.neighbors import build_neighbor_table
 
 
 class Command(BaseCommand):
@@ -72,5 +75,10 @@ class Command(BaseCommand):
 
             created_users += 1
 
+        # bulk_create skips the signals, so the preference bitsets and similar users are refreshed here.
+        bump_data_version(USER_PREFERENCES)
+        record_user_change()
+        publish_user_lsh()
+        build_neighbor_table()
         self.stdout.write(self.style.SUCCESS(
             f"Successfully created {created_users} users with random preferences"))
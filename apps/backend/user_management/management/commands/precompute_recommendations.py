@@ -0,0 +1,28 @@
+"""Precompute and store the recommendation rankings of the active users on a local process pool.
+
+Example:
+    python manage.py precompute_recommendations --processes 4 --mode neighbors --mode hybrid
+"""
+
+from django.core.management.base import BaseCommand
+
+from user_management.recommendations import RECOMMENDATION_MODES, precompute_recommendations
+
+
+class Command(BaseCommand):
+    """A Django management command to precompute the recommendations of the active users."""
+
+    help = "Precompute the recommendation rankings of the active users and report the throughput"
+
+    def add_arguments(self, parser):
+        """Add the command arguments, every one defaults to its RECOMMENDATION_BATCH_* setting."""
+        parser.add_argument("--mode", action="append", choices=RECOMMENDATION_MODES, help="Mode to rank, repeatable")
+        parser.add_argument("--shard-size", type=int, help="Number of users per shard")
+        parser.add_argument("--processes", type=int, help="Number of worker processes, the number of CPUs by default")
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Handle the command execution."""
+        report = precompute_recommendations(
+            modes=options["mode"], shard_size=options["shard_size"], processes=options["processes"]
+        )
+        self.stdout.write(self.style.SUCCESS(str(report)))
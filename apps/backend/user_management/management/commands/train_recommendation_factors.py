@@ -0,0 +1,35 @@
+"""Train the implicit ALS factors of the restaurant recommendations on the liked restaurants.
+
+Example:
+    python manage.py train_recommendation_factors --factors 64 --iterations 20
+"""
+
+from django.core.management.base import BaseCommand
+
+from user_management.factors import train_factor_model
+
+
+class Command(BaseCommand):
+    """A Django management command to train the recommendation factors."""
+
+    help = "Train the implicit ALS factors of the restaurant recommendations"
+
+    def add_arguments(self, parser):
+        """Add the command arguments, every one defaults to its RECOMMENDATION_ALS_* setting."""
+        parser.add_argument("--factors", type=int, help="Number of latent factors")
+        parser.add_argument("--alpha", type=float, help="Confidence weight of a like")
+        parser.add_argument("--regularization", type=float, help="L2 regularization of the factors")
+        parser.add_argument("--iterations", type=int, help="Number of alternating least squares iterations")
+        parser.add_argument("--threads", type=int, help="Number of training threads")
+
+    def handle(self, *args, **options):  # noqa: ARG002
+        """Handle the command execution."""
+        model = train_factor_model(
+            factors=options["factors"],
+            alpha=options["alpha"],
+            regularization=options["regularization"],
+            iterations=options["iterations"],
+            threads=options["threads"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully trained recommendation factors {model.id} with {model.factors} factors"))
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0023_remove_bookmark_positive_aspects_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('rank', models.PositiveIntegerField()),
+                ('similar_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_users', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Similar Users',
+                'indexes': [models.Index(fields=['user', 'rank'], name='user_manage_user_id_5c96fa_idx'), models.Index(fields=['similar_user'], name='user_manage_similar_51ccff_idx')],
+                'unique_together': {('user', 'similar_user')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0024_similaruser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationFactors',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('factors', models.PositiveIntegerField()),
+                ('alpha', models.FloatField()),
+                ('regularization', models.FloatField()),
+                ('iterations', models.PositiveIntegerField()),
+                ('user_ids', models.BinaryField()),
+                ('restaurant_ids', models.BinaryField()),
+                ('user_factors', models.BinaryField()),
+                ('restaurant_factors', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Recommendation Factors',
+                'indexes': [models.Index(fields=['created_at'], name='user_manage_created_b1f99f_idx')],
+            },
+        ),
+    ]
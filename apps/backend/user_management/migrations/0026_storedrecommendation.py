@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0025_recommendationfactors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(max_length=20)),
+                ('restaurant_ids', models.BinaryField()),
+                ('scores', models.BinaryField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stored_recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Stored Recommendations',
+                'unique_together': {('user', 'mode')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0026_storedrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserLSHSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('bands', models.PositiveIntegerField()),
+                ('rows', models.PositiveIntegerField()),
+                ('user_ids', models.BinaryField()),
+                ('signatures', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'User LSH Snapshots',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserSetChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(unique=True)),
+                ('user_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'User Set Changes',
+            },
+        ),
+    ]
@@ -324,6 +324,172 @@ class UserLikedRestaurant(models.Model):
         return f"{self.user.email} likes {self.restaurant.restaurant_name}"
 
 
+class SimilarUser(models.Model):
+    """SimilarUser model for storing the top similar users of every user.
+
+    The table is built by the build_similar_users task and refreshed incrementally when user
+    preferences change, see user_management.neighbors.
+
+    Attributes:
+        user: ForeignKey relationship with the User model, the user the neighbor belongs to.
+        similar_user: ForeignKey relationship with the User model, the neighbor.
+        similarity: Cosine similarity between the preferences of both users.
+        rank: Position of the neighbor, 1 for the most similar user.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="similar_users")
+    similar_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    similarity = models.FloatField()
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        """Meta class for the SimilarUser model."""
+
+        unique_together = ("user", "similar_user")
+        verbose_name_plural = "Similar Users"
+        indexes = [
+            models.Index(fields=["user", "rank"]),
+            models.Index(fields=["similar_user"]),
+        ]
+
+    def __str__(self):
+        """String representation of the SimilarUser model."""
+        return f"{self.user_id} - {self.similar_user_id} ({self.similarity:.3f})"
+
+
+class UserSetChange(models.Model):
+    """UserSetChange model for logging which user every user sets data version changed.
+
+    Processes catch their approximate similar users index up with the log, see user_management.lsh.
+    Entries are deleted once a UserLSHSnapshot covers them.
+
+    Attributes:
+        version: The user sets data version of the change.
+        user_id: Id of the user whose preferences or liked restaurants changed, None if every
+            user may be affected. Not a foreign key, deleted users have to be removed from the index.
+        created_at: The date and time of the change.
+    """
+
+    version = models.PositiveIntegerField(unique=True)
+    user_id = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Meta class for the UserSetChange model."""
+
+        verbose_name_plural = "User Set Changes"
+
+    def __str__(self):
+        """String representation of the UserSetChange model."""
+        return f"{self.version} - {self.user_id or 'every user'}"
+
+
+class UserLSHSnapshot(models.Model):
+    """UserLSHSnapshot model for storing the MinHash signatures of every user at a user sets version.
+
+    The snapshot is built by the build_user_lsh_index task, web processes load it instead of
+    building the index themselves, see user_management.lsh.
+
+    Attributes:
+        version: The user sets data version the signatures were computed from.
+        bands: Number of bands of every signature.
+        rows: Number of minimum hashes per band.
+        user_ids: int64 id of the user of every signature.
+        signatures: uint32 user by (bands * rows) matrix.
+        created_at: The date and time when the snapshot was built.
+    """
+
+    version = models.PositiveIntegerField()
+    bands = models.PositiveIntegerField()
+    rows = models.PositiveIntegerField()
+    user_ids = models.BinaryField()
+    signatures = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Meta class for the UserLSHSnapshot model."""
+
+        verbose_name_plural = "User LSH Snapshots"
+
+    def __str__(self):
+        """String representation of the UserLSHSnapshot model."""
+        return f"User sets version {self.version} built at {self.created_at}"
+
+
+class RecommendationFactors(models.Model):
+    """RecommendationFactors model for storing a trained implicit-ALS recommendation model.
+
+    The factor matrices are float32 arrays in C order, see user_management.factors.
+
+    Attributes:
+        factors: Number of latent factors.
+        alpha: Confidence weight of a like.
+        regularization: L2 regularization of the factors.
+        iterations: Number of alternating least squares iterations.
+        user_ids: int64 id of the user of every row of user_factors.
+        restaurant_ids: int64 id of the restaurant of every row of restaurant_factors.
+        user_factors: float32 user by factor matrix.
+        restaurant_factors: float32 restaurant by factor matrix.
+        created_at: The date and time when the model was trained.
+    """
+
+    factors = models.PositiveIntegerField()
+    alpha = models.FloatField()
+    regularization = models.FloatField()
+    iterations = models.PositiveIntegerField()
+    user_ids = models.BinaryField()
+    restaurant_ids = models.BinaryField()
+    user_factors = models.BinaryField()
+    restaurant_factors = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Meta class for the RecommendationFactors model."""
+
+        verbose_name_plural = "Recommendation Factors"
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+
+    def __str__(self):
+        """String representation of the RecommendationFactors model."""
+        return f"{self.factors} factors trained at {self.created_at}"
+
+
+class StoredRecommendation(models.Model):
+    """StoredRecommendation model for storing a precomputed recommendation ranking of a user.
+
+    The rankings are computed by the precompute_recommendations task and deleted when the inputs
+    of the user change, see user_management.recommendations.
+
+    Attributes:
+        user: ForeignKey relationship with the User model.
+        mode: Scoring mode of the ranking, e.g. "neighbors".
+        restaurant_ids: int64 ids of the ranked restaurants, by descending score.
+        scores: float64 score of every ranked restaurant.
+        computed_at: The date and time when the ranking was computed.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="stored_recommendations")
+    mode = models.CharField(max_length=20)
+    restaurant_ids = models.BinaryField()
+    scores = models.BinaryField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        """Meta class for the StoredRecommendation model."""
+
+        unique_together = ("user", "mode")
+        verbose_name_plural = "Stored Recommendations"
+
+    def __str__(self):
+        """String representation of the StoredRecommendation model."""
+        return f"{self.user_id} - {self.mode} computed at {self.computed_at}"
+
+
 class TimeStamp(models.Model):
     """TimeStamp model for user account audit and trial, growth tracking, and behavioral analysis.
 
@@ -0,0 +1,165 @@
+"""Materialized table of the most similar users of every user.
+
+Recommendations only need the top neighbors of a user, so instead of comparing the user with
+everybody on every request, the SimilarUser table stores the SIMILAR_USERS_TOP_K most similar
+users of every user with their similarity. The build_similar_users task rebuilds the whole table
+from the preference bitsets, and a change to the preferences of one user only refreshes the rows
+it can affect, see refresh_neighbors.
+
+Reading the neighbors of a user is a single indexed query, whatever the number of users.
+
+Typical usage example:
+
+    build_neighbor_table()
+    refresh_neighbors(user.id)
+    similar_users = get_neighbors(request.user.id)
+"""
+
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Min
+
+from user_management.models import SimilarUser, StoredRecommendation  # type: ignore
+from user_management.similarity import (
+    get_similar_users,
+    intersection_counts,
+    similarity_engine,
+    similarity_from_counts,
+)
+from user_management.utils import top_scores
+
+logger = logging.getLogger(__name__)
+
+
+def _neighbor_rows(user_id, similar_user_ids, similarities, existing_user_ids):
+    """Return the SimilarUser rows of a user, skipping users deleted since the bitsets were built."""
+    rows = []
+    for similar_user_id, similarity in zip(similar_user_ids.tolist(), similarities.tolist(), strict=True):
+        if similar_user_id in existing_user_ids:
+            rows.append(SimilarUser(
+                user_id=user_id, similar_user_id=similar_user_id, similarity=similarity, rank=len(rows) + 1))
+    return rows
+
+
+def build_neighbor_table(top_k=None, chunk_size=64):
+    """Rebuild the whole SimilarUser table from the preference bitsets.
+
+    The similarities are computed for chunk_size users at a time against everybody, so memory
+    grows with chunk_size times the number of users and not with the number of users squared.
+
+    Args:
+        top_k (int, optional): Neighbors kept per user, SIMILAR_USERS_TOP_K by default.
+        chunk_size (int, optional): Number of users compared with everybody at once.
+
+    Returns:
+        int: The number of rows written.
+    """
+    top_k = top_k or settings.SIMILAR_USERS_TOP_K
+    preferences = similarity_engine.get_preferences()
+    user_ids = preferences.user_ids
+    existing_user_ids = set(get_user_model().objects.filter(
+        id__in=user_ids.tolist()).values_list("id", flat=True))
+
+    rows = []
+    for start in range(0, len(user_ids), chunk_size):
+        stop = min(start + chunk_size, len(user_ids))
+        intersections = intersection_counts(preferences.bits, preferences.bits[start:stop])
+        block = similarity_from_counts(intersections, preferences.counts[start:stop, None], preferences.counts)
+        for offset, similarities in enumerate(block):
+            row = start + offset
+            if user_ids[row] not in existing_user_ids:
+                continue
+            similarities[row] = 0
+            # top_scores breaks ties by column, i.e. by ascending user id like similar_users.
+            top = top_scores(similarities, top_k)
+            rows.extend(_neighbor_rows(user_ids[row], user_ids[top], similarities[top], existing_user_ids))
+
+    with transaction.atomic():
+        SimilarUser.objects.all().delete()
+        SimilarUser.objects.bulk_create(rows, batch_size=5000)
+
+    logger.info(f"Similar users table built: {len(rows)} neighbors of {len(existing_user_ids)} users")
+    return len(rows)
+
+
+def refresh_neighbors(user_id, top_k=None):
+    """Refresh the SimilarUser rows a change to the preferences of a user can affect.
+
+    Those are the neighbors of the user, the rows that reference the user, and the rows of the
+    users the user can now enter: users similar to it whose row is not full yet or whose least
+    similar neighbor is less similar than the user. Their stored rankings are deleted as well.
+
+    Args:
+        user_id (int): The user whose preferences were created or deleted.
+        top_k (int, optional): Neighbors kept per user, SIMILAR_USERS_TOP_K by default.
+
+    Returns:
+        int: The number of users whose neighbors were recomputed.
+    """
+    top_k = top_k or settings.SIMILAR_USERS_TOP_K
+    affected_user_ids = {user_id}
+    affected_user_ids.update(SimilarUser.objects.filter(similar_user_id=user_id).values_list("user_id", flat=True))
+
+    candidate_ids, candidate_similarities = similarity_engine.similar_users(user_id)
+    if len(candidate_ids):
+        row_stats = {
+            candidate_id: (count, lowest)
+            for candidate_id, count, lowest in SimilarUser.objects.filter(user_id__in=candidate_ids.tolist())
+            .values("user_id")
+            .annotate(count=Count("id"), lowest=Min("similarity"))
+            .values_list("user_id", "count", "lowest")
+        }
+        for candidate_id, similarity in zip(candidate_ids.tolist(), candidate_similarities.tolist(), strict=True):
+            count, lowest = row_stats.get(candidate_id, (0, 0.0))
+            if count < top_k or similarity > lowest:
+                affected_user_ids.add(candidate_id)
+
+    neighbors = {
+        affected_user_id: similarity_engine.similar_users(affected_user_id, limit=top_k)
+        for affected_user_id in affected_user_ids
+    }
+    referenced_user_ids = set(affected_user_ids)
+    for similar_user_ids, _ in neighbors.values():
+        referenced_user_ids.update(similar_user_ids.tolist())
+    existing_user_ids = set(get_user_model().objects.filter(
+        id__in=referenced_user_ids).values_list("id", flat=True))
+
+    rows = []
+    for affected_user_id, (similar_user_ids, similarities) in neighbors.items():
+        if affected_user_id in existing_user_ids:
+            rows.extend(_neighbor_rows(affected_user_id, similar_user_ids, similarities, existing_user_ids))
+
+    with transaction.atomic():
+        SimilarUser.objects.filter(user_id__in=affected_user_ids).delete()
+        SimilarUser.objects.bulk_create(rows, batch_size=5000)
+        # The precomputed rankings of those users were scored with their previous neighbors.
+        StoredRecommendation.objects.filter(user_id__in=affected_user_ids).delete()
+
+    logger.info(f"Similar users of user {user_id} refreshed: {len(affected_user_ids)} users recomputed")
+    return len(affected_user_ids)
+
+
+def get_neighbors(user_id):
+    """Return the most similar users of a user from the SimilarUser table.
+
+    Users without rows, e.g. created since the last build and before their refresh ran, are
+    compared with everybody through the preference bitsets instead.
+
+    Args:
+        user_id (int): The user to find neighbors for.
+
+    Returns:
+        list: ``{"id", "email", "similarity"}`` dictionaries by descending similarity.
+    """
+    similar_users = [
+        {"id": similar_user_id, "email": email, "similarity": similarity}
+        for similar_user_id, email, similarity in SimilarUser.objects.filter(user_id=user_id)
+        .order_by("rank")
+        .values_list("similar_user_id", "similar_user__email", "similarity")
+    ]
+    if similar_users:
+        return similar_users
+    return get_similar_users(user_id, limit=settings.SIMILAR_USERS_TOP_K)
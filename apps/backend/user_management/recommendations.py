@@ -0,0 +1,437 @@
+"""Restaurant rankings of the users, computed on the request path or precomputed in batches.
+
+rank_restaurants ranks the restaurants of one user when recommend_restaurants has no ranking for
+them. The precompute_recommendations task ranks every recently active user ahead of time: the
+users are split into shards, every shard reads the similar users and the likes of all its users
+and the restaurants with three queries, scores them with sparse matrix products against the
+content vectors and factors held in memory by its process, and stores their rankings in the
+StoredRecommendation table. Stored rankings survive the hourly cache wipe, so the first request
+of a user after it reads one row instead of ranking every restaurant.
+
+A change to the preferences or likes of a user deletes the stored rankings it can affect, those
+of the user and of the users it is a similar user of, so only those users are ranked on the
+request path again until the next batch.
+
+Typical usage example:
+
+    report = precompute_recommendations(processes=4)
+    ranking = get_stored_ranking(request.user.id, RECOMMENDATION_MODE_NEIGHBORS)
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from typing import NamedTuple
+
+import django
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from scipy import sparse  # type: ignore
+
+from restaurant_recommender.content_features import content_registry
+from restaurant_recommender.models import Restaurant  # type: ignore
+from user_management.factors import factor_registry, solve_factors
+from user_management.models import SimilarUser, StoredRecommendation, UserLikedRestaurant  # type: ignore
+from user_management.neighbors import get_neighbors
+from user_management.utils import score_restaurants, score_restaurants_hybrid, top_scores
+
+logger = logging.getLogger(__name__)
+
+# Number of top scored restaurants kept in the ranking of a user.
+MAX_RECOMMENDATION_CANDIDATES = 1000
+# Scoring modes of recommend_restaurants.
+RECOMMENDATION_MODE_NEIGHBORS = "neighbors"
+RECOMMENDATION_MODE_FACTORS = "factors"
+RECOMMENDATION_MODE_HYBRID = "hybrid"
+RECOMMENDATION_MODES = (RECOMMENDATION_MODE_NEIGHBORS, RECOMMENDATION_MODE_FACTORS, RECOMMENDATION_MODE_HYBRID)
+# Number of users of a shard scored in one dense block of users by restaurants.
+SCORE_BATCH_SIZE = 256
+
+
+def rank_restaurants(user_id, mode):
+    """
+    Rank the restaurants for a user.
+
+    Args:
+        user_id: The user to recommend restaurants to.
+        mode: One of RECOMMENDATION_MODES.
+
+    Returns:
+        tuple: The int64 IDs of the top MAX_RECOMMENDATION_CANDIDATES restaurants and their scores,
+        by descending score.
+    """
+    if mode == RECOMMENDATION_MODE_FACTORS:
+        # Score every restaurant with one product of the restaurant factors and the user's factors.
+        scored = factor_registry.score_restaurants(user_id)
+        if scored is not None:
+            restaurant_ids, restaurant_scores = scored
+            top_restaurant_indices = top_scores(restaurant_scores, MAX_RECOMMENDATION_CANDIDATES)
+            return restaurant_ids[top_restaurant_indices], restaurant_scores[top_restaurant_indices]
+        # No factors yet, or the user likes no restaurant: use the similar users instead.
+
+    # Read the top similar users from the similar users table, sorted by similarity in descending order.
+    similar_users = get_neighbors(user_id)
+
+    if mode == RECOMMENDATION_MODE_HYBRID:
+        # Blend the likes of the similar users with the content similarity to the user's own likes.
+        restaurant_ids, restaurant_scores = score_restaurants_hybrid(
+            user_id, similar_users, settings.RECOMMENDATION_HYBRID_CONTENT_WEIGHT
+        )
+        top_restaurant_indices = top_scores(restaurant_scores, MAX_RECOMMENDATION_CANDIDATES)
+        return restaurant_ids[top_restaurant_indices], restaurant_scores[top_restaurant_indices]
+
+    # Get all restaurants.
+    all_restaurants = list(Restaurant.objects.values_list("id", flat=True))
+
+    # Calculate the restaurant scores from the likes of the similar users, weighted by similarity.
+    restaurant_scores = score_restaurants(similar_users, all_restaurants)
+
+    # Keep the top restaurants only, as ID and score arrays.
+    top_restaurant_indices = top_scores(restaurant_scores, MAX_RECOMMENDATION_CANDIDATES)
+    return (
+        np.array(all_restaurants, dtype=np.int64)[top_restaurant_indices],
+        restaurant_scores[top_restaurant_indices],
+    )
+
+
+def get_stored_ranking(user_id, mode):
+    """Return the precomputed ranking of a user with one query.
+
+    Returns:
+        tuple: The int64 restaurant IDs and float64 scores, as rank_restaurants returns them, or
+        None if the user was not ranked by the last batch or their inputs changed since.
+    """
+    row = (
+        StoredRecommendation.objects.filter(user_id=user_id, mode=mode).values_list("restaurant_ids", "scores").first()
+    )
+    if row is None:
+        return None
+    return np.frombuffer(bytes(row[0]), dtype=np.int64), np.frombuffer(bytes(row[1]), dtype=np.float64)
+
+
+def invalidate_stored_rankings(user_id):
+    """Delete the stored rankings a change to the preferences or likes of a user can affect."""
+    StoredRecommendation.objects.filter(
+        Q(user_id=user_id)
+        | Q(user_id__in=SimilarUser.objects.filter(similar_user_id=user_id).values("user_id"))
+    ).delete()
+
+
+def get_active_user_ids(days=None):
+    """Return the ids of the active users who logged in or liked a restaurant in the last days.
+
+    Args:
+        days (int, optional): Length of the activity window, RECOMMENDATION_BATCH_ACTIVE_DAYS by default.
+
+    Returns:
+        list: The user ids, ascending.
+    """
+    since = timezone.now() - timedelta(days=days or settings.RECOMMENDATION_BATCH_ACTIVE_DAYS)
+    return list(
+        get_user_model().objects.filter(is_active=True)
+        .filter(Q(last_login__gte=since) | Q(userlikedrestaurant__liked_date__gte=since))
+        .distinct()
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+class ShardInputs(NamedTuple):
+    """The similar users and likes of the users of a shard.
+
+    Attributes:
+        user_ids: Sorted int64 ids of the users of the shard.
+        like_user_ids: Sorted int64 ids of the shard users and of their similar users.
+        similarities: CSR shard user by like user matrix of the similarity of the similar users.
+        like_pairs: int64 (user id, restaurant id) of every like of like_user_ids.
+        restaurant_ids: Sorted int64 ids of all restaurants.
+    """
+
+    user_ids: np.ndarray
+    like_user_ids: np.ndarray
+    similarities: sparse.csr_matrix
+    like_pairs: np.ndarray
+    restaurant_ids: np.ndarray
+
+
+def load_shard(user_ids):
+    """Read the similar users and the likes of the users of a shard and of their similar users.
+
+    Args:
+        user_ids (list): The users of the shard.
+
+    Returns:
+        ShardInputs: The inputs of the shard.
+    """
+    user_ids = np.unique(np.asarray(user_ids, dtype=np.int64))
+    neighbors = SimilarUser.objects.filter(user_id__in=user_ids.tolist())
+    rows = list(neighbors.values_list("user_id", "similar_user_id", "similarity"))
+    owner_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    similar_user_ids = np.array([row[1] for row in rows], dtype=np.int64)
+    like_user_ids = np.union1d(user_ids, similar_user_ids)
+
+    similarities = sparse.csr_matrix(
+        (
+            np.array([row[2] for row in rows], dtype=np.float64),
+            (np.searchsorted(user_ids, owner_ids), np.searchsorted(like_user_ids, similar_user_ids)),
+        ),
+        shape=(len(user_ids), len(like_user_ids)),
+    )
+    like_pairs = np.array(
+        UserLikedRestaurant.objects.filter(
+            Q(user_id__in=user_ids.tolist()) | Q(user_id__in=neighbors.values("similar_user_id"))
+        ).values_list("user_id", "restaurant_id"),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    return ShardInputs(
+        user_ids=user_ids,
+        like_user_ids=like_user_ids,
+        similarities=similarities,
+        like_pairs=like_pairs,
+        restaurant_ids=np.array(Restaurant.objects.order_by("id").values_list("id", flat=True), dtype=np.int64),
+    )
+
+
+def _like_matrix(inputs, restaurant_ids, dtype=np.float64):
+    """Return the like user by restaurant like matrix of a shard, skipping unknown restaurants."""
+    columns = np.searchsorted(restaurant_ids, inputs.like_pairs[:, 1])
+    known = columns < len(restaurant_ids)
+    known[known] = restaurant_ids[columns[known]] == inputs.like_pairs[known, 1]
+    return sparse.csr_matrix(
+        (
+            np.ones(np.count_nonzero(known), dtype=dtype),
+            (np.searchsorted(inputs.like_user_ids, inputs.like_pairs[known, 0]), columns[known]),
+        ),
+        shape=(len(inputs.like_user_ids), len(restaurant_ids)),
+    )
+
+
+def _top_rankings(user_ids, restaurant_ids, scores):
+    """Return the ranking of every user of a block of user by restaurant scores."""
+    rankings = {}
+    for user_id, user_scores in zip(user_ids.tolist(), scores, strict=True):
+        top_restaurant_indices = top_scores(user_scores, MAX_RECOMMENDATION_CANDIDATES)
+        rankings[user_id] = restaurant_ids[top_restaurant_indices], user_scores[top_restaurant_indices]
+    return rankings
+
+
+def _rank_neighbors(inputs, rows):
+    """Rank the restaurants of the shard users at rows with the likes of their similar users."""
+    likes = _like_matrix(inputs, inputs.restaurant_ids)
+    rankings = {}
+    for start in range(0, len(rows), SCORE_BATCH_SIZE):
+        block = rows[start : start + SCORE_BATCH_SIZE]
+        scores = (inputs.similarities[block] @ likes).toarray()
+        rankings.update(_top_rankings(inputs.user_ids[block], inputs.restaurant_ids, scores))
+    return rankings
+
+
+def _rank_hybrid(inputs, rows):
+    """Rank the restaurants of the shard users at rows as score_restaurants_hybrid does."""
+    index = content_registry.get_index()
+    content_weight = settings.RECOMMENDATION_HYBRID_CONTENT_WEIGHT
+    likes = _like_matrix(inputs, index.restaurant_ids)
+    rankings = {}
+    for start in range(0, len(rows), SCORE_BATCH_SIZE):
+        block = rows[start : start + SCORE_BATCH_SIZE]
+        collaborative = (inputs.similarities[block] @ likes).toarray()
+        peaks = collaborative.max(axis=1, keepdims=True, initial=0)
+        peaks[peaks == 0] = 1
+        collaborative /= peaks
+
+        user_likes = likes[np.searchsorted(inputs.like_user_ids, inputs.user_ids[block])]
+        profiles = np.asarray((user_likes @ index.features).todense(), dtype=np.float64)
+        norms = np.linalg.norm(profiles, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        content = np.asarray(index.features @ (profiles / norms).T).T
+
+        scores = (1 - content_weight) * collaborative + content_weight * content
+        scores[user_likes.nonzero()] = 0
+        rankings.update(_top_rankings(inputs.user_ids[block], index.restaurant_ids, scores))
+    return rankings
+
+
+def _rank_factors(inputs, rows):
+    """Rank the restaurants of the shard users at rows with their trained or folded in factors.
+
+    Users without a factor vector, i.e. without likes of trained restaurants, are not ranked.
+    """
+    factors = factor_registry.get_factors()
+    if factors is None:
+        return {}
+
+    user_ids = inputs.user_ids[rows]
+    positions = np.searchsorted(factors.user_ids, user_ids)
+    trained = positions < len(factors.user_ids)
+    trained[trained] = factors.user_ids[positions[trained]] == user_ids[trained]
+    vectors = np.zeros((len(rows), factors.user_factors.shape[1]), dtype=np.float32)
+    vectors[trained] = factors.user_factors[positions[trained]]
+
+    # Users who liked their first restaurants since the training are folded in all at once.
+    likes = _like_matrix(inputs, factors.restaurant_ids, dtype=np.float32)
+    untrained_likes = likes[np.searchsorted(inputs.like_user_ids, user_ids[~trained])]
+    vectors[~trained] = solve_factors(
+        untrained_likes, factors.restaurant_factors, factors.restaurant_gram, factors.alpha, factors.regularization
+    )
+    has_vector = trained.copy()
+    has_vector[~trained] = np.diff(untrained_likes.indptr) > 0
+
+    rankings = {}
+    scored = np.flatnonzero(has_vector)
+    for start in range(0, len(scored), SCORE_BATCH_SIZE):
+        block = scored[start : start + SCORE_BATCH_SIZE]
+        scores = vectors[block] @ factors.restaurant_factors.T
+        scores[likes[np.searchsorted(inputs.like_user_ids, user_ids[block])].nonzero()] = 0
+        rankings.update(_top_rankings(user_ids[block], factors.restaurant_ids, scores))
+    return rankings
+
+
+def rank_shard(inputs, mode):
+    """Rank the restaurants of the users of a shard as rank_restaurants ranks one user.
+
+    Users without similar users rows, created since the similar users table was built, are
+    left to rank_restaurants, except in factors mode when they have a factor vector.
+
+    Args:
+        inputs (ShardInputs): The inputs of the shard.
+        mode (str): One of RECOMMENDATION_MODES.
+
+    Returns:
+        dict: The (restaurant IDs, scores) ranking of every ranked user id.
+    """
+    with_neighbors = np.flatnonzero(np.diff(inputs.similarities.indptr))
+    if mode == RECOMMENDATION_MODE_HYBRID:
+        return _rank_hybrid(inputs, with_neighbors)
+    if mode != RECOMMENDATION_MODE_FACTORS:
+        return _rank_neighbors(inputs, with_neighbors)
+
+    rankings = _rank_factors(inputs, np.arange(len(inputs.user_ids)))
+    # Users without factors use their similar users instead, as in rank_restaurants.
+    without_factors = with_neighbors[~np.isin(inputs.user_ids[with_neighbors], list(rankings))]
+    rankings.update(_rank_neighbors(inputs, without_factors))
+    return rankings
+
+
+def store_rankings(rankings, mode):
+    """Replace the stored rankings of the ranked users in a mode."""
+    rows = [
+        StoredRecommendation(
+            user_id=user_id,
+            mode=mode,
+            restaurant_ids=np.ascontiguousarray(restaurant_ids, dtype=np.int64).tobytes(),
+            scores=np.ascontiguousarray(scores, dtype=np.float64).tobytes(),
+        )
+        for user_id, (restaurant_ids, scores) in rankings.items()
+    ]
+    with transaction.atomic():
+        StoredRecommendation.objects.filter(mode=mode, user_id__in=list(rankings)).delete()
+        StoredRecommendation.objects.bulk_create(rows, batch_size=1000)
+
+
+def precompute_shard(user_ids, modes=None):
+    """Rank the users of a shard in every mode and store their rankings.
+
+    The inputs of the shard are read once and shared by every mode.
+
+    Args:
+        user_ids (list): The users of the shard.
+        modes (list, optional): The modes to rank, RECOMMENDATION_BATCH_MODES by default.
+
+    Returns:
+        tuple: The number of users of the shard and the number of rankings stored.
+    """
+    inputs = load_shard(user_ids)
+    ranking_count = 0
+    for mode in modes or settings.RECOMMENDATION_BATCH_MODES:
+        rankings = rank_shard(inputs, mode)
+        store_rankings(rankings, mode)
+        ranking_count += len(rankings)
+    return len(inputs.user_ids), ranking_count
+
+
+class BatchReport(NamedTuple):
+    """Totals of a recommendation batch.
+
+    Attributes:
+        users: Number of users of the shards.
+        rankings: Number of rankings stored.
+        seconds: Wall time of the batch.
+    """
+
+    users: int
+    rankings: int
+    seconds: float
+
+    @property
+    def users_per_second(self):
+        """Throughput of the batch."""
+        return self.users / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        """Summary of the batch, with its throughput."""
+        return (
+            f"Ranked {self.users} users ({self.rankings} rankings) in {self.seconds:.2f} s, "
+            f"{self.users_per_second:.1f} users/s"
+        )
+
+
+def report_batch(results, seconds):
+    """Log the totals and throughput of a recommendation batch.
+
+    Args:
+        results (list): The (users, rankings) counts returned by precompute_shard for every shard.
+        seconds (float): Wall time of the batch.
+
+    Returns:
+        BatchReport: The totals of the batch.
+    """
+    report = BatchReport(
+        users=sum(result[0] for result in results),
+        rankings=sum(result[1] for result in results),
+        seconds=seconds,
+    )
+    logger.info(f"Recommendation batch: {report}")
+    return report
+
+
+def split_shards(user_ids, shard_size=None):
+    """Split user ids in shards of RECOMMENDATION_BATCH_SHARD_SIZE users by default."""
+    shard_size = shard_size or settings.RECOMMENDATION_BATCH_SHARD_SIZE
+    return [list(user_ids[start : start + shard_size]) for start in range(0, len(user_ids), shard_size)]
+
+
+def precompute_recommendations(user_ids=None, modes=None, shard_size=None, processes=None):
+    """Rank users in shards on a local process pool and store their rankings.
+
+    The precompute_recommendations task runs the shards on Celery workers instead.
+
+    Args:
+        user_ids (list, optional): The users to rank, the active users by default.
+        modes (list, optional): The modes to rank, RECOMMENDATION_BATCH_MODES by default.
+        shard_size (int, optional): Users per shard, RECOMMENDATION_BATCH_SHARD_SIZE by default.
+        processes (int, optional): Size of the process pool, the number of CPUs by default.
+            Shards run in this process when it is 1 or when this process may not have children.
+
+    Returns:
+        BatchReport: The totals of the batch.
+    """
+    started = time.perf_counter()
+    shards = split_shards(get_active_user_ids() if user_ids is None else list(user_ids), shard_size)
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1 or len(shards) <= 1 or multiprocessing.current_process().daemon:
+        results = [precompute_shard(shard, modes) for shard in shards]
+    else:
+        # Workers open their own database connections, they must not share the ones of this process.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=min(processes, len(shards)), initializer=django.setup) as executor:
+            results = list(executor.map(precompute_shard, shards, [modes] * len(shards)))
+
+    return report_batch(results, time.perf_counter() - started)
@@ -13,8 +13,10 @@ import re
 
 # Django imports
 from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.models import update_last_login
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers  # type: ignore
 
@@ -29,6 +31,8 @@ from user_management.models import (  # type: ignore
     UserLikedRestaurant,
     UserPreference,
 )
+from user_management.signals import refresh_user_on_commit
+
 User = get_user_model()
 
 EIGHT = 8
@@ -88,13 +92,17 @@ class RegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """Create a new user and assign preferences."""
         preferences = validated_data.pop("preferences", [])
-        user = User.objects.create_user(**validated_data)
-        user.set_password(validated_data["password"])
-        user.save()
-
-        # Create UserPreference instances
-        for preference in preferences:
-            UserPreference.objects.create(user=user, preference=preference)
+        with transaction.atomic():
+            user = User.objects.create_user(**validated_data)
+            user.set_password(validated_data["password"])
+            user.save()
+
+            # Create UserPreference instances, bulk_create skips the signals, so the user is refreshed once.
+            UserPreference.objects.bulk_create(
+                UserPreference(user=user, preference=preference) for preference in preferences
+            )
+            if preferences:
+                refresh_user_on_commit(user.id, preferences_changed=True)
 
         return user
 
@@ -150,6 +158,8 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
                 _("Please enter email and a password"))
 
         refresh = self.get_token(user)
+        # Logins mark the users as active, for the nightly recommendations and the deactivation of inactive users.
+        update_last_login(None, user)
 
         data = {
             "refresh": str(refresh),
@@ -0,0 +1,63 @@
+"""Signal handlers that keep the in-memory user data of every process up to date.
+
+The handlers are connected in UserManagementConfig.ready. They act once the transaction is
+committed, so other processes never rebuild their data from a state that is not visible yet.
+Code that creates several rows of a user at once, like registration, bulk creates them and
+calls refresh_user_on_commit once instead.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from restaurant_recommender.data_versions import USER_PREFERENCES, bump_data_version
+from user_management.lsh import record_user_change
+from user_management.models import Preference, UserLikedRestaurant, UserPreference  # type: ignore
+from user_management.recommendations import invalidate_stored_rankings
+from user_management.tasks import refresh_similar_users
+
+
+def refresh_user_on_commit(user_id, preferences_changed):
+    """Refresh the sets, rankings and, if their preferences changed, the similar users of a user on commit.
+
+    Args:
+        user_id (int): The user whose preferences or liked restaurants changed.
+        preferences_changed (bool): Whether their preferences changed, which also bumps the user
+            preferences data version and queues refresh_similar_users.
+    """
+
+    def refresh():
+        if preferences_changed:
+            bump_data_version(USER_PREFERENCES)
+        record_user_change(user_id)
+        invalidate_stored_rankings(user_id)
+        if preferences_changed:
+            refresh_similar_users.delay(user_id)
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=UserPreference)
+@receiver(post_delete, sender=UserPreference)
+def user_preference_changed(sender, instance, **kwargs):  # noqa: ARG001
+    """Bump the user preferences data version and refresh the similar users rows, sets and rankings of the user."""
+    refresh_user_on_commit(instance.user_id, preferences_changed=True)
+
+
+@receiver(post_save, sender=Preference)
+@receiver(post_delete, sender=Preference)
+def preferences_changed(sender, **kwargs):  # noqa: ARG001
+    """Bump the user preferences data version, so every process rebuilds its preference bitsets."""
+
+    def refresh():
+        bump_data_version(USER_PREFERENCES)
+        record_user_change()
+
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=UserLikedRestaurant)
+@receiver(post_delete, sender=UserLikedRestaurant)
+def liked_restaurant_changed(sender, instance, **kwargs):  # noqa: ARG001
+    """Record the change to the liked restaurants of the user and delete the rankings it affects."""
+    refresh_user_on_commit(instance.user_id, preferences_changed=False)
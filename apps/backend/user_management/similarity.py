@@ -0,0 +1,242 @@
+"""Cosine and Jaccard similarity between the preferences of users, computed on packed bitsets.
+
+Preferences are a small fixed catalog, so the preferences of a user are stored as a bitset with
+one bit per selectable preference, packed into a few uint64 words. All selectable UserPreference
+rows are loaded with a single query into a (users, words) uint64 array. The intersection of a
+user with everybody else is then a vectorized AND and popcount over that array, 64 preferences
+per operation, and both similarities only need the intersections and the preference counts.
+Each process keeps the bitsets in memory and only rebuilds them when the user preferences data
+version changes.
+
+Typical usage example:
+
+    user_ids, similarities = similarity_engine.similar_users(request.user.id, limit=20)
+    user_ids, similarities = similarity_engine.similar_users(request.user.id, metric=JACCARD)
+    similar_users = get_similar_users(request.user.id)  # With the emails of the users.
+"""
+
+import logging
+import threading
+from typing import NamedTuple
+
+import numpy as np
+from django.contrib.auth import get_user_model
+
+from restaurant_recommender.data_versions import USER_PREFERENCES, get_data_version
+from user_management.models import UserPreference  # type: ignore
+from user_management.utils import get_all_preferences
+
+logger = logging.getLogger(__name__)
+
+COSINE = "cosine"
+JACCARD = "jaccard"
+METRICS = (COSINE, JACCARD)
+
+# Number of set bits of every byte, used when NumPy has no bitwise_count (before 2.0).
+_BYTE_POPCOUNT = np.array([value.bit_count() for value in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """Return the number of set bits of every uint64 word of an array, as uint8."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    byte_counts = _BYTE_POPCOUNT[words.view(np.uint8)].reshape(*words.shape, 8)
+    return byte_counts.sum(axis=-1, dtype=np.uint8)
+
+
+def pack_bits(rows, columns, row_count, column_count):
+    """Pack (row, column) pairs into a (row_count, words) uint64 bitset array.
+
+    Bit ``column % 64`` of word ``column // 64`` of a row is set for every pair of that row.
+    """
+    bits = np.zeros((row_count, max(1, -(-column_count // 64))), dtype=np.uint64)
+    np.bitwise_or.at(
+        bits, (rows, columns // 64), np.left_shift(np.uint64(1), (columns % 64).astype(np.uint64))
+    )
+    return bits
+
+
+def intersection_counts(bits, user_bits):
+    """Return the number of bits every row of a bitset array shares with one or more bitsets.
+
+    Args:
+        bits (numpy.ndarray): (users, words) uint64 bitsets.
+        user_bits (numpy.ndarray): (words,) bitset, or (n, words) bitsets.
+
+    Returns:
+        numpy.ndarray: int64 counts of shape (users,), or (n, users).
+    """
+    single = np.ndim(user_bits) == 1
+    user_bits = np.atleast_2d(user_bits)
+    counts = np.zeros((len(user_bits), len(bits)), dtype=np.int64)
+    # One word at a time, so the temporary AND array stays (n, users) whatever the catalog size.
+    for word in range(bits.shape[1]):
+        counts += popcount(user_bits[:, word, None] & bits[None, :, word])
+    return counts[0] if single else counts
+
+
+def similarity_from_counts(intersections, user_counts, counts, metric=COSINE):
+    """Turn intersection sizes into cosine or Jaccard similarities.
+
+    Args:
+        intersections (numpy.ndarray): Number of preferences shared by every pair.
+        user_counts: Number of preferences of the compared user(s), broadcast against counts.
+        counts (numpy.ndarray): Number of preferences of every other user.
+        metric (str): COSINE or JACCARD.
+
+    Returns:
+        numpy.ndarray: float64 similarities, 0 where a user has no preference.
+
+    Raises:
+        ValueError: If the metric is unknown.
+    """
+    if metric not in METRICS:
+        msg = f"Unknown similarity metric {metric!r}, expected one of {', '.join(METRICS)}"
+        raise ValueError(msg)
+    if metric == COSINE:
+        denominators = np.sqrt(user_counts * counts, dtype=np.float64)
+    else:
+        denominators = (user_counts + counts - intersections).astype(np.float64)
+    similarities = np.zeros(np.shape(intersections))
+    np.divide(intersections, denominators, out=similarities, where=denominators > 0)
+    return similarities
+
+
+class PreferenceMatrix(NamedTuple):
+    """The preferences of all users as packed bitsets, built from one user preferences data version.
+
+    Attributes:
+        version: User preferences data version the bitsets were built from.
+        user_ids: Sorted int64 id of the user of every row. Users without a selectable
+            preference have no row, their similarity with anybody is 0.
+        preference_ids: Sorted int64 id of the selectable preference of every bit.
+        bits: (users, words) uint64 array, the bit of every chosen preference is set.
+        counts: int64 number of chosen preferences of every user.
+    """
+
+    version: int
+    user_ids: np.ndarray
+    preference_ids: np.ndarray
+    bits: np.ndarray
+    counts: np.ndarray
+
+
+def build_preference_matrix(version):
+    """Build a PreferenceMatrix with a single query over the user preferences.
+
+    Args:
+        version (int): User preferences data version the bitsets are built from.
+
+    Returns:
+        PreferenceMatrix: The bitsets.
+    """
+    preference_ids = np.array(sorted(get_all_preferences()), dtype=np.int64)
+    pairs = np.array(
+        UserPreference.objects.filter(preference__is_selectable=True).values_list("user_id", "preference_id"),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+    user_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    columns = np.searchsorted(preference_ids, pairs[:, 1])
+    bits = pack_bits(rows, columns, len(user_ids), len(preference_ids))
+    counts = popcount(bits).sum(axis=1, dtype=np.int64)
+
+    return PreferenceMatrix(
+        version=version, user_ids=user_ids, preference_ids=preference_ids, bits=bits, counts=counts
+    )
+
+
+class SimilarityEngine:
+    """Keeps the PreferenceMatrix in memory, keyed by the user preferences data version."""
+
+    def __init__(self):
+        """Initialize the engine empty, the first lookup builds the preference bitsets."""
+        self._lock = threading.Lock()
+        self._preferences = None
+
+    def get_preferences(self):
+        """Return the preference bitsets, rebuilding it only when the user preferences changed."""
+        version = get_data_version(USER_PREFERENCES)
+        preferences = self._preferences
+        if preferences is not None and preferences.version == version:
+            return preferences
+
+        with self._lock:
+            if self._preferences is None or self._preferences.version != version:
+                self._preferences = build_preference_matrix(version)
+                logger.info(
+                    f"Preference bitsets built for user preferences version {version}: "
+                    f"{len(self._preferences.user_ids)} users, {len(self._preferences.preference_ids)} preferences, "
+                    f"{self._preferences.bits.nbytes} bytes"
+                )
+            return self._preferences
+
+    def similarities(self, user_id, metric=COSINE):
+        """Return the similarity of a user with every row of the preference bitsets.
+
+        Args:
+            user_id (int): The user to compare.
+            metric (str, optional): COSINE or JACCARD.
+
+        Returns:
+            tuple: The user ids of the rows and their float64 similarities, or empty arrays if
+            the user has no selectable preference.
+        """
+        preferences = self.get_preferences()
+        row = np.searchsorted(preferences.user_ids, user_id)
+        if row == len(preferences.user_ids) or preferences.user_ids[row] != user_id:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        intersections = intersection_counts(preferences.bits, preferences.bits[row])
+        return preferences.user_ids, similarity_from_counts(
+            intersections, preferences.counts[row], preferences.counts, metric
+        )
+
+    def similar_users(self, user_id, limit=None, metric=COSINE):
+        """Return the users whose preferences are the most similar to those of a user.
+
+        Args:
+            user_id (int): The user to find neighbors for, never part of the result.
+            limit (int, optional): Maximum number of users to return, all of them by default.
+            metric (str, optional): COSINE or JACCARD.
+
+        Returns:
+            tuple: The user ids and their similarities, by descending similarity then ascending
+            user id. Only users with a positive similarity are included.
+        """
+        user_ids, similarities = self.similarities(user_id, metric)
+        keep = (similarities > 0) & (user_ids != user_id)
+        user_ids, similarities = user_ids[keep], similarities[keep]
+
+        order = np.lexsort((user_ids, -similarities))[:limit]
+        return user_ids[order], similarities[order]
+
+    def clear(self):
+        """Drop the bitsets, forcing a rebuild on the next lookup."""
+        with self._lock:
+            self._preferences = None
+
+
+similarity_engine = SimilarityEngine()
+
+
+def get_similar_users(user_id, limit=None, metric=COSINE):
+    """Return the most similar users of a user with their emails.
+
+    Args:
+        user_id (int): The user to find neighbors for.
+        limit (int, optional): Maximum number of users to return, all of them by default.
+        metric (str, optional): COSINE or JACCARD.
+
+    Returns:
+        list: ``{"id", "email", "similarity"}`` dictionaries by descending similarity.
+    """
+    user_ids, similarities = similarity_engine.similar_users(user_id, limit=limit, metric=metric)
+    emails = dict(get_user_model().objects.filter(id__in=user_ids.tolist()).values_list("id", "email"))
+    return [
+        {"id": similar_user_id, "email": emails[similar_user_id], "similarity": similarity}
+        for similar_user_id, similarity in zip(user_ids.tolist(), similarities.tolist(), strict=True)
+        # A user deleted since the bitsets were built.
+        if similar_user_id in emails
+    ]
@@ -1,9 +1,10 @@
 """Celery tasks for user management."""
 
+import time
 from datetime import timedelta
 from pathlib import Path
 
-from celery import shared_task  # type: ignore
+from celery import chord, shared_task  # type: ignore
 from django.utils import timezone
 from PIL import Image
 
@@ -105,3 +106,94 @@ def deactivate_inactive_users(self):
     except Exception as e:
         print(f"Error deactivating inactive users: {e}")
         self.retry(exc=e, countdown=60)  # Retry after 60 seconds
+
+
+@shared_task(bind=True, max_retries=3)
+def build_similar_users(self):
+    """Rebuild the table of the most similar users of every user."""
+    try:
+        from user_management.neighbors import build_neighbor_table  # noqa: PLC0415
+
+        row_count = build_neighbor_table()
+    except Exception as e:
+        print(f"Error building similar users: {e}")
+        raise self.retry(exc=e, countdown=60) from e  # Retry after 60 seconds
+    return f"Stored {row_count} similar users."
+
+
+@shared_task(bind=True, max_retries=3)
+def refresh_similar_users(self, user_id):
+    """Refresh the similar users rows affected by a change to the preferences of a user."""
+    try:
+        from user_management.neighbors import refresh_neighbors  # noqa: PLC0415
+
+        user_count = refresh_neighbors(user_id)
+    except Exception as e:
+        print(f"Error refreshing similar users of user {user_id}: {e}")
+        raise self.retry(exc=e, countdown=60) from e  # Retry after 60 seconds
+    return f"Refreshed the similar users of {user_count} users."
+
+
+@shared_task(bind=True, max_retries=3)
+def build_user_lsh_index(self):
+    """Store a snapshot of the approximate similar users index, loaded by the web processes."""
+    try:
+        from user_management.lsh import publish_user_lsh  # noqa: PLC0415
+
+        snapshot = publish_user_lsh()
+    except Exception as e:
+        print(f"Error building the user LSH index: {e}")
+        raise self.retry(exc=e, countdown=60) from e
+    return f"Stored user LSH snapshot {snapshot.id} for user sets version {snapshot.version}."
+
+
+@shared_task(bind=True, max_retries=3)
+def train_recommendation_factors(self):
+    """Train the implicit ALS factors of the recommendations on every like."""
+    try:
+        from user_management.factors import train_factor_model  # noqa: PLC0415
+
+        model = train_factor_model()
+    except Exception as e:
+        print(f"Error training recommendation factors: {e}")
+        raise self.retry(exc=e, countdown=60) from e
+    return f"Trained recommendation factors {model.id}."
+
+
+@shared_task(bind=True, max_retries=3)
+def precompute_recommendations(self):
+    """Rank the active users in shards, one precompute_recommendation_shard task per shard."""
+    try:
+        from user_management.recommendations import get_active_user_ids, split_shards  # noqa: PLC0415
+
+        shards = split_shards(get_active_user_ids())
+        if shards:
+            chord(precompute_recommendation_shard.s(shard) for shard in shards)(
+                report_recommendation_batch.s(time.time())
+            )
+    except Exception as e:
+        print(f"Error precomputing recommendations: {e}")
+        raise self.retry(exc=e, countdown=60) from e
+    if not shards:
+        return "No active users to rank."
+    return f"Ranking {sum(len(shard) for shard in shards)} users in {len(shards)} shards."
+
+
+@shared_task(bind=True, max_retries=3)
+def precompute_recommendation_shard(self, user_ids):
+    """Rank the users of a shard and store their rankings."""
+    try:
+        from user_management.recommendations import precompute_shard  # noqa: PLC0415
+
+        return precompute_shard(user_ids)
+    except Exception as e:
+        print(f"Error precomputing the recommendations of {len(user_ids)} users: {e}")
+        raise self.retry(exc=e, countdown=60) from e
+
+
+@shared_task
+def report_recommendation_batch(results, started_at):
+    """Report the totals and throughput of the shards of a recommendation batch."""
+    from user_management.recommendations import report_batch  # noqa: PLC0415
+
+    return str(report_batch(results, time.time() - started_at))
@@ -732,3 +732,875 @@ class BookmarkViewSetTests(APITestCase):
         self.client.delete(delete_url)
         self.assertIsNone(cache.get(f'bookmark_{bookmark.pk}'))
 """
+
+import operator
+import os
+import random
+import time
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status  # type: ignore
+from rest_framework.test import APIClient  # type: ignore
+from scipy import sparse  # type: ignore
+
+from restaurant_recommender.content_features import content_registry
+from restaurant_recommender.data_versions import USER_PREFERENCES, USER_SETS, get_data_version
+from restaurant_recommender.models import Restaurant  # type: ignore
+from user_management.factors import factor_registry, solve_factors, train_als, train_factor_model
+from user_management.lsh import benchmark_recall, publish_user_lsh, record_user_change, user_lsh_registry
+from user_management.models import (  # type: ignore
+    Preference,
+    SimilarUser,
+    StoredRecommendation,
+    UserLikedRestaurant,
+    UserLSHSnapshot,
+    UserPreference,
+)
+from user_management.neighbors import build_neighbor_table, get_neighbors, refresh_neighbors
+from user_management.recommendations import (
+    RECOMMENDATION_MODES,
+    get_active_user_ids,
+    get_stored_ranking,
+    load_shard,
+    precompute_recommendations,
+    rank_restaurants,
+    rank_shard,
+)
+from user_management.similarity import JACCARD, pack_bits, popcount, similarity_engine
+from user_management.tasks import (
+    build_user_lsh_index,
+    refresh_similar_users,
+    report_recommendation_batch,
+    resize_image,
+)
+from user_management.utils import (
+    calculate_cosine_similarity,
+    get_all_preferences,
+    get_liked_restaurants_matrix,
+    score_restaurants,
+    score_restaurants_hybrid,
+    top_scores,
+    user_preferences_to_vector,
+)
+
+# To run these tests use: python manage.py test user_management.tests
+
+User = get_user_model()
+
+TEST_PASSWORD = "password123"  # noqa: S105
+
+# The benchmarks print their timings, run them with: RUN_BENCHMARKS=1 python manage.py test user_management.tests
+benchmark = unittest.skipUnless(os.environ.get("RUN_BENCHMARKS"), "set RUN_BENCHMARKS=1 to run the benchmarks")
+
+
+def create_users_with_preferences(user_count, preferences, seed=7):
+    """Create users with between 1 and 5 random preferences each."""
+    generator = random.Random(seed)  # noqa: S311
+    users = []
+    for index in range(user_count):
+        user = User.objects.create_user(
+            email=f"user{index}@example.com", first_name="Test", surname=f"User {index}", password=TEST_PASSWORD
+        )
+        for preference in generator.sample(preferences, generator.randint(1, min(5, len(preferences)))):
+            UserPreference.objects.create(user=user, preference=preference)
+        users.append(user)
+    return users
+
+
+def loop_similar_users(current_user):
+    """The similar users as find_similar_users used to compute them, one query per user."""
+    all_preferences = get_all_preferences()
+    current_user_vector = user_preferences_to_vector(current_user, all_preferences)
+    similar_users = []
+    for user in User.objects.exclude(id=current_user.id).order_by("id"):
+        similarity = calculate_cosine_similarity(current_user_vector, user_preferences_to_vector(user, all_preferences))
+        if similarity > 0:
+            similar_users.append({"email": user.email, "similarity": similarity})
+    return sorted(similar_users, key=operator.itemgetter("similarity"), reverse=True)
+
+
+class SimilarityEngineTest(TestCase):
+    """Compares the bitset similarity engine with the per-user similarity loop."""
+
+    def setUp(self):
+        """Create preferences and users with random preferences."""
+        cache.clear()
+        similarity_engine.clear()
+        self.preferences = [
+            Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(12)
+        ]
+        # Preferences that are not selectable are not part of the similarity.
+        Preference.objects.create(description="Hidden", type="Price", is_selectable=False)
+        self.users = create_users_with_preferences(40, self.preferences)
+        # A user without preferences is similar to nobody.
+        self.user_without_preferences = User.objects.create_user(
+            email="empty@example.com", first_name="Test", surname="Empty", password=TEST_PASSWORD
+        )
+        self.client = APIClient()
+
+    def test_matches_loop(self):
+        """Test that the engine matches the per-user similarity loop."""
+        for current_user in self.users[:5]:
+            expected = loop_similar_users(current_user)
+            user_ids, similarities = similarity_engine.similar_users(current_user.id)
+
+            self.assertNotIn(current_user.id, user_ids.tolist())
+            np.testing.assert_allclose(similarities, [user["similarity"] for user in expected], rtol=1e-12)
+            emails = dict(User.objects.values_list("id", "email"))
+            self.assertEqual(
+                {emails[user_id] for user_id in user_ids.tolist()}, {user["email"] for user in expected}
+            )
+
+    def test_limit(self):
+        """Test that the engine returns the most similar users up to the limit."""
+        user_ids, similarities = similarity_engine.similar_users(self.users[0].id)
+        top_ids, top_similarities = similarity_engine.similar_users(self.users[0].id, limit=3)
+        np.testing.assert_array_equal(top_ids, user_ids[:3])
+        np.testing.assert_array_equal(top_similarities, similarities[:3])
+
+    def test_user_without_preferences(self):
+        """Test that a user without preferences has no similar users."""
+        user_ids, _ = similarity_engine.similar_users(self.user_without_preferences.id)
+        self.assertEqual(len(user_ids), 0)
+
+    def test_endpoint(self):
+        """Test that the similar users endpoint matches the per-user similarity loop."""
+        self.client.force_authenticate(user=self.users[0])
+        response = self.client.get(reverse("find_similar_users"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        expected = loop_similar_users(self.users[0])
+        data = response.json()
+        self.assertEqual(sorted(user["email"] for user in data), sorted(user["email"] for user in expected))
+        np.testing.assert_allclose([user["similarity"] for user in data], [user["similarity"] for user in expected])
+
+    def test_matrix_is_rebuilt_when_preferences_change(self):
+        """Test that the bitsets are rebuilt when a preference of a user changes."""
+        preferences = similarity_engine.get_preferences()
+        with self.assertNumQueries(0):
+            self.assertIs(similarity_engine.get_preferences(), preferences)
+
+        version = get_data_version(USER_PREFERENCES)
+        with patch.object(refresh_similar_users, "delay") as delay, self.captureOnCommitCallbacks(execute=True):
+            UserPreference.objects.create(user=self.user_without_preferences, preference=self.preferences[0])
+        self.assertEqual(get_data_version(USER_PREFERENCES), version + 1)
+        delay.assert_called_once_with(self.user_without_preferences.id)
+
+        user_ids, _ = similarity_engine.similar_users(self.user_without_preferences.id)
+        self.assertGreater(len(user_ids), 0)
+
+    def test_registration_refreshes_user_once(self):
+        """Test that a registration refreshes the new user once, after its commit."""
+        version = get_data_version(USER_PREFERENCES)
+        user_sets_version = get_data_version(USER_SETS)
+        with (
+            patch.object(refresh_similar_users, "delay") as delay,
+            patch.object(resize_image, "delay"),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            response = self.client.post(reverse("register"), {
+                "email": "new@example.com",
+                "first_name": "Test",
+                "surname": "New",
+                "password": "Tasty-Dinner-42",
+                "password_confirm": "Tasty-Dinner-42",
+                "preferences": [preference.id for preference in self.preferences[:5]],
+            }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        delay.assert_called_once_with(response.json()["id"])
+        self.assertEqual(get_data_version(USER_PREFERENCES), version + 1)
+        self.assertEqual(get_data_version(USER_SETS), user_sets_version + 1)
+
+    @benchmark
+    def test_similarity_performance(self):
+        """Print the time of the per-user loop and of the engine."""
+        current_user = self.users[0]
+        rounds = 5
+
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            loop_similar_users(current_user)
+        loop_time = (time.perf_counter() - start_time) / rounds
+
+        similarity_engine.get_preferences()
+        start_time = time.perf_counter()
+        for _ in range(rounds):
+            similarity_engine.similar_users(current_user.id)
+        engine_time = (time.perf_counter() - start_time) / rounds
+
+        print(f"Similar users with the per-user loop for {len(self.users)} users: {loop_time * 1000:.2f} ms")
+        print(f"Similar users with the bitset engine for {len(self.users)} users: {engine_time * 1000:.2f} ms")
+
+
+class PackedPreferencesTest(TestCase):
+    """Tests the bitset representation of the user preferences."""
+
+    def setUp(self):
+        """Create 100 preferences and users with random preferences."""
+        cache.clear()
+        similarity_engine.clear()
+        # More than 64 preferences, so every user takes two words.
+        self.preferences = [
+            Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(100)
+        ]
+        self.users = create_users_with_preferences(25, self.preferences)
+
+    def test_popcount(self):
+        """Test that popcount counts the set bits of every word."""
+        words = np.random.default_rng(5).integers(0, 2**63, size=(40, 3), dtype=np.uint64) | np.uint64(2**63)
+        expected = [[int(word).bit_count() for word in row] for row in words]
+        np.testing.assert_array_equal(popcount(words), expected)
+
+    def test_bits_match_preferences(self):
+        """Test that the bitsets and counts hold the preferences of every user."""
+        preferences = similarity_engine.get_preferences()
+        self.assertEqual(preferences.bits.shape, (len(self.users), 2))
+        unpacked = np.unpackbits(preferences.bits.view(np.uint8), axis=1, bitorder="little")[:, :100]
+
+        for row, user_id in enumerate(preferences.user_ids.tolist()):
+            owned = set(UserPreference.objects.filter(user_id=user_id).values_list("preference_id", flat=True))
+            self.assertEqual(set(preferences.preference_ids[unpacked[row] == 1].tolist()), owned)
+            self.assertEqual(preferences.counts[row], len(owned))
+
+    def test_pack_bits(self):
+        """Test the bit order of pack_bits across words."""
+        bits = pack_bits(np.array([0, 0, 1]), np.array([0, 64, 63]), 2, 65)
+        np.testing.assert_array_equal(bits, np.array([[1, 1], [2**63, 0]], dtype=np.uint64))
+
+    def test_jaccard(self):
+        """Test the Jaccard similarities against the preference sets."""
+        current_user = self.users[0]
+        owned = {
+            user.id: set(UserPreference.objects.filter(user=user).values_list("preference_id", flat=True))
+            for user in self.users
+        }
+        expected = {
+            user_id: len(owned[current_user.id] & preferences) / len(owned[current_user.id] | preferences)
+            for user_id, preferences in owned.items()
+            if user_id != current_user.id and owned[current_user.id] & preferences
+        }
+
+        user_ids, similarities = similarity_engine.similar_users(current_user.id, metric=JACCARD)
+        self.assertEqual(set(user_ids.tolist()), set(expected))
+        np.testing.assert_allclose(similarities, [expected[user_id] for user_id in user_ids.tolist()], rtol=1e-12)
+
+    def test_unknown_metric(self):
+        """Test that an unknown metric is rejected."""
+        with self.assertRaises(ValueError):
+            similarity_engine.similar_users(self.users[0].id, metric="euclidean")
+
+    @benchmark
+    def test_scan_performance(self):
+        """Print the size of the bitsets and the time of a popcount scan of many users."""
+        # Synthetic users, the scan does not depend on where the bitsets come from.
+        generator = np.random.default_rng(11)
+        user_count = 200_000
+        rows = np.repeat(np.arange(user_count), 5)
+        columns = generator.integers(0, 103, size=len(rows))
+        bits = pack_bits(rows, columns, user_count, 103)
+        dense_bytes = user_count * 103 * np.dtype(np.int64).itemsize
+
+        start_time = time.perf_counter()
+        intersections = popcount(bits[0] & bits).sum(axis=1)
+        scan_time = time.perf_counter() - start_time
+
+        self.assertEqual(intersections[0], popcount(bits[0]).sum())
+        print(f"Packed preferences of {user_count} users: {bits.nbytes} bytes, {dense_bytes} bytes as int64 vectors")
+        print(f"Popcount scan of {user_count} users: {scan_time * 1000:.2f} ms")
+
+
+class RecommendRestaurantsTest(TestCase):
+    """Tests the restaurant recommendations based on the likes of similar users."""
+
+    def setUp(self):
+        """Create users with preferences and likes, authenticated as the first one."""
+        cache.clear()
+        similarity_engine.clear()
+        preferences = [Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(4)]
+        self.users = create_users_with_preferences(6, preferences)
+        self.restaurants = [
+            Restaurant.objects.create(restaurant_name=f"Restaurant {index}", zone="Flatiron", location_id=1)
+            for index in range(5)
+        ]
+        for index, user in enumerate(self.users[1:]):
+            UserLikedRestaurant.objects.create(user=user, restaurant=self.restaurants[index % 5])
+            UserLikedRestaurant.objects.create(user=user, restaurant=self.restaurants[(index + 2) % 5])
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.users[0])
+
+    def expected_scores(self):
+        """Sum of the similarities of the similar users that liked every restaurant."""
+        scores = {}
+        for similar_user in loop_similar_users(self.users[0]):
+            for restaurant_id in UserLikedRestaurant.objects.filter(user__email=similar_user["email"]).values_list(
+                "restaurant_id", flat=True
+            ):
+                scores[restaurant_id] = scores.get(restaurant_id, 0) + similar_user["similarity"]
+        return scores
+
+    def test_recommendations(self):
+        """Test that the liked restaurants of the similar users are recommended."""
+        response = self.client.get(reverse("recommend_restaurants"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+
+        expected = self.expected_scores()
+        self.assertEqual({item["id"] for item in data}, set(expected))
+        for item in data:
+            self.assertAlmostEqual(item["score"], expected[item["id"]])
+        scores = [item["score"] for item in data]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertEqual([item["sort"] for item in data], list(range(1, len(data) + 1)))
+
+    def test_pages(self):
+        """Test that the pages of the recommendations add up to the full list."""
+        everything = self.client.get(reverse("recommend_restaurants")).json()
+
+        pages = []
+        url = f"{reverse('recommend_restaurants')}?limit=2"
+        while url:
+            # The ranking is cached, so a page only needs the query that loads its restaurants.
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            pages.extend(response.json())
+            url = response.get("Link", "").partition("<")[2].partition(">")[0]
+
+        self.assertEqual(pages, everything)
+        self.assertEqual(cache.get(f"recommend_restaurant_scores_neighbors_{self.users[0].id}")[0].tolist(),
+                         [item["id"] for item in everything])
+
+    def test_invalid_parameters(self):
+        """Test that an invalid limit, cursor or mode returns 400."""
+        for params in ({"limit": 0}, {"limit": "all"}, {"cursor": -1}, {"limit": 10_000}):
+            response = self.client.get(reverse("recommend_restaurants"), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TopScoresTest(TestCase):
+    """Tests the top K selection of the recommendation scores."""
+
+    def test_matches_full_sort(self):
+        """Test that top_scores matches a full sort of the positive scores."""
+        generator = np.random.default_rng(3)
+        scores = np.round(generator.random(500) - 0.3, 2)
+        order = [index for index in sorted(range(500), key=lambda index: (-scores[index], index)) if scores[index] > 0]
+
+        for limit in (1, 10, 200, 1000):
+            np.testing.assert_array_equal(top_scores(scores, limit), order[:limit])
+
+
+class LikedRestaurantsMatrixTest(TestCase):
+    """Tests the sparse matrix of the restaurants liked by similar users."""
+
+    def setUp(self):
+        """Create restaurants and similar users with likes."""
+        preferences = [Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(3)]
+        self.users = create_users_with_preferences(4, preferences)
+        self.restaurants = [
+            Restaurant.objects.create(restaurant_name=f"Restaurant {index}", zone="Flatiron", location_id=1)
+            for index in range(4)
+        ]
+        for user, restaurant_indexes in zip(self.users, ((0, 1), (1,), (1, 3), ()), strict=True):
+            for index in restaurant_indexes:
+                UserLikedRestaurant.objects.create(user=user, restaurant=self.restaurants[index])
+        self.similar_users = [
+            {"id": user.id, "email": user.email, "similarity": similarity}
+            for user, similarity in zip(self.users, (0.5, 0.25, 1.0, 0.75), strict=True)
+        ]
+        self.all_restaurants = [restaurant.id for restaurant in self.restaurants]
+
+    def test_matrix_and_scores(self):
+        """Test the like matrix of the similar users and the restaurant scores."""
+        with self.assertNumQueries(1):
+            matrix = get_liked_restaurants_matrix(self.similar_users, self.all_restaurants)
+
+        np.testing.assert_array_equal(
+            matrix.toarray(), [[1, 1, 0, 0], [0, 1, 0, 0], [0, 1, 0, 1], [0, 0, 0, 0]]
+        )
+        np.testing.assert_allclose(
+            score_restaurants(self.similar_users, self.all_restaurants), [0.5, 1.75, 0, 1.0]
+        )
+
+    def test_no_similar_users(self):
+        """Test that no similar users give an empty matrix and zero scores."""
+        self.assertEqual(get_liked_restaurants_matrix([], self.all_restaurants).shape, (0, 4))
+        np.testing.assert_array_equal(score_restaurants([], self.all_restaurants), np.zeros(4))
+
+
+class NeighborTableTest(TestCase):
+    """Tests the materialized table of the most similar users."""
+
+    top_k = 5
+
+    def setUp(self):
+        """Create preferences and users with random preferences."""
+        cache.clear()
+        similarity_engine.clear()
+        self.preferences = [
+            Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(8)
+        ]
+        self.users = create_users_with_preferences(30, self.preferences)
+
+    def assert_table_matches_engine(self):
+        """Every user's rows are the top K of a full comparison with everybody."""
+        for user in self.users:
+            user_ids, similarities = similarity_engine.similar_users(user.id, limit=self.top_k)
+            rows = list(SimilarUser.objects.filter(user=user).order_by("rank").values_list(
+                "similar_user_id", "similarity", "rank"))
+            self.assertEqual([row[0] for row in rows], user_ids.tolist())
+            np.testing.assert_allclose([row[1] for row in rows], similarities, rtol=1e-12)
+            self.assertEqual([row[2] for row in rows], list(range(1, len(rows) + 1)))
+
+    def change_preferences(self, change):
+        """Apply a preference change, bumping the data version as the committed signal would."""
+        with patch.object(refresh_similar_users, "delay") as delay, self.captureOnCommitCallbacks(execute=True):
+            change()
+        return delay
+
+    def test_build(self):
+        """Test that the table built in chunks matches the engine."""
+        build_neighbor_table(top_k=self.top_k, chunk_size=7)
+        self.assert_table_matches_engine()
+
+    def test_refresh_after_create_and_delete(self):
+        """Test that refreshing after adding and removing a preference matches the engine."""
+        build_neighbor_table(top_k=self.top_k)
+        user = self.users[3]
+
+        owned = set(UserPreference.objects.filter(user=user).values_list("preference_id", flat=True))
+        new_preference = next(preference for preference in self.preferences if preference.id not in owned)
+        delay = self.change_preferences(lambda: UserPreference.objects.create(user=user, preference=new_preference))
+        delay.assert_called_once_with(user.id)
+        refresh_neighbors(user.id, top_k=self.top_k)
+        self.assert_table_matches_engine()
+
+        self.change_preferences(lambda: UserPreference.objects.filter(user=user).delete())
+        refresh_neighbors(user.id, top_k=self.top_k)
+        self.assert_table_matches_engine()
+        self.assertFalse(SimilarUser.objects.filter(user=user).exists())
+        self.assertFalse(SimilarUser.objects.filter(similar_user=user).exists())
+
+    def test_refresh_only_recomputes_affected_users(self):
+        """Test that a refresh only recomputes the users affected by the change."""
+        build_neighbor_table(top_k=self.top_k)
+        user = self.users[0]
+        referencing = set(SimilarUser.objects.filter(similar_user=user).values_list("user_id", flat=True))
+
+        user_count = refresh_neighbors(user.id, top_k=self.top_k)
+        self.assertGreaterEqual(user_count, len(referencing) + 1)
+        self.assertLess(user_count, len(self.users))
+
+    def test_get_neighbors(self):
+        """Test that the neighbors of a user are read in rank order with one query."""
+        build_neighbor_table(top_k=self.top_k)
+        user = self.users[0]
+        expected = list(SimilarUser.objects.filter(user=user).order_by("rank").values_list(
+            "similar_user__email", flat=True))
+
+        with self.assertNumQueries(1):
+            neighbors = get_neighbors(user.id)
+        self.assertEqual([neighbor["email"] for neighbor in neighbors], expected)
+
+        # Users without rows are compared with everybody instead.
+        SimilarUser.objects.filter(user=user).delete()
+        self.assertEqual([neighbor["email"] for neighbor in get_neighbors(user.id)][:self.top_k], expected)
+
+
+def clustered_token_pairs(user_count, seed=13):
+    """Synthetic (user id, token) pairs: noisy copies of 50 template sets of 8 out of 400 tokens."""
+    generator = np.random.default_rng(seed)
+    templates = [generator.choice(400, size=8, replace=False) for _ in range(50)]
+    pairs = []
+    for user_id in range(1, user_count + 1):
+        tokens = set(generator.choice(templates[generator.integers(50)], size=6, replace=False).tolist())
+        tokens.update(generator.integers(0, 400, size=2).tolist())
+        pairs.extend((user_id, token) for token in sorted(tokens))
+    return np.array(pairs, dtype=np.int64)
+
+
+class UserLSHTest(TestCase):
+    """Tests the approximate similar users index."""
+
+    def setUp(self):
+        """Create users with preferences and likes, two of them with identical sets, and publish a snapshot."""
+        cache.clear()
+        similarity_engine.clear()
+        user_lsh_registry.clear()
+        self.preferences = [
+            Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(10)
+        ]
+        self.users = create_users_with_preferences(20, self.preferences)
+        self.restaurants = [
+            Restaurant.objects.create(restaurant_name=f"Restaurant {index}", zone="Flatiron", location_id=1)
+            for index in range(3)
+        ]
+        # Two users with the same preferences and liked restaurants.
+        self.twins = [
+            User.objects.create_user(
+                email=f"twin{index}@example.com", first_name="Test", surname="Twin", password=TEST_PASSWORD)
+            for index in range(2)
+        ]
+        for twin in self.twins:
+            for preference in self.preferences[:3]:
+                UserPreference.objects.create(user=twin, preference=preference)
+            UserLikedRestaurant.objects.create(user=twin, restaurant=self.restaurants[0])
+        publish_user_lsh()
+
+    def record(self, change):
+        """Apply a change, recording it in the change log as the committed signal would."""
+        with patch.object(refresh_similar_users, "delay"), self.captureOnCommitCallbacks(execute=True):
+            change()
+
+    def test_identical_sets(self):
+        """Test that a user with the same sets is the most similar one."""
+        user_ids, similarities = user_lsh_registry.similar_users(self.twins[0].id)
+        self.assertEqual(user_ids[0], self.twins[1].id)
+        self.assertEqual(similarities[0], 1.0)
+        self.assertNotIn(self.twins[0].id, user_ids.tolist())
+
+    def test_incremental_update(self):
+        """Test that a change to one user updates the index without a rebuild."""
+        index = user_lsh_registry.get_index()
+        user_ids, _ = index.similar_users(self.twins[0].id)
+
+        self.record(lambda: UserLikedRestaurant.objects.create(user=self.twins[1], restaurant=self.restaurants[1]))
+        # The change log is read, then only the changed user is loaded again, with one query per kind of token.
+        with self.assertNumQueries(3):
+            self.assertIs(user_lsh_registry.get_index(), index)
+        _, similarities = user_lsh_registry.similar_users(self.twins[0].id)
+        self.assertLess(similarities[0], 1.0)
+
+        self.record(lambda: UserPreference.objects.filter(user=self.twins[1]).delete())
+        self.record(lambda: UserLikedRestaurant.objects.filter(user=self.twins[1]).delete())
+        user_ids, _ = user_lsh_registry.similar_users(self.twins[0].id)
+        self.assertNotIn(self.twins[1].id, user_ids.tolist())
+        self.assertIs(user_lsh_registry.get_index(), index)
+
+    def test_change_log_survives_cache_clear(self):
+        """Test that changes are read from the database log after the cache is cleared."""
+        index = user_lsh_registry.get_index()
+        self.record(lambda: UserLikedRestaurant.objects.create(user=self.twins[1], restaurant=self.restaurants[1]))
+        cache.clear()
+        self.assertIs(user_lsh_registry.get_index(), index)
+        _, similarities = user_lsh_registry.similar_users(self.twins[0].id)
+        self.assertLess(similarities[0], 1.0)
+
+    def test_full_change_waits_for_snapshot(self):
+        """Test that a change to every user queues a build and keeps the index until the snapshot."""
+        index = user_lsh_registry.get_index()
+        self.record(lambda: UserLikedRestaurant.objects.create(user=self.twins[1], restaurant=self.restaurants[1]))
+        self.record(record_user_change)
+        with patch.object(build_user_lsh_index, "delay") as delay:
+            # The current index keeps being served and the build is queued once.
+            self.assertIs(user_lsh_registry.get_index(), index)
+            self.assertIs(user_lsh_registry.get_index(), index)
+        delay.assert_called_once_with()
+        _, similarities = user_lsh_registry.similar_users(self.twins[0].id)
+        self.assertEqual(similarities[0], 1.0)
+
+        publish_user_lsh()
+        rebuilt = user_lsh_registry.get_index()
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(rebuilt.version, get_data_version(USER_SETS))
+        _, similarities = user_lsh_registry.similar_users(self.twins[0].id)
+        self.assertLess(similarities[0], 1.0)
+
+    def test_without_snapshot(self):
+        """Test that no users are similar before the first snapshot."""
+        UserLSHSnapshot.objects.all().delete()
+        cache.clear()
+        with patch.object(build_user_lsh_index, "delay") as delay:
+            user_ids, _ = user_lsh_registry.similar_users(self.twins[0].id)
+        self.assertEqual(len(user_ids), 0)
+        delay.assert_called_once_with()
+
+    def test_endpoint(self):
+        """Test the approximate mode of the similar users endpoint, and 400 for unknown modes."""
+        client = APIClient()
+        client.force_authenticate(user=self.twins[0])
+        response = client.get(reverse("find_similar_users"), {"mode": "approximate"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()[0], {"email": self.twins[1].email, "similarity": 1.0})
+
+        response = client.get(reverse("find_similar_users"), {"mode": "fuzzy"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @benchmark
+    def test_recall_benchmark(self):
+        """Print the recall, candidates and latency of several band and row configurations."""
+        pairs = clustered_token_pairs(20_000)
+        results = benchmark_recall(pairs, [(8, 8), (16, 4), (32, 2)], sample_size=100, top_k=10)
+        for result in results:
+            print(
+                f"LSH {result['bands']} bands x {result['rows']} rows: recall@10 {result['recall']:.3f}, "
+                f"{result['candidates']:.0f} candidates, {result['lsh_ms']:.3f} ms per query, "
+                f"exact scan {result['exact_ms']:.3f} ms"
+            )
+        # More bands of fewer rows trade candidates for recall.
+        self.assertGreater(results[-1]["recall"], 0.9)
+        self.assertLess(results[0]["candidates"], results[-1]["candidates"])
+
+
+class FactorRecommendationTest(TestCase):
+    """Tests the implicit ALS factors of the recommendations."""
+
+    def setUp(self):
+        """Create restaurants and two groups of users liking different restaurants."""
+        cache.clear()
+        similarity_engine.clear()
+        factor_registry.clear()
+        preferences = [Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(4)]
+        self.users = create_users_with_preferences(12, preferences)
+        self.restaurants = [
+            Restaurant.objects.create(restaurant_name=f"Restaurant {index}", zone="Flatiron", location_id=1)
+            for index in range(8)
+        ]
+        # Two groups of users, each liking most of its own half of the restaurants.
+        for index, user in enumerate(self.users):
+            group = self.restaurants[:4] if index % 2 else self.restaurants[4:]
+            for restaurant in group[: 2 + index % 3]:
+                UserLikedRestaurant.objects.create(user=user, restaurant=restaurant)
+
+    def test_train_als_separates_groups(self):
+        """Test that the factors score the restaurants of the group of a user higher."""
+        generator = np.random.default_rng(1)
+        density = 0.6
+        likes = np.zeros((40, 10), dtype=np.float32)
+        likes[:20, :5] = generator.random((20, 5)) < density
+        likes[20:, 5:] = generator.random((20, 5)) < density
+        user_factors, restaurant_factors = train_als(sparse.csr_matrix(likes), factors=4, iterations=10, threads=2)
+
+        self.assertEqual(user_factors.dtype, np.float32)
+        self.assertEqual(restaurant_factors.shape, (10, 4))
+        scores = user_factors @ restaurant_factors.T
+        self.assertTrue((scores[:20, :5].mean(axis=1) > scores[:20, 5:].mean(axis=1)).all())
+        self.assertTrue((scores[20:, 5:].mean(axis=1) > scores[20:, :5].mean(axis=1)).all())
+
+    def test_solve_factors_in_chunks(self):
+        """Test that solving in chunks matches solving every user on its own."""
+        generator = np.random.default_rng(2)
+        density = 0.4
+        likes = sparse.csr_matrix((generator.random((30, 12)) < density).astype(np.float32))
+        likes[3] = 0
+        likes.eliminate_zeros()
+        fixed = generator.standard_normal((12, 4)).astype(np.float32)
+        gram = fixed.T @ fixed
+
+        expected = np.zeros((30, 4), dtype=np.float32)
+        for row in range(30):
+            liked = fixed[likes[row].indices]
+            if len(liked):
+                matrix = gram + 40.0 * liked.T @ liked + 0.1 * np.eye(4)
+                expected[row] = np.linalg.solve(matrix, 41.0 * liked.sum(axis=0))
+
+        # Chunks of 5 likes split the likes of most rows across chunks.
+        for chunk_elements in (5 * 4 * 4, 1 << 22):
+            with patch("user_management.factors.SOLVE_CHUNK_ELEMENTS", chunk_elements):
+                np.testing.assert_allclose(solve_factors(likes, fixed, gram, 40.0, 0.1), expected, rtol=1e-3, atol=1e-4)
+
+    def test_explicit_zero_parameters(self):
+        """Test that explicit zero parameters are not replaced by the settings."""
+        model = train_factor_model(factors=4, alpha=0, regularization=0.5, iterations=2)
+        self.assertEqual(model.alpha, 0)
+
+    def test_recommendations(self):
+        """Test the recommendations of the factors mode."""
+        train_factor_model(factors=4, iterations=10)
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+        response = client.get(reverse("recommend_restaurants"), {"mode": "factors"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        scores = [item["score"] for item in data]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertIn(data[0]["id"], [restaurant.id for restaurant in self.restaurants[4:]])
+        liked_ids = set(
+            UserLikedRestaurant.objects.filter(user=self.users[0]).values_list("restaurant_id", flat=True))
+        self.assertFalse(liked_ids & {item["id"] for item in data})
+
+    def test_fold_in_new_user(self):
+        """Test that a user who liked restaurants since the training is folded in."""
+        model = train_factor_model(factors=4, iterations=10)
+        new_user = User.objects.create_user(
+            email="new@example.com", first_name="Test", surname="New", password=TEST_PASSWORD)
+        UserLikedRestaurant.objects.create(user=new_user, restaurant=self.restaurants[5])
+        UserLikedRestaurant.objects.create(user=new_user, restaurant=self.restaurants[6])
+
+        restaurant_ids, scores = factor_registry.score_restaurants(new_user.id)
+        self.assertEqual(factor_registry.get_factors().version, model.id)
+        group_scores = dict(zip(restaurant_ids.tolist(), scores.tolist(), strict=True))
+        self.assertGreater(
+            np.mean([group_scores[restaurant.id] for restaurant in self.restaurants[4:]]),
+            np.mean([group_scores[restaurant.id] for restaurant in self.restaurants[:4]]),
+        )
+        self.assertIn(restaurant_ids[np.argmax(scores)], [restaurant.id for restaurant in self.restaurants[4:]])
+
+    def test_falls_back_without_factors(self):
+        """Test that the factors mode falls back to the neighbors without trained factors."""
+        self.assertIsNone(factor_registry.score_restaurants(self.users[0].id))
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+        response = client.get(reverse("recommend_restaurants"), {"mode": "factors"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = client.get(reverse("recommend_restaurants"), {"mode": "popular"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HybridRecommendationTest(TestCase):
+    """Tests the blend of collaborative scores and content similarity."""
+
+    def setUp(self):
+        """Create restaurants with cuisines, users with likes and a user without similar users."""
+        cache.clear()
+        similarity_engine.clear()
+        content_registry.clear()
+        cuisines = ["Italian", "Italian", "Italian", "Sushi", "Sushi", "Mexican"]
+        self.restaurants = [
+            Restaurant.objects.create(
+                restaurant_name=f"Restaurant {index}", primary_cuisine=cuisine, zone="Flatiron", location_id=1)
+            for index, cuisine in enumerate(cuisines)
+        ]
+        preferences = [Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(3)]
+        self.users = create_users_with_preferences(4, preferences[:2])
+        for user in self.users[1:]:
+            UserLikedRestaurant.objects.create(user=user, restaurant=self.restaurants[3])
+        # A user similar to nobody, with one liked Italian restaurant.
+        self.loner = User.objects.create_user(
+            email="loner@example.com", first_name="Test", surname="Loner", password=TEST_PASSWORD)
+        UserPreference.objects.create(user=self.loner, preference=preferences[2])
+        UserLikedRestaurant.objects.create(user=self.loner, restaurant=self.restaurants[0])
+        self.client = APIClient()
+
+    def test_cold_start_uses_content(self):
+        """Test that a user without similar users gets restaurants like the ones they liked."""
+        self.client.force_authenticate(user=self.loner)
+        self.assertEqual(self.client.get(reverse("recommend_restaurants")).json(), [])
+
+        data = self.client.get(reverse("recommend_restaurants"), {"mode": "hybrid"}).json()
+        # The other Italian restaurants first, never the liked one.
+        self.assertEqual({item["id"] for item in data[:2]}, {self.restaurants[1].id, self.restaurants[2].id})
+        self.assertNotIn(self.restaurants[0].id, [item["id"] for item in data])
+
+    def test_blends_collaborative_scores(self):
+        """Test that the restaurant liked by the similar users comes first in the hybrid mode."""
+        self.client.force_authenticate(user=self.users[0])
+        data = self.client.get(reverse("recommend_restaurants"), {"mode": "hybrid"}).json()
+        self.assertEqual(data[0]["id"], self.restaurants[3].id)
+
+    def test_queries(self):
+        """Test that the hybrid scores need two queries."""
+        content_registry.get_index()
+        get_neighbors(self.loner.id)
+        # The similar users and the likes of the user and of the similar users.
+        with self.assertNumQueries(2):
+            score_restaurants_hybrid(self.loner.id, get_neighbors(self.loner.id), 0.3)
+
+
+class RecommendationBatchTest(TestCase):
+    """Tests the rankings precomputed for the active users."""
+
+    def setUp(self):
+        """Create users with preferences and random likes and build the similar users table."""
+        cache.clear()
+        similarity_engine.clear()
+        content_registry.clear()
+        factor_registry.clear()
+        preferences = [Preference.objects.create(description=f"Cuisine {index}", type="Cuisine") for index in range(4)]
+        self.users = create_users_with_preferences(24, preferences)
+        self.restaurants = [
+            Restaurant.objects.create(
+                restaurant_name=f"Restaurant {index}", primary_cuisine=["Italian", "Sushi", "Mexican"][index % 3],
+                zone="Flatiron", location_id=1)
+            for index in range(15)
+        ]
+        generator = random.Random(3)  # noqa: S311
+        for user in self.users:
+            for restaurant in generator.sample(self.restaurants, generator.randint(1, 5)):
+                UserLikedRestaurant.objects.create(user=user, restaurant=restaurant)
+        build_neighbor_table()
+
+    def assert_rankings_equal(self, rankings, mode):
+        """Assert that the rankings of a shard match the online rankings of mode."""
+        for user_id, (restaurant_ids, scores) in rankings.items():
+            expected_ids, expected_scores = rank_restaurants(user_id, mode)
+            # Sums in another order may break exact ties the other way, so compare scores by restaurant.
+            expected = dict(zip(expected_ids.tolist(), expected_scores.tolist(), strict=True))
+            self.assertEqual(set(restaurant_ids.tolist()), set(expected))
+            np.testing.assert_allclose(
+                scores, [expected[restaurant_id] for restaurant_id in restaurant_ids.tolist()], rtol=1e-5)
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_shard_matches_online_ranking(self):
+        """Test that a shard ranks its users like the online path, in three queries."""
+        train_factor_model(factors=4, iterations=5)
+        # A user who liked restaurants since the training is folded in.
+        new_user = User.objects.create_user(
+            email="new@example.com", first_name="Test", surname="New", password=TEST_PASSWORD)
+        UserLikedRestaurant.objects.create(user=new_user, restaurant=self.restaurants[2])
+        user_ids = [user.id for user in self.users] + [new_user.id]
+
+        with self.assertNumQueries(3):
+            inputs = load_shard(user_ids)
+        for mode in RECOMMENDATION_MODES:
+            rankings = rank_shard(inputs, mode)
+            self.assertGreaterEqual(len(rankings), len(self.users) - 2)
+            self.assert_rankings_equal(rankings, mode)
+        self.assertIn(new_user.id, rank_shard(inputs, "factors"))
+
+    def test_stored_rankings_are_served(self):
+        """Test that the endpoint serves the stored rankings without ranking again."""
+        report = precompute_recommendations(modes=RECOMMENDATION_MODES, shard_size=5, processes=1)
+        self.assertEqual(report.users, len(self.users))
+        self.assertEqual(report.rankings, StoredRecommendation.objects.count())
+        self.assertGreater(report.users_per_second, 0)
+
+        user = self.users[0]
+        stored_ids, _ = get_stored_ranking(user.id, "neighbors")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        with patch("user_management.views.rank_restaurants") as rank:
+            data = client.get(reverse("recommend_restaurants")).json()
+        rank.assert_not_called()
+        self.assertEqual([item["id"] for item in data], stored_ids.tolist())
+
+    def test_changes_delete_affected_rankings(self):
+        """Test that a change deletes the rankings of the user and of their followers."""
+        precompute_recommendations(shard_size=10, processes=1)
+        user = self.users[0]
+        followers = set(SimilarUser.objects.filter(similar_user=user).values_list("user_id", flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            UserLikedRestaurant.objects.filter(user=user).first().delete()
+
+        remaining = set(StoredRecommendation.objects.values_list("user_id", flat=True))
+        self.assertNotIn(user.id, remaining)
+        self.assertFalse(followers & remaining)
+        self.assertEqual(remaining, {other.id for other in self.users} - followers - {user.id})
+        self.assertIsNone(get_stored_ranking(user.id, "neighbors"))
+
+    def test_chord_callback_logs_the_batch(self):
+        """Test that the chord callback logs the totals of the shards."""
+        with self.assertLogs("user_management.recommendations", "INFO") as logs:
+            summary = report_recommendation_batch([(2, 4), (3, 6)], time.time())
+        self.assertTrue(summary.startswith("Ranked 5 users (10 rankings)"))
+        self.assertIn(summary, logs.output[0])
+
+    def test_active_users(self):
+        """Test that logging in makes a user active again."""
+        inactive_user = self.users[0]
+        UserLikedRestaurant.objects.filter(user=inactive_user).update(liked_date=timezone.now() - timedelta(days=90))
+        self.assertNotIn(inactive_user.id, get_active_user_ids(days=30))
+
+        response = APIClient().post(
+            reverse("token-pair"), {"email": inactive_user.email, "password": TEST_PASSWORD}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(inactive_user.id, get_active_user_ids(days=30))
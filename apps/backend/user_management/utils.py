@@ -1,8 +1,11 @@
 """This file contains utility functions for the user management app."""
 
 import numpy as np
+from scipy import sparse  # type: ignore
 from sklearn.metrics.pairwise import cosine_similarity  # type: ignore
 
+from restaurant_recommender.content_features import content_registry
+
 from .models import Preference, UserLikedRestaurant, UserPreference  # type: ignore
 
 
@@ -46,41 +49,101 @@ def calculate_cosine_similarity(vector1, vector2):
 
 
 def get_liked_restaurants_matrix(similar_users, all_restaurants):
-    """Return a matrix of liked restaurants for similar users.
+    """Return a sparse matrix of the restaurants liked by similar users.
+
+    All likes are fetched with a single query and mapped to their column with a dictionary, so
+    time and memory grow with the number of likes instead of users times restaurants.
+
+    Args:
+        similar_users (list): Similar users as returned by get_similar_users, one row each.
+        all_restaurants (list): All restaurant IDs, one column each.
+
+    Returns:
+        scipy.sparse.csr_matrix: A float64 matrix with a 1 where a similar user liked a restaurant.
+    """
+    # Map the user and restaurant IDs to their row and column once.
+    user_rows = {user["id"]: row for row, user in enumerate(similar_users)}
+    restaurant_columns = {restaurant_id: column for column, restaurant_id in enumerate(all_restaurants)}
+
+    rows, columns = [], []
+    for user_id, restaurant_id in UserLikedRestaurant.objects.filter(user_id__in=list(user_rows)).values_list(
+        "user_id", "restaurant_id"
+    ):
+        column = restaurant_columns.get(restaurant_id)
+        # Skip restaurants added since all_restaurants was read.
+        if column is not None:
+            rows.append(user_rows[user_id])
+            columns.append(column)
+
+    return sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=(len(similar_users), len(all_restaurants))
+    )
+
+
+def score_restaurants(similar_users, all_restaurants):
+    """Score every restaurant with the summed similarity of the similar users that liked it.
+
+    Args:
+        similar_users (list): Similar users as returned by get_similar_users.
+        all_restaurants (list): All restaurant IDs.
+
+    Returns:
+        numpy.ndarray: One score per restaurant of all_restaurants, 0 if nobody similar liked it.
+    """
+    similarity_vector = np.array([user["similarity"] for user in similar_users], dtype=np.float64)
+    return similarity_vector @ get_liked_restaurants_matrix(similar_users, all_restaurants)
+
+
+def score_restaurants_hybrid(user_id, similar_users, content_weight):
+    """Blend the collaborative scores of every restaurant with its content similarity to the user's likes.
+
+    The likes of the user and of the similar users are read with the same single query, and the
+    restaurants and their content vectors come from the in-memory content index. Users without
+    similar users still get the content part, users without likes the collaborative part.
+    Restaurants the user already likes are not recommended.
+
+    Args:
+        user_id (int): The user to score restaurants for.
+        similar_users (list): Similar users as returned by get_similar_users.
+        content_weight (float): Share of the content similarity in the blended score, from 0 to 1.
+
+    Returns:
+        tuple: The int64 restaurant ids of the content index and one score per restaurant.
+    """
+    index = content_registry.get_index()
+    # The user is the first row, with a similarity of 0 so their likes only shape the content profile.
+    rows = [{"id": user_id, "similarity": 0.0}, *(user for user in similar_users if user["id"] != user_id)]
+    likes = get_liked_restaurants_matrix(rows, index.restaurant_ids.tolist())
+
+    collaborative = np.array([row["similarity"] for row in rows], dtype=np.float64) @ likes
+    peak = collaborative.max(initial=0)
+    if peak > 0:
+        collaborative /= peak
+
+    user_likes = likes.getrow(0)
+    profile = np.asarray((user_likes @ index.features).todense(), dtype=np.float64).ravel()
+    profile_norm = np.linalg.norm(profile)
+    content = index.features @ (profile / profile_norm) if profile_norm else np.zeros(len(index.restaurant_ids))
+
+    scores = (1 - content_weight) * collaborative + content_weight * content
+    scores[user_likes.indices] = 0
+    return index.restaurant_ids, scores
+
 
-    The matrix is weighted by similarity, where the similarity score is the cosine similarity
-    between the user's preferences and the similar user's preferences.
+def top_scores(scores, limit):
+    """Return the indexes of the highest positive scores, without sorting every score.
 
     Args:
-        similar_users (list): A list of similar users.
-        all_restaurants (list): A list of all restaurant IDs.
+        scores (numpy.ndarray): One score per candidate.
+        limit (int): Maximum number of indexes to return.
 
     Returns:
-        numpy.ndarray: A matrix of liked restaurants for similar
-        users weighted by similarity.
+        numpy.ndarray: Indexes by descending score, ties by ascending index.
     """
-    # Get the number of similar users and restaurants.
-    user_count = len(similar_users)
-    restaurant_count = len(all_restaurants)
-    # Create a matrix to store the liked restaurants for similar users.
-    liked_matrix = np.zeros((user_count, restaurant_count), dtype=float)
-
-    # For each index and user in the similar users list:
-    for i, user in enumerate(similar_users):
-        # Get the user's similarity score.
-        similarity_score = user["similarity"]
-        # Get the user's liked restaurants.
-        liked_restaurants = UserLikedRestaurant.objects.filter(
-            user__email=user["email"])
-
-        # For each liked restaurant in the user's liked restaurants:
-        for liked_restaurant in liked_restaurants:
-            # Get the index of the restaurant in the list of all restaurants.
-            restaurant_id = liked_restaurant.restaurant.id
-            # Weight the similarity score by the similarity.
-            restaurant_index = all_restaurants.index(restaurant_id)
-            # Store the similarity score in the liked matrix.
-            # This is weighted by similarity.
-            liked_matrix[i, restaurant_index] = similarity_score
-
-    return liked_matrix
+    candidates = np.flatnonzero(scores > 0)
+    if limit < len(candidates):
+        # Find the limit-th highest score without sorting, then keep everything tied with it
+        # so that ties are broken by index like a full sort would.
+        threshold = -np.partition(-scores[candidates], limit - 1)[limit - 1]
+        candidates = candidates[scores[candidates] >= threshold]
+    return candidates[np.lexsort((candidates, -scores[candidates]))][:limit]
@@ -14,18 +14,16 @@ information on pagination in Django REST framework.
 """
 
 import logging
-import operator
 from datetime import UTC, datetime, timedelta
 
 
-import numpy as np
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
 from django.contrib.auth.tokens import default_token_generator
 from django.core.cache import cache
 from django.core.mail import send_mail
-from django.http import HttpRequest, JsonResponse
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils.encoding import force_bytes, force_str
 from django.utils.http import http_date, urlsafe_base64_decode, urlsafe_base64_encode
@@ -52,17 +50,27 @@ from user_management.serializers import (
     UserPreferenceSerializer,
 )
 
-from user_management.utils import (
-    calculate_cosine_similarity,
-    get_all_preferences,
-    get_liked_restaurants_matrix,
-    user_preferences_to_vector,
+from user_management.lsh import get_approximate_similar_users
+from user_management.neighbors import get_neighbors
+from user_management.recommendations import (
+    RECOMMENDATION_MODE_NEIGHBORS,
+    RECOMMENDATION_MODES,
+    get_stored_ranking,
+    rank_restaurants,
 )
 
 User = get_user_model()  # type: ignore
 
 logger = logging.getLogger(__name__)
 
+# Number of recommended restaurants returned when no limit is given, and the largest limit.
+DEFAULT_RECOMMENDATION_LIMIT = 50
+MAX_RECOMMENDATION_LIMIT = 200
+# Similarity modes of find_similar_users.
+SIMILARITY_MODE_EXACT = "exact"
+SIMILARITY_MODE_APPROXIMATE = "approximate"
+SIMILARITY_MODES = (SIMILARITY_MODE_EXACT, SIMILARITY_MODE_APPROXIMATE)
+
 
 class RegistrationAPIView(APIView):
     """
@@ -496,160 +504,152 @@ def find_similar_users(request):
     Args:
         request: The HTTP request containing the user data.
 
+    Query Parameters:
+        mode: "exact" (default) for the cosine similarity of the preferences, or "approximate"
+            for the Jaccard similarity of the preferences and liked restaurants estimated by the
+            MinHash/LSH index.
+
     Returns:
         JsonResponse: A JSON response containing the similar users and their similarity scores.
     """
+    mode = request.query_params.get("mode", SIMILARITY_MODE_EXACT)
+    if mode not in SIMILARITY_MODES:
+        return JsonResponse({"error": f"mode must be one of {', '.join(SIMILARITY_MODES)}"}, status=400)
+
     # Get the current user.
     current_user = request.user
 
-    # Set the user model.
-    User = get_user_model()  # noqa: N806
-    # Get all users.
-    all_users = User.objects.exclude(id=current_user.id)
-
-    # Get all preferences.
-    all_preferences = get_all_preferences()
-
-    # Get the current user vector.
-    current_user_vector = user_preferences_to_vector(
-        current_user, all_preferences)
-
-    # Set an empty list for similar users.
-    similar_users = []
-    # Exclude the current user.
-    all_users = User.objects.exclude(id=current_user.id)
-
-    # For each user:
-    for user in all_users:
-        # Get the user vector.
-        user_vector = user_preferences_to_vector(user, all_preferences)
-        # Calculate the cosine similarity.
-        similarity = calculate_cosine_similarity(
-            current_user_vector, user_vector)
-
-        # If the similarity is greater than 0:
-        if similarity > 0:
-            # Append the user email and similarity score to the similar users list.
-            similar_users.append(
-                {"email": user.email, "similarity": similarity})  # type: ignore
-
-    # Sort the similar users by similarity score in descending order.
-    similar_users = sorted(
-        similar_users, key=operator.itemgetter("similarity"), reverse=True)
+    if mode == SIMILARITY_MODE_APPROXIMATE:
+        # Only compare the user with the users sharing an LSH bucket.
+        neighbors = get_approximate_similar_users(current_user.id, limit=settings.SIMILAR_USERS_TOP_K)
+    else:
+        # Read the most similar users of the user from the similar users table.
+        neighbors = get_neighbors(current_user.id)
+
+    similar_users = [
+        {"email": similar_user["email"], "similarity": similar_user["similarity"]}
+        for similar_user in neighbors
+    ]
 
     # Return the similar users as a JSON response.
     return JsonResponse(similar_users, safe=False)
 
 
+def get_cached_ranking(user_id, mode):
+    """Return the restaurant IDs and scores of a user from the cache, storing them on a miss.
+
+    Args:
+        user_id (int): The user to rank the restaurants for.
+        mode (str): One of RECOMMENDATION_MODES.
+
+    Returns:
+        tuple: The restaurant IDs and their scores, best first.
+    """
+    cache_key = f"recommend_restaurant_scores_{mode}_{user_id}"
+    ranking = cache.get(cache_key)
+    if ranking is not None:
+        logger.info(f"Recommendations for user {user_id} retrieved from cache")
+        return ranking
+
+    # Serve the ranking of the last batch, unless the inputs of the user changed since.
+    ranking = get_stored_ranking(user_id, mode)
+    if ranking is None:
+        ranking = rank_restaurants(user_id, mode)
+    cache.set(cache_key, ranking, timeout=3600)
+    logger.info(f"Recommendations for user {user_id} saved to cache")
+    return ranking
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def recommend_restaurants(request):  # noqa: PLR0914
+def recommend_restaurants(request):
     """
     Recommend restaurants based on user preferences.
 
+    The ranking is read from the rankings precomputed by the nightly batch, or computed when the
+    user has none, and cached as compact arrays of restaurant IDs and scores, pages are read from
+    those arrays.
+
     Args:
         request: The HTTP request containing the user data.
 
+    Query Parameters:
+        mode: "neighbors" (default) to score restaurants with the likes of the similar users,
+            "factors" to score them with the implicit ALS factors of the user, or "hybrid" to blend
+            the likes of the similar users with the content similarity to the user's likes.
+        limit: Number of restaurants to return, defaults to DEFAULT_RECOMMENDATION_LIMIT.
+        cursor: Position of the first restaurant to return, taken from the Link header of the
+            previous page.
+
     Returns:
-        JsonResponse: A JSON response containing the recommended restaurants.
+        JsonResponse: A JSON response containing a page of the recommended restaurants, with a
+        Link header to the next page when there is one.
     """
-    # Get the current user.
-    current_user = request.user
-    user_id = current_user.id
-    cache_key = f"recommend_restaurants_{user_id}"
-    cached_recommendations = cache.get(cache_key)
-    if cached_recommendations:
-        logger.info(f"Recommendations for user {user_id} retrieved from cache")
-        return JsonResponse(cached_recommendations, safe=False)
-
-    # Get all preferences.
-    all_preferences = get_all_preferences()
-    # Get the current user vector.
-    current_user_vector = user_preferences_to_vector(
-        current_user, all_preferences)
-
-    # Ensure the request object is of the correct type.
-    if not isinstance(request, HttpRequest):
-        request = request._request  # noqa: SLF001
-
-    # Set the user model.
-    User = get_user_model()  # noqa: N806
-    # Get all users.
-    all_users = User.objects.exclude(id=current_user.id)
-
-    # Set an empty list for similar users.
-    similar_users = []
-
-    # For each user:
-    for user in all_users:
-        # Get the user vector.
-        user_vector = user_preferences_to_vector(user, all_preferences)
-        # Calculate the cosine similarity.
-        similarity = calculate_cosine_similarity(
-            current_user_vector, user_vector)
-        # If the similarity is greater than 0:
-        if similarity > 0:
-            similar_users.append(
-                {"email": user.email, "similarity": similarity})  # type: ignore
-
-    # Sort the similar users by similarity score in descending order.
-    similar_users = sorted(
-        similar_users, key=operator.itemgetter("similarity"), reverse=True)
-
-    # Get all restaurants.
-    all_restaurants = list(Restaurant.objects.values_list("id", flat=True))
-
-    # Get the liked restaurants matrix.
-    liked_matrix = get_liked_restaurants_matrix(similar_users, all_restaurants)
-
-    # Calculate the restaurant scores.
-    restaurant_scores = np.sum(liked_matrix, axis=0)
-
-    # Get the top restaurant indices.
-    # This is set to all restaurants for now.
-    top_restaurant_indices = np.argsort(restaurant_scores)[::-1]
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_RECOMMENDATION_LIMIT))
+        cursor = int(request.query_params.get("cursor", 0))
+    except ValueError:
+        return JsonResponse({"error": "limit and cursor must be integers"}, status=400)
+    if not 0 < limit <= MAX_RECOMMENDATION_LIMIT or cursor < 0:
+        return JsonResponse(
+            {"error": f"limit must be between 1 and {MAX_RECOMMENDATION_LIMIT} and cursor must not be negative"},
+            status=400,
+        )
+    mode = request.query_params.get("mode", RECOMMENDATION_MODE_NEIGHBORS)
+    if mode not in RECOMMENDATION_MODES:
+        return JsonResponse({"error": f"mode must be one of {', '.join(RECOMMENDATION_MODES)}"}, status=400)
+
+    # Get the ranking of the current user.
+    restaurant_ids, scores = get_cached_ranking(request.user.id, mode)
+    page_ids = restaurant_ids[cursor : cursor + limit].tolist()
+    page_scores = scores[cursor : cursor + limit].tolist()
+
+    # Get all restaurants of the page with one query.
+    restaurants = Restaurant.objects.in_bulk(page_ids)
 
     # Set an empty list for recommendations.
     recommendations = []
 
-    # For each sorted number and index in the top restaurant indices:
-    for sort_order, idx in enumerate(top_restaurant_indices, start=1):
-        # If the restaurant score is greater than 0:
-        if restaurant_scores[idx] > 0:
-            # Get the restaurant ID.
-            restaurant_id = all_restaurants[idx]
-            # Get the restaurant object.
-            restaurant = Restaurant.objects.get(id=restaurant_id)
-
-            # Append the restaurant data to the recommendations list.
-            recommendations.append({
-                "id": restaurant.id,  # type: ignore
-                "name": restaurant.restaurant_name,
-                "primary_cuisine": restaurant.primary_cuisine,
-                "overall_rating": restaurant.overall_rating,
-                "latitude": restaurant.latitude,
-                "longitude": restaurant.longitude,
-                "zone": restaurant.zone,
-                "telephone": restaurant.telephone,
-                "website": restaurant.website,
-                "price": restaurant.price,
-                "food_rating": restaurant.food_rating,
-                "service_rating": restaurant.service_rating,
-                "value_rating": restaurant.value_rating,
-                "ambience_rating": restaurant.ambience_rating,
-                "noise_level": restaurant.noise_level,
-                "photo_url": restaurant.photo_url,
-                "address": restaurant.address,
-                "location_id": restaurant.location_id,
-                "dress_code": restaurant.dress_code,
-                "score": restaurant_scores[idx],
-                "sort": sort_order,
-            })
-
-    cache.set(cache_key, recommendations, timeout=3600)
-    logger.info(f"Recommendations for user {user_id} saved to cache")
+    # For each sorted number, restaurant ID and score of the page:
+    for sort_order, restaurant_id, score in zip(
+        range(cursor + 1, cursor + len(page_ids) + 1), page_ids, page_scores, strict=True
+    ):
+        restaurant = restaurants.get(restaurant_id)
+        # Skip restaurants deleted since the ranking was cached.
+        if restaurant is None:
+            continue
+
+        # Append the restaurant data to the recommendations list.
+        recommendations.append({
+            "id": restaurant.id,  # type: ignore
+            "name": restaurant.restaurant_name,
+            "primary_cuisine": restaurant.primary_cuisine,
+            "overall_rating": restaurant.overall_rating,
+            "latitude": restaurant.latitude,
+            "longitude": restaurant.longitude,
+            "zone": restaurant.zone,
+            "telephone": restaurant.telephone,
+            "website": restaurant.website,
+            "price": restaurant.price,
+            "food_rating": restaurant.food_rating,
+            "service_rating": restaurant.service_rating,
+            "value_rating": restaurant.value_rating,
+            "ambience_rating": restaurant.ambience_rating,
+            "noise_level": restaurant.noise_level,
+            "photo_url": restaurant.photo_url,
+            "address": restaurant.address,
+            "location_id": restaurant.location_id,
+            "dress_code": restaurant.dress_code,
+            "score": score,
+            "sort": sort_order,
+        })
+
     # Return the recommendations as a JSON response.
-    return JsonResponse(recommendations, safe=False)
+    response = JsonResponse(recommendations, safe=False)
+    if cursor + limit < len(restaurant_ids):
+        next_url = request.build_absolute_uri(f"{request.path}?mode={mode}&limit={limit}&cursor={cursor + limit}")
+        response["Link"] = f'<{next_url}>; rel="next"'
+    return response
 
 
 """
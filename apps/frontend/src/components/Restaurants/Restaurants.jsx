@@ -55,7 +55,7 @@ export const Restaurants = () => {
                 <CardMedia
                   component="img"
                   height="140"
-                  image={JSON.parse(restaurant.photo_url)[0]}
+                  image={restaurant.photo_url[0]}
                   alt={restaurant.restaurant_name}
                 />
                 <CardContent>